@@ -3,7 +3,7 @@
 from typing import Dict, Any, List
 from datetime import datetime, timezone
 from .base_agent import BaseAgent, AgentState
-from llm_client import LlmChat, UserMessage
+from llm_client import LlmChat, LlmOverloadedError, UserMessage, PRIORITY_DEFAULT
 import os
 import json
 
@@ -94,7 +94,7 @@ INITIAL TIMELINE:
                 api_key=self.api_key,
                 session_id=f"enhanced-rca-{datetime.now().timestamp()}",
                 system_message=self._get_system_prompt()
-            ).with_model("gemini", "gemini-2.5-flash")
+            ).for_task("rca").with_priority(PRIORITY_DEFAULT)
             
             prompt = f"""Analyze this disruption with data from multiple stakeholders:
 
@@ -117,8 +117,12 @@ Provide comprehensive RCA in JSON format."""
             cleaned_response = cleaned_response.strip()
             
             rca = json.loads(cleaned_response)
+            rca["ai_model"] = chat.served_model
             return rca
         
+        except LlmOverloadedError:
+            self.state = AgentState.FAILED
+            raise
         except Exception as e:
             await self.log(f"AI RCA failed: {str(e)}", level="error")
             return self._fallback_rca(context)
@@ -173,17 +173,23 @@ Reply here when sent.
     async def _log_outreach_to_timeline(self, case_id: str, results: List[Dict]):
         """Log outreach attempts to case timeline"""
         try:
-            for result in results:
-                if isinstance(result, dict) and result.get("status") == "sent":
-                    await self.db.timeline_events.insert_one({
-                        "case_id": case_id,
-                        "actor": "Ward AI (Outreach Agent)",
-                        "action": "STAKEHOLDER_CONTACTED",
-                        "content": f"Contacted {result.get('stakeholder')} via {result.get('contact_method')}",
-                        "source_type": "system",
-                        "reliability": "high",
-                        "timestamp": datetime.now(timezone.utc),
-                        "metadata": result
-                    })
+            events = [
+                {
+                    "case_id": case_id,
+                    "actor": "Ward AI (Outreach Agent)",
+                    "action": "STAKEHOLDER_CONTACTED",
+                    "content": f"Contacted {result.get('stakeholder')} via {result.get('contact_method')}",
+                    "source_type": "system",
+                    "reliability": "high",
+                    "timestamp": datetime.now(timezone.utc),
+                    "metadata": result
+                }
+                for result in results
+                if isinstance(result, dict) and result.get("status") == "sent"
+            ]
+            if events:
+                inserted = await self.db.timeline_events.insert_many(events)
+                for error in inserted.errors.values():
+                    await self.log(f"Failed to log outreach event: {error}", level="error")
         except Exception as e:
             await self.log(f"Failed to log to timeline: {str(e)}", level="error")
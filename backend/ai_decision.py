@@ -2,6 +2,7 @@
 
 import os
 import json
+from typing import AsyncIterator, Tuple
 from dotenv import load_dotenv
 from llm_client import LlmChat, UserMessage
 
@@ -110,15 +111,15 @@ Do not generate a decision structure for out-of-scope requests.
 
 IMPORTANT: Your entire response must be valid JSON. No markdown, no code blocks, just the JSON object."""
 
-async def generate_decision_structure(description: str, disruption_details: dict, shipment_data: dict) -> dict:
-    """Generate AI decision structure for a disruption case"""
+def _decision_request(description: str, disruption_details: dict, shipment_data: dict):
+    """Chat and prompt for a decision structure"""
     
     # Initialize Gemini chat
     chat = LlmChat(
         api_key=EMERGENT_LLM_KEY,
         session_id=f"ward-case-{id(description)}",
         system_message=get_system_prompt()
-    ).with_model("gemini", "gemini-2.5-flash")
+    ).for_task("decision_structure")
     
     # Construct prompt with India-first context
     ids_str = ", ".join(shipment_data.get("ids", []))
@@ -145,11 +146,10 @@ CONTEXT: This is an Indian logistics operation. Consider Indian ports (JNPT, Mun
 
 Generate the complete decision structure following the required JSON format with Indian logistics context."""
     
-    # Send message to Gemini
-    message = UserMessage(text=prompt)
-    response = await chat.send_message(message)
-    
-    # Parse JSON response
+    return chat, UserMessage(text=prompt)
+
+def parse_decision_structure(response: str) -> dict:
+    """Parse and validate the model's JSON decision structure"""
     cleaned_response = response.strip()
     
     # Remove markdown code blocks if present
@@ -176,3 +176,23 @@ Generate the complete decision structure following the required JSON format with
         return decision_structure
     except json.JSONDecodeError as e:
         raise ValueError(f"AI returned invalid JSON: {str(e)}. Response: {cleaned_response[:200]}")
+
+async def generate_decision_structure(description: str, disruption_details: dict, shipment_data: dict) -> dict:
+    """Generate AI decision structure for a disruption case"""
+    chat, message = _decision_request(description, disruption_details, shipment_data)
+    
+    # Send message to the routed model
+    response = await chat.send_message(message)
+    
+    decision_structure = parse_decision_structure(response)
+    decision_structure["ai_model"] = chat.served_model
+    return decision_structure
+
+async def stream_decision_structure(description: str, disruption_details: dict, shipment_data: dict) -> Tuple[LlmChat, AsyncIterator[str]]:
+    """
+    Stream the raw JSON of a decision structure. Returns the chat (its
+    served_model is set once streaming starts) and the chunks; parse the
+    joined text with parse_decision_structure.
+    """
+    chat, message = _decision_request(description, disruption_details, shipment_data)
+    return chat, await chat.send_message(message, stream=True)
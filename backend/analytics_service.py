@@ -16,12 +16,13 @@ class AnalyticsService:
         """
         start_date = datetime.now(timezone.utc) - timedelta(days=days)
         
-        # 1. Fetch relevant cases
-        # Note: PostgreSQL doesn't support $gte directly, we'll filter in Python for now
-        cursor = await self.db.cases.find({}, sort=[("created_at", -1)], limit=1000)
-        all_cases = await cursor.to_list(length=1000)
-        # Filter by date in Python
-        cases = [c for c in all_cases if c.get("created_at") and c.get("created_at") >= start_date]
+        # 1. Fetch relevant cases (date window filtered in SQL, no row cap)
+        cursor = await self.db.cases.find(
+            {"created_at": {"$gte": start_date}},
+            sort=[("created_at", -1)],
+            limit=0
+        )
+        cases = await cursor.to_list()
         
         if not cases:
             return self._empty_metrics()
@@ -84,17 +85,11 @@ class AnalyticsService:
             "breakdown": [
                 {"name": k, "value": v} for k, v in top_disruptions
             ],
-            "trends": await self._get_daily_trends(start_date)
+            "trends": self._get_daily_trends(cases)
         }
 
-    async def _get_daily_trends(self, start_date):
+    def _get_daily_trends(self, cases):
         """Aggregate cases by day"""
-        # PostgreSQL doesn't support MongoDB aggregation pipeline
-        # Fetch all cases and group in Python
-        cursor = await self.db.cases.find({}, sort=[("created_at", -1)], limit=1000)
-        all_cases = await cursor.to_list(length=1000)
-        cases = [c for c in all_cases if c.get("created_at") and c.get("created_at") >= start_date]
-        
         # Group by date
         daily_counts = {}
         for case in cases:
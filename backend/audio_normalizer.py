@@ -0,0 +1,231 @@
+"""
+Audio Normalizer
+Prepares voice recordings for Sarvam STT: decode, downmix to mono, resample
+to 16 kHz, trim leading/trailing silence, normalize loudness, split into STT
+segments (see audio_segmenter) and encode each as FLAC (or 16-bit WAV
+without ffmpeg).
+
+The work is CPU bound, so prepare_for_stt runs it in a process pool
+(AUDIO_WORKERS processes, default 2) and never blocks the event loop. WAV
+is decoded with the standard library; other formats need ffmpeg. When the
+audio cannot be decoded it is split as-is instead, so a missing ffmpeg only
+costs the size savings.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+import shutil
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_segmenter import (
+    FRAME_SECONDS,
+    STT_SAMPLE_RATE,
+    AudioSegment,
+    decode_to_wav_sync,
+    is_wav,
+    run_ffmpeg,
+    split_audio,
+    split_wav,
+)
+
+TARGET_RATE = STT_SAMPLE_RATE
+
+# Frames quieter than this fraction of the loudest frame are silence
+SILENCE_FRACTION = 0.02
+SILENCE_PADDING = 0.2  # seconds kept before the first and after the last sound
+
+TARGET_RMS = 0.1  # -20 dBFS for voiced frames
+MAX_PEAK = 0.89  # -1 dBFS
+MAX_GAIN = 20.0
+
+
+@dataclass
+class PreparedAudio:
+    segments: List[AudioSegment]
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+def _pcm_to_float(raw: bytes, width: int, channels: int) -> np.ndarray:
+    """Interleaved PCM to mono float32 in [-1, 1]"""
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        bytes3 = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = bytes3[:, 0] | (bytes3[:, 1] << 8) | (bytes3[:, 2] << 16)
+        samples = np.where(values >= 1 << 23, values - (1 << 24), values).astype(np.float32) / (1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported sample width {width}")
+    usable = len(samples) - len(samples) % channels
+    return samples[:usable].reshape(-1, channels).mean(axis=1)
+
+
+def decode(audio: bytes, audio_format: str) -> Optional[Tuple[np.ndarray, int]]:
+    """(mono float samples, sample rate), or None if the audio cannot be decoded"""
+    if audio_format != "wav" and not is_wav(audio):
+        audio = decode_to_wav_sync(audio, audio_format)
+        if audio is None:
+            return None
+    try:
+        with wave.open(io.BytesIO(audio)) as reader:
+            params = reader.getparams()
+            raw = reader.readframes(params.nframes)
+    except (wave.Error, EOFError) as e:
+        print(f"Warning: Could not read {audio_format} audio: {e}")
+        return None
+    return _pcm_to_float(raw, params.sampwidth, params.nchannels), params.framerate
+
+
+def resample(samples: np.ndarray, rate: int, target: int = TARGET_RATE) -> np.ndarray:
+    """Windowed-sinc low-pass (when downsampling) then linear interpolation"""
+    if rate == target or len(samples) == 0:
+        return samples
+    if rate > target:
+        cutoff = 0.5 * target / rate
+        n = np.arange(63) - 31
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(63)
+        samples = np.convolve(samples, kernel / kernel.sum(), mode="same")
+    positions = np.arange(int(len(samples) * target / rate)) * (rate / target)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def trim_and_level(samples: np.ndarray, rate: int) -> np.ndarray:
+    """Trim leading/trailing silence and bring voiced frames to TARGET_RMS"""
+    frame = max(1, int(rate * FRAME_SECONDS))
+    usable = len(samples) - len(samples) % frame
+    if usable == 0:
+        return samples
+    rms = np.sqrt(np.mean(samples[:usable].reshape(-1, frame) ** 2, axis=1))
+    voiced = rms > max(float(rms.max()) * SILENCE_FRACTION, 1e-4)
+    if not voiced.any():
+        return samples
+
+    first, last = np.flatnonzero(voiced)[[0, -1]]
+    padding = int(SILENCE_PADDING * rate)
+    start = max(0, first * frame - padding)
+    end = min(len(samples), (last + 1) * frame + padding)
+    samples = samples[start:end]
+
+    peak = float(np.abs(samples).max())
+    gain = min(TARGET_RMS / float(np.sqrt(np.mean(rms[voiced] ** 2))), MAX_PEAK / peak, MAX_GAIN)
+    return np.clip(samples * gain, -1.0, 1.0)
+
+
+def _to_wav(samples: np.ndarray, rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes((samples * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def _to_flac(wav: bytes) -> Optional[bytes]:
+    return run_ffmpeg(["-f", "wav", "-i", "pipe:0", "-f", "flac", "pipe:1"], wav)
+
+
+def prepare_sync(audio: bytes, audio_format: str, max_seconds: float, overlap: float) -> Optional[PreparedAudio]:
+    """Decode, normalize, split and encode; None if the audio cannot be decoded"""
+    decoded = decode(audio, audio_format)
+    if decoded is None:
+        return None
+    samples, rate = decoded
+    original_seconds = len(samples) / rate if rate else 0.0
+    samples = trim_and_level(resample(samples, rate), TARGET_RATE)
+
+    segments = split_wav(_to_wav(samples, TARGET_RATE), max_seconds, overlap)
+    output_format = "wav"
+    if shutil.which("ffmpeg"):
+        encoded = [_to_flac(segment.data) for segment in segments]
+        if all(encoded):
+            for segment, data in zip(segments, encoded):
+                segment.data, segment.audio_format = data, "flac"
+            output_format = "flac"
+
+    output_bytes = sum(len(segment.data) for segment in segments)
+    return PreparedAudio(segments, {
+        "normalized": True,
+        "input_format": audio_format,
+        "output_format": output_format,
+        "input_bytes": len(audio),
+        "output_bytes": output_bytes,
+        "saved_bytes": len(audio) - output_bytes,
+        "saved_percent": round(100 * (len(audio) - output_bytes) / len(audio), 1) if audio else 0.0,
+        "duration": round(len(samples) / TARGET_RATE, 2),
+        "trimmed_seconds": round(original_seconds - len(samples) / TARGET_RATE, 2)
+    })
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=int(os.getenv("AUDIO_WORKERS", "2")),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_audio_pool():
+    """Stop the worker processes (app shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def prepare_for_stt(
+    audio: bytes,
+    audio_format: str = "wav",
+    max_seconds: float = 25.0,
+    overlap: float = 1.0
+) -> PreparedAudio:
+    """
+    Normalized STT segments for a recording, prepared in the process pool
+    (in a thread where processes are unavailable). Falls back to splitting
+    the original audio when it cannot be decoded.
+    """
+    audio_format = (audio_format or "wav").lower().lstrip(".")
+    loop = asyncio.get_running_loop()
+    try:
+        prepared = await loop.run_in_executor(_get_pool(), prepare_sync, audio, audio_format, max_seconds, overlap)
+    except (OSError, RuntimeError, NotImplementedError) as e:
+        # BrokenProcessPool is a RuntimeError; serverless sandboxes may not allow processes
+        print(f"Warning: Audio process pool unavailable, normalizing in a thread: {e}")
+        shutdown_audio_pool()
+        try:
+            prepared = await asyncio.to_thread(prepare_sync, audio, audio_format, max_seconds, overlap)
+        except Exception as e:
+            print(f"Warning: Audio normalization failed: {e}")
+            prepared = None
+    except Exception as e:
+        print(f"Warning: Audio normalization failed: {e}")
+        prepared = None
+
+    if prepared is not None:
+        return prepared
+    segments = await split_audio(audio, audio_format, max_seconds, overlap)
+    size = sum(len(segment.data) for segment in segments)
+    return PreparedAudio(segments, {
+        "normalized": False,
+        "input_format": audio_format,
+        "output_format": segments[0].audio_format,
+        "input_bytes": len(audio),
+        "output_bytes": size,
+        "saved_bytes": len(audio) - size,
+        "saved_percent": round(100 * (len(audio) - size) / len(audio), 1) if audio else 0.0
+    })
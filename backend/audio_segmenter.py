@@ -0,0 +1,216 @@
+"""
+Audio Segmenter
+Splits long voice recordings into chunks short enough for Sarvam STT and
+stitches the chunk transcripts back together.
+
+WAV is parsed with the standard library. Other formats (webm, ogg, mp3...)
+are decoded to 16 kHz mono WAV with ffmpeg when it is installed; without
+ffmpeg they are sent as a single segment. Cuts are placed in a pause near
+the end of each window; when there is no pause the cut is at the window end,
+the next segment starts `overlap` seconds early and the repeated words are
+removed when stitching.
+"""
+
+import asyncio
+import io
+import re
+import shutil
+import subprocess
+import wave
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+FRAME_SECONDS = 0.02
+STT_SAMPLE_RATE = 16000
+FFMPEG_TIMEOUT = 60.0
+
+# RMS below this fraction of the recording's median frame RMS counts as silence
+SILENCE_RATIO = 0.25
+
+_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+@dataclass
+class AudioSegment:
+    index: int
+    start: float  # seconds from the start of the recording
+    end: float
+    data: bytes
+    audio_format: str
+
+
+def is_wav(audio: bytes) -> bool:
+    return audio[:4] == b"RIFF" and audio[8:12] == b"WAVE"
+
+
+def run_ffmpeg(args: List[str], data: bytes, timeout: float = FFMPEG_TIMEOUT) -> Optional[bytes]:
+    """ffmpeg with data on stdin; stdout, or None if ffmpeg is missing or fails"""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    try:
+        result = subprocess.run(
+            [ffmpeg, "-hide_banner", "-loglevel", "error", *args],
+            input=data,
+            capture_output=True,
+            timeout=timeout
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Warning: ffmpeg failed: {e}")
+        return None
+    if result.returncode != 0:
+        print(f"Warning: ffmpeg failed: {result.stderr.decode(errors='ignore')[:200]}")
+        return None
+    return result.stdout
+
+
+def decode_to_wav_sync(audio: bytes, audio_format: str, timeout: float = FFMPEG_TIMEOUT) -> Optional[bytes]:
+    """STT_SAMPLE_RATE mono WAV via ffmpeg, or None if ffmpeg is missing or fails"""
+    wav = run_ffmpeg(
+        ["-f", audio_format, "-i", "pipe:0", "-ac", "1", "-ar", str(STT_SAMPLE_RATE), "-f", "wav", "pipe:1"],
+        audio,
+        timeout
+    )
+    if wav is not None and not is_wav(wav):
+        print(f"Warning: ffmpeg could not decode {audio_format} audio")
+        return None
+    return wav
+
+
+async def decode_to_wav(audio: bytes, audio_format: str, timeout: float = FFMPEG_TIMEOUT) -> Optional[bytes]:
+    """decode_to_wav_sync off the event loop"""
+    return await asyncio.to_thread(decode_to_wav_sync, audio, audio_format, timeout)
+
+
+def _cut_points(samples: np.ndarray, rate: int, max_seconds: float) -> List[Tuple[int, bool]]:
+    """
+    (sample offset, is silent) cuts: the quietest frame in the last third of
+    each window if it is silent, otherwise the end of the window
+    """
+    frame = max(1, int(rate * FRAME_SECONDS))
+    usable = len(samples) - len(samples) % frame
+    rms = np.sqrt(np.mean(samples[:usable].reshape(-1, frame) ** 2, axis=1)) if usable else np.zeros(0)
+    threshold = float(np.median(rms)) * SILENCE_RATIO if len(rms) else 0.0
+
+    window = int(max_seconds * rate)
+    search = max(frame, window // 3)
+    cuts = []
+    start = 0
+    while len(samples) - start > window:
+        lo, hi = (start + window - search) // frame, (start + window) // frame
+        cut, silent = start + window, False
+        if hi > lo and hi <= len(rms):
+            quietest = lo + int(np.argmin(rms[lo:hi]))
+            if rms[quietest] <= threshold:
+                cut, silent = quietest * frame + frame // 2, True
+        cuts.append((cut, silent))
+        start = cut
+    return cuts
+
+
+def split_wav(audio: bytes, max_seconds: float = 25.0, overlap: float = 1.0) -> List[AudioSegment]:
+    """Split WAV audio into segments of at most max_seconds (plus overlap)"""
+    with wave.open(io.BytesIO(audio)) as reader:
+        params = reader.getparams()
+        raw = reader.readframes(params.nframes)
+
+    rate, width, channels = params.framerate, params.sampwidth, params.nchannels
+    frame_bytes = width * channels
+    total = len(raw) // frame_bytes
+    if total <= max_seconds * rate:
+        return [AudioSegment(0, 0.0, total / rate, audio, "wav")]
+
+    if width == 2:
+        samples = np.frombuffer(raw[:total * frame_bytes], dtype="<i2").astype(np.float32)
+        samples = samples.reshape(-1, channels).mean(axis=1)
+        cuts = _cut_points(samples, rate, max_seconds)
+    else:
+        # No energy analysis for 8/24/32-bit audio: fixed windows
+        step = int(max_seconds * rate)
+        cuts = [(offset, False) for offset in range(step, total, step)]
+
+    bounds = []
+    start = 0
+    for cut, silent in cuts:
+        bounds.append((start, cut))
+        start = cut if silent else max(0, cut - int(overlap * rate))
+    bounds.append((start, total))
+
+    segments = []
+    for index, (first, last) in enumerate(bounds):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as writer:
+            writer.setnchannels(channels)
+            writer.setsampwidth(width)
+            writer.setframerate(rate)
+            writer.writeframes(raw[first * frame_bytes:last * frame_bytes])
+        segments.append(AudioSegment(index, first / rate, last / rate, buffer.getvalue(), "wav"))
+    return segments
+
+
+async def split_audio(
+    audio: bytes,
+    audio_format: str = "wav",
+    max_seconds: float = 25.0,
+    overlap: float = 1.0
+) -> List[AudioSegment]:
+    """Split a recording for STT; formats that cannot be decoded come back as one segment"""
+    audio_format = (audio_format or "wav").lower().lstrip(".")
+    wav = audio if is_wav(audio) else await decode_to_wav(audio, audio_format)
+    if wav is None:
+        return [AudioSegment(0, 0.0, 0.0, audio, audio_format)]
+    try:
+        return split_wav(wav, max_seconds, overlap)
+    except (wave.Error, EOFError, ValueError) as e:
+        print(f"Warning: Could not split {audio_format} audio: {e}")
+        return [AudioSegment(0, 0.0, 0.0, audio, audio_format)]
+
+
+def _normalize_word(word: str) -> str:
+    return _WORD_RE.sub("", word).lower()
+
+
+def _overlap_words(previous: List[str], following: List[str], max_words: int = 12) -> int:
+    """Number of leading words of `following` that repeat the end of `previous`"""
+    left = [_normalize_word(w) for w in previous[-max_words:]]
+    right = [_normalize_word(w) for w in following[:max_words]]
+    for size in range(min(len(left), len(right)), 0, -1):
+        if left[-size:] == right[:size]:
+            return size
+    return 0
+
+
+def stitch_transcripts(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Join per-segment results (each with index, start, end and transcript or
+    error) in order, dropping words repeated across overlapping segments and
+    shifting word timestamps to the whole recording.
+    """
+    words: List[str] = []
+    timestamps = {"words": [], "start_time_seconds": [], "end_time_seconds": []}
+    failed = []
+    previous_end = 0.0
+
+    for result in sorted(results, key=lambda r: r["index"]):
+        overlaps = result["start"] < previous_end
+        previous_end = result["end"]
+        if not result.get("success"):
+            failed.append({"index": result["index"], "start": result["start"], "end": result["end"], "error": result.get("error")})
+            continue
+        segment_words = (result.get("transcript") or "").split()
+        skip = _overlap_words(words, segment_words) if words and overlaps else 0
+        words.extend(segment_words[skip:])
+
+        segment_ts = result.get("timestamps")
+        if isinstance(segment_ts, dict) and segment_ts.get("words"):
+            for key, offset in (("words", None), ("start_time_seconds", result["start"]), ("end_time_seconds", result["start"])):
+                values = list(segment_ts.get(key) or [])[skip:]
+                timestamps[key].extend(values if offset is None else [round(v + offset, 3) for v in values])
+
+    return {
+        "transcript": " ".join(words),
+        "timestamps": timestamps if timestamps["words"] else [],
+        "failed_segments": failed
+    }
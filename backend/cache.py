@@ -0,0 +1,207 @@
+"""
+In-process TTL Cache
+Small LRU cache with per-entry expiry for hot lookups (counts, users, tokens).
+SharedCache puts the same cache in front of an optional Redis backend so
+several workers share entries and invalidations.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache whose entries expire after a time-to-live (seconds)"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value, or default if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Invalidate one entry"""
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else default
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Invalidate every entry whose key matches predicate"""
+        stale = [key for key in self._entries if predicate(key)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Invalidate everything"""
+        self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_set(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Return the cached value or load it with factory().
+        Concurrent misses for the same key share a single load.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await factory()
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log a warning
+            future.exception()
+            raise
+        else:
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+
+
+class SharedCache:
+    """
+    Async cache with a TTLCache in front of an optional Redis backend.
+
+    Redis is used when REDIS_URL (or redis_url) is set and the redis package
+    is installed. Local copies then live at most local_ttl seconds, so a
+    delete() in one worker is seen by the others shortly after. Values must
+    be JSON-serialisable. Redis errors fall back to the local cache.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        maxsize: int = 1024,
+        ttl: float = 60.0,
+        redis_url: Optional[str] = None,
+        local_ttl: float = 5.0
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._redis = None
+
+        redis_url = os.getenv("REDIS_URL") if redis_url is None else redis_url
+        if redis_url and redis_asyncio is None:
+            print("Warning: REDIS_URL is set but the redis package is not installed; using in-process cache only")
+        elif redis_url:
+            self._redis = redis_asyncio.from_url(redis_url)
+
+        self.local = TTLCache(maxsize, min(ttl, local_ttl) if self._redis else ttl)
+
+    @property
+    def shared(self) -> bool:
+        """True when entries are shared through Redis"""
+        return self._redis is not None
+
+    def _key(self, key: Hashable) -> str:
+        return f"ward:{self.namespace}:{key}"
+
+    async def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value from the local cache, then Redis"""
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self._redis is None:
+            return default
+        try:
+            raw = await self._redis.get(self._key(key))
+        except Exception as e:
+            print(f"Warning: Shared cache read failed ({self.namespace}): {e}")
+            return default
+        if raw is None:
+            return default
+        value = json.loads(raw)
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value locally and in Redis"""
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, min(ttl, self.local.ttl))
+        if self._redis is None or ttl <= 0:
+            return
+        try:
+            await self._redis.set(self._key(key), json.dumps(value, default=str), px=int(ttl * 1000))
+        except Exception as e:
+            print(f"Warning: Shared cache write failed ({self.namespace}): {e}")
+
+    async def delete(self, key: Hashable) -> None:
+        """Invalidate one entry in every worker"""
+        self.local.pop(key)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.delete(self._key(key))
+        except Exception as e:
+            print(f"Warning: Shared cache delete failed ({self.namespace}): {e}")
+
+    async def clear(self) -> None:
+        """Invalidate every entry in this namespace"""
+        self.local.clear()
+        if self._redis is None:
+            return
+        try:
+            keys = [key async for key in self._redis.scan_iter(match=self._key("*"))]
+            if keys:
+                await self._redis.delete(*keys)
+        except Exception as e:
+            print(f"Warning: Shared cache clear failed ({self.namespace}): {e}")
+
+    async def close(self) -> None:
+        """Close the Redis connection, if any"""
+        if self._redis is not None:
+            close = getattr(self._redis, "aclose", None) or self._redis.close
+            await close()
+            self._redis = None
@@ -3,23 +3,94 @@ Database Adapter for Supabase PostgreSQL
 Replaces MongoDB operations with PostgreSQL/Supabase
 """
 
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
 import asyncpg
 import json
+from datetime import datetime
 from uuid import UUID, uuid4
 import os
+import asyncio
+import itertools
 from contextlib import asynccontextmanager
 from urllib.parse import urlparse, urlunparse, quote_plus
-import ssl
+import functools
+from contextvars import ContextVar
+
+from db_pool import PoolConfig, create_pool
+from db_tables import TABLES, get_table
+from query_compiler import (
+    bind,
+    build_conditions,
+    coerce_param,
+    compile_count,
+    compile_delete_one,
+    compile_insert,
+    compile_select,
+    compile_update_one,
+    normalize_sort,
+    query_operands,
+    query_shape,
+)
+
+# orjson is optional; it encodes/decodes JSONB columns several times faster
+try:
+    import orjson
+
+    def _json_dumps(value: Any) -> str:
+        return orjson.dumps(value, default=str).decode("utf-8")
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(value: Any) -> str:
+        return json.dumps(value, default=str)
+
+    _json_loads = json.loads
+
+
+# Legacy per-table method suffixes and the generic method each one maps to,
+# e.g. facilities_find_one(query) -> find_one("facilities", query)
+_LEGACY_METHODS = (
+    ("_find_one", "find_one"),
+    ("_find_page", "find_page"),
+    ("_find", "find"),
+    ("_insert_one", "insert_one"),
+    ("_insert_many", "insert_many"),
+    ("_update_one", "update_one"),
+    ("_delete_one", "delete_one"),
+    ("_count_documents", "count"),
+    ("_count", "count"),
+)
+
+
+# Once a request writes (or asks for it), its remaining reads go to the primary
+_read_primary: ContextVar[bool] = ContextVar("ward_read_primary", default=False)
+
+
+def pin_reads_to_primary() -> None:
+    """Route the rest of the current request's reads to the primary (read-your-writes)"""
+    _read_primary.set(True)
 
 
 class SupabaseAdapter:
     """Adapter to replace MongoDB operations with Supabase PostgreSQL"""
     
-    def __init__(self, connection_string: str):
+    def __init__(
+        self,
+        connection_string: str,
+        pool_config: Optional[PoolConfig] = None,
+        replica_urls: Optional[List[str]] = None
+    ):
         self.connection_string = self._fix_connection_string(connection_string)
+        self.pool_config = pool_config or PoolConfig.from_env()
         self.pool: Optional[asyncpg.Pool] = None
+        # Read replicas (comma-separated SUPABASE_DB_REPLICA_URLS); reads round-robin across them
+        if replica_urls is None:
+            replica_urls = [u.strip() for u in os.getenv("SUPABASE_DB_REPLICA_URLS", "").split(",") if u.strip()]
+        self.replica_urls = [self._fix_connection_string(url) for url in replica_urls]
+        self.replica_pools: List[asyncpg.Pool] = []
+        self._next_replica = itertools.count()
+        # Connection pinned by an open transaction() in the current task
+        self._tx_connection: ContextVar = ContextVar(f"ward_tx_connection_{id(self)}", default=None)
     
     def _fix_connection_string(self, conn_str: str) -> str:
         """Fix connection string for serverless compatibility"""
@@ -52,10 +123,7 @@ class SupabaseAdapter:
             return conn_str
     
     async def connect(self):
-        """Create connection pool"""
-        # For serverless, use minimal pool size
-        # Disable prepared statements for pgbouncer compatibility
-        
+        """Create connection pool (sizing and statement cache come from the DB_POOL_PROFILE profile)"""
         # Debug: Print connection info (without password)
         try:
             parsed = urlparse(self.connection_string)
@@ -68,1397 +136,651 @@ class SupabaseAdapter:
             raise RuntimeError("SUPABASE_DB_URL environment variable is not set!")
         
         try:
-            # Try with SSL first (Supabase requires SSL)
-            self.pool = await asyncpg.create_pool(
-                self.connection_string,
-                min_size=1,
-                max_size=5,  # Smaller pool for serverless
-                command_timeout=30,
-                statement_cache_size=0,  # Disable prepared statements for pgbouncer
-                ssl='require'  # Supabase requires SSL
-            )
-            print("Connected to Supabase PostgreSQL (SSL)")
-        except Exception as ssl_error:
-            print(f"SSL connection failed: {ssl_error}, trying without SSL requirement...")
+            self.pool = await create_pool(self.connection_string, self.pool_config, init=self._init_connection)
+        except Exception as e:
+            print(f"Database connection failed: {e}")
+            raise
+
+        # A replica that cannot be reached is skipped; its reads stay on the primary
+        for url in self.replica_urls:
             try:
-                # Fallback without strict SSL
-                self.pool = await asyncpg.create_pool(
-                    self.connection_string,
-                    min_size=1,
-                    max_size=5,
-                    command_timeout=30,
-                    statement_cache_size=0
-                )
-                print("Connected to Supabase PostgreSQL (no SSL)")
+                self.replica_pools.append(await create_pool(url, self.pool_config, init=self._init_connection))
             except Exception as e:
-                print(f"Database connection failed: {e}")
-                print(f"Connection string host: {parsed.hostname if 'parsed' in dir() else 'unknown'}")
-                print(f"Connection string port: {parsed.port if 'parsed' in dir() else 'unknown'}")
-                raise
+                print(f"Warning: Read replica {urlparse(url).hostname} unavailable: {e}")
+        if self.replica_pools:
+            print(f"Routing reads to {len(self.replica_pools)} read replica(s)")
+        print(
+            f"Connected to Supabase PostgreSQL (profile={self.pool_config.profile}, "
+            f"pool={self.pool_config.min_size}-{self.pool_config.max_size}, "
+            f"statement_cache={self.pool_config.statement_cache_size})"
+        )
     
     async def close(self):
-        """Close connection pool"""
+        """Close connection pools"""
+        for replica in self.replica_pools:
+            await replica.close()
+        self.replica_pools = []
         if self.pool:
             await self.pool.close()
             print("Closed Supabase connection")
-    
+
+    def _read_pool(self) -> asyncpg.Pool:
+        """Pool for a read: a replica, unless the request has written or asked for the primary"""
+        if not self.replica_pools or _read_primary.get():
+            return self.pool
+        return self.replica_pools[next(self._next_replica) % len(self.replica_pools)]
+
+    @asynccontextmanager
+    async def _acquire(self, read_only: bool = False):
+        """
+        Acquire a pooled connection, or reuse the one pinned by an open transaction.
+        read_only=True may route to a read replica; anything else marks the
+        request as having written, so its later reads use the primary.
+        """
+        conn = self._tx_connection.get()
+        if conn is not None:
+            yield conn
+            return
+
+        if not read_only:
+            _read_primary.set(True)
+        pool = self._read_pool() if read_only else self.pool
+        try:
+            conn = await pool.acquire()
+        except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            if pool is self.pool:
+                raise
+            print(f"Warning: Read replica unavailable, reading from primary: {e}")
+            pool = self.pool
+            conn = await pool.acquire()
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Unit of work: every adapter call made inside the block runs on one
+        connection within one transaction, committed on exit and rolled back
+        if the block raises. Nested blocks become savepoints.
+
+        The pinned connection is tracked per task, so do not fan out with
+        asyncio.gather() inside the block - a connection runs one statement
+        at a time.
+        """
+        if not self.pool:
+            raise RuntimeError("Database not connected")
+
+        _read_primary.set(True)
+        conn = self._tx_connection.get()
+        if conn is not None:
+            async with conn.transaction():
+                yield conn
+            return
+
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                token = self._tx_connection.set(conn)
+                try:
+                    yield conn
+                finally:
+                    self._tx_connection.reset(token)
+    
+    @staticmethod
+    async def _init_connection(conn: asyncpg.Connection):
+        """
+        Register type codecs on every new pool connection so rows decode in C:
+        json/jsonb <-> Python objects and uuid <-> str. Callers pass dicts and
+        lists straight through as parameters - never pre-encoded JSON strings.
+        """
+        for type_name in ("json", "jsonb"):
+            await conn.set_type_codec(
+                type_name,
+                encoder=_json_dumps,
+                decoder=_json_loads,
+                schema="pg_catalog"
+            )
+        await conn.set_type_codec(
+            "uuid",
+            encoder=str,
+            decoder=str,
+            schema="pg_catalog",
+            format="text"
+        )
+
     def _serialize_value(self, value: Any) -> Any:
         """Convert Python types to PostgreSQL-compatible types"""
-        if isinstance(value, datetime):
-            return value
-        if isinstance(value, dict):
-            return json.dumps(value)
-        if isinstance(value, list):
-            return json.dumps(value)
         if isinstance(value, UUID):
             return str(value)
+        # datetimes, dicts and lists are handled by asyncpg and the JSON codecs
         return value
     
     def _deserialize_doc(self, row: asyncpg.Record) -> Dict[str, Any]:
         """Convert PostgreSQL row to dict (similar to MongoDB document)"""
-        doc = {}
-        for key, value in row.items():
-            if isinstance(value, str):
-                # Try to parse JSON fields
-                if key in ['disruption_details', 'shipment_identifiers', 'financial_impact', 
-                          'structured_context', 'responsibility', 'rca', 'enhanced_rca',
-                          'metadata', 'analysis', 'stakeholders', 'evidence_score_breakdown',
-                          'decision_framing', 'known_inputs', 'declared_assumptions',
-                          'alternatives', 'risk_and_downside', 'recommendation', 'content_snapshot',
-                          'payload', 'data', 'address', 'location', 'contact_info', 'gps', 'settings']:
-                    try:
-                        doc[key] = json.loads(value) if value else {}
-                    except:
-                        doc[key] = value
-                else:
-                    doc[key] = value
-            elif isinstance(value, UUID):
-                doc[key] = str(value)
-            elif isinstance(value, datetime):
-                doc[key] = value
-            else:
-                doc[key] = value
+        # Codecs already decoded JSON and UUID columns; just copy the record
+        doc = dict(row)
         
         # Always set _id from id for MongoDB compatibility
-        if "id" in doc and "_id" not in doc:
-            doc["_id"] = doc["id"]
-        
+        if "id" in doc:
+            doc.setdefault("_id", doc["id"])
+
         return doc
-    
-    # Users operations
-    async def users_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one user"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        try:
-            async with self.pool.acquire() as conn:
-                if "_id" in query or "id" in query:
-                    # Handle both _id (MongoDB-style) and id (PostgreSQL-style)
-                    user_id = query.get("_id") or query.get("id")
-                    if isinstance(user_id, str):
-                        try:
-                            user_id = UUID(user_id)
-                        except ValueError:
-                            # Invalid UUID format
-                            return None
-                    row = await conn.fetchrow(
-                        "SELECT * FROM users WHERE id = $1",
-                        user_id
-                    )
-                elif "email" in query:
-                    row = await conn.fetchrow(
-                        "SELECT * FROM users WHERE email = $1",
-                        query["email"]
-                    )
-                else:
-                    return None
-                
-                if row:
-                    result = self._deserialize_doc(row)
-                    # Ensure _id is set for compatibility (MongoDB-style)
-                    # PostgreSQL uses 'id' (UUID), but code expects '_id'
-                    if "id" in result:
-                        result["_id"] = result["id"]  # Always set _id from id
-                    return result
-                return None
-        except Exception as e:
-            print(f"users_find_one error: {e}, query: {query}")
-            import traceback
-            traceback.print_exc()
-            raise
-    
-    async def users_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one user, return ID"""
+
+    # Generic table operations, driven by the specs in db_tables
+    def __getattr__(self, name: str):
+        """
+        Resolve legacy per-table methods such as facilities_find_one(query)
+        or documents_count_documents(query) to the generic methods below.
+        """
+        for suffix, method in _LEGACY_METHODS:
+            table = name[:-len(suffix)]
+            if name.endswith(suffix) and table in TABLES:
+                return functools.partial(getattr(self, method), table)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    async def find(self, table: str, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Find rows matching a MongoDB-style query. Falls back to the table's
+        default sort and limit; limit=0 means no limit.
+        """
         if not self.pool:
             raise RuntimeError("Database not connected")
-        
+
+        spec = get_table(table)
+        sort = normalize_sort(sort) or spec.default_sort
+        limit = spec.default_limit if limit is None else limit
+        sql, binders = compile_select(spec, query_shape(query), sort, bool(limit))
         try:
-            async with self.pool.acquire() as conn:
-                user_id = uuid4()
-                await conn.execute(
-                    """INSERT INTO users (id, email, password_hash, created_at)
-                       VALUES ($1, $2, $3, $4)""",
-                    user_id,
-                    doc["email"],
-                    doc["password_hash"],
-                    doc.get("created_at", datetime.now(timezone.utc))
-                )
-                return str(user_id)
-        except Exception as e:
-            print(f"users_insert_one error: {e}")
-            import traceback
-            traceback.print_exc()
-            raise
-    
-    # Cases operations
-    async def cases_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one case"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "_id" in query:
-                conditions.append(f"id = ${param_idx}")
-                params.append(UUID(query["_id"]))
-                param_idx += 1
-            if "operator_id" in query:
-                conditions.append(f"operator_id = ${param_idx}")
-                params.append(UUID(query["operator_id"]))
-                param_idx += 1
-            if "status" in query:
-                conditions.append(f"status = ${param_idx}")
-                params.append(query["status"])
-                param_idx += 1
-            if "decision_owner_email" in query:
-                conditions.append(f"decision_owner_email = ${param_idx}")
-                params.append(query["decision_owner_email"])
-                param_idx += 1
-            
-            if not conditions:
-                return None
-            
-            sql = f"SELECT * FROM cases WHERE {' AND '.join(conditions)} LIMIT 1"
-            row = await conn.fetchrow(sql, *params)
-            return self._deserialize_doc(row) if row else None
-    
-    async def cases_find(self, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find cases"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "operator_id" in query:
-                conditions.append(f"operator_id = ${param_idx}")
-                params.append(UUID(query["operator_id"]))
-                param_idx += 1
-            if "status" in query:
-                conditions.append(f"status = ${param_idx}")
-                params.append(query["status"])
-                param_idx += 1
-            if "decision_owner_email" in query:
-                conditions.append(f"decision_owner_email = ${param_idx}")
-                params.append(query["decision_owner_email"])
-                param_idx += 1
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            
-            order_clause = ""
-            if sort:
-                for field, direction in sort:
-                    dir_str = "DESC" if direction == -1 else "ASC"
-                    order_clause = f"ORDER BY {field} {dir_str}"
-            
-            limit_clause = f"LIMIT {limit}" if limit else ""
-            
-            sql = f"SELECT * FROM cases {where_clause} {order_clause} {limit_clause}"
-            rows = await conn.fetch(sql, *params)
-            return [self._deserialize_doc(row) for row in rows]
-    
-    async def cases_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one case, return ID"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            case_id = uuid4()
-            await conn.execute(
-                """INSERT INTO cases (
-                    id, operator_id, operator_email, description, status,
-                    disruption_details, shipment_identifiers, financial_impact,
-                    structured_context, created_at, updated_at,
-                    decision_owner_id, decision_owner_email, voice_transcript,
-                    created_via, coordination_status, stakeholders
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17)""",
-                case_id,
-                UUID(doc["operator_id"]) if doc.get("operator_id") else None,
-                doc["operator_email"],
-                doc["description"],
-                doc.get("status", "REPORTED"),
-                json.dumps(doc.get("disruption_details", {})),
-                json.dumps(doc.get("shipment_identifiers", {})),
-                json.dumps(doc.get("financial_impact")) if doc.get("financial_impact") else None,
-                json.dumps(doc.get("structured_context")) if doc.get("structured_context") else None,
-                doc.get("created_at", datetime.now(timezone.utc)),
-                doc.get("updated_at", datetime.now(timezone.utc)),
-                UUID(doc["decision_owner_id"]) if doc.get("decision_owner_id") else None,
-                doc.get("decision_owner_email"),
-                doc.get("voice_transcript"),
-                doc.get("created_via"),
-                doc.get("coordination_status"),
-                json.dumps(doc.get("stakeholders")) if doc.get("stakeholders") else None
-            )
-            return str(case_id)
-    
-    async def cases_update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
-        """Update one case"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            # Build WHERE clause
-            where_conditions = []
-            params = []
-            param_idx = 1
-            
-            if "_id" in query:
-                where_conditions.append(f"id = ${param_idx}")
-                params.append(UUID(query["_id"]))
-                param_idx += 1
-            
-            if not where_conditions:
-                return False
-            
-            # Build SET clause
-            set_clauses = []
-            set_values = update.get("$set", {})
-            
-            for key, value in set_values.items():
-                if key in ['disruption_details', 'shipment_identifiers', 'financial_impact',
-                          'structured_context', 'responsibility', 'rca', 'enhanced_rca',
-                          'stakeholders', 'evidence_score_breakdown']:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(json.dumps(value) if value else None)
-                else:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(value)
-                param_idx += 1
-            
-            if not set_clauses:
-                return False
-            
-            sql = f"UPDATE cases SET {', '.join(set_clauses)} WHERE {' AND '.join(where_conditions)}"
-            result = await conn.execute(sql, *params)
-            return result != "UPDATE 0"
-    
-    # Timeline events operations
-    async def timeline_events_find(self, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find timeline events"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "case_id" in query:
-                conditions.append(f"case_id = ${param_idx}")
-                params.append(UUID(query["case_id"]))
-                param_idx += 1
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            
-            order_clause = ""
-            if sort:
-                for field, direction in sort:
-                    dir_str = "DESC" if direction == -1 else "ASC"
-                    order_clause = f"ORDER BY {field} {dir_str}"
-            
-            limit_clause = f"LIMIT {limit}" if limit else ""
-            
-            sql = f"SELECT * FROM timeline_events {where_clause} {order_clause} {limit_clause}"
-            rows = await conn.fetch(sql, *params)
-            return [self._deserialize_doc(row) for row in rows]
-    
-    async def timeline_events_find_one(self, query: Dict[str, Any], sort: Optional[List] = None) -> Optional[Dict[str, Any]]:
-        """Find one timeline event"""
-        results = await self.timeline_events_find(query, sort=sort, limit=1)
-        return results[0] if results else None
-    
-    async def timeline_events_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one timeline event"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            event_id = uuid4()
-            await conn.execute(
-                """INSERT INTO timeline_events (
-                    id, case_id, actor, action, content, source_type,
-                    reliability, metadata, timestamp
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)""",
-                event_id,
-                UUID(doc["case_id"]),
-                doc["actor"],
-                doc["action"],
-                doc["content"],
-                doc["source_type"],
-                doc["reliability"],
-                json.dumps(doc.get("metadata", {})),
-                doc.get("timestamp", datetime.now(timezone.utc))
-            )
-            return str(event_id)
-    
-    # Audit entries operations
-    async def audit_entries_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one audit entry"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            entry_id = uuid4()
-            await conn.execute(
-                """INSERT INTO audit_entries (id, case_id, actor, action, payload, timestamp)
-                   VALUES ($1, $2, $3, $4, $5, $6)""",
-                entry_id,
-                doc["case_id"],
-                doc["actor"],
-                doc["action"],
-                json.dumps(doc.get("payload", {})),
-                doc.get("timestamp", datetime.now(timezone.utc))
-            )
-            return str(entry_id)
-    
-    async def audit_entries_find(self, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find audit entries"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "case_id" in query:
-                if isinstance(query["case_id"], dict) and "$in" in query["case_id"]:
-                    # Handle $in operator
-                    case_ids = [str(cid) for cid in query["case_id"]["$in"]]
-                    placeholders = [f"${i}" for i in range(param_idx, param_idx + len(case_ids))]
-                    conditions.append(f"case_id IN ({', '.join(placeholders)})")
-                    params.extend(case_ids)
-                    param_idx += len(case_ids)
-                else:
-                    conditions.append(f"case_id = ${param_idx}")
-                    params.append(str(query["case_id"]))
-                    param_idx += 1
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            
-            order_clause = ""
-            if sort:
-                for field, direction in sort:
-                    dir_str = "DESC" if direction == -1 else "ASC"
-                    order_clause = f"ORDER BY {field} {dir_str}"
-            
-            limit_clause = f"LIMIT {limit}" if limit else ""
-            
-            sql = f"SELECT * FROM audit_entries {where_clause} {order_clause} {limit_clause}"
-            rows = await conn.fetch(sql, *params)
-            return [self._deserialize_doc(row) for row in rows]
-    
-    # Documents operations
-    async def documents_find(self, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find documents"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "case_id" in query:
-                conditions.append(f"case_id = ${param_idx}")
-                params.append(UUID(query["case_id"]))
-                param_idx += 1
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            
-            order_clause = ""
-            if sort:
-                for field, direction in sort:
-                    dir_str = "DESC" if direction == -1 else "ASC"
-                    order_clause = f"ORDER BY {field} {dir_str}"
-            
-            limit_clause = f"LIMIT {limit}" if limit else ""
-            
-            sql = f"SELECT * FROM documents {where_clause} {order_clause} {limit_clause}"
-            rows = await conn.fetch(sql, *params)
-            return [self._deserialize_doc(row) for row in rows]
-    
-    async def documents_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one document"""
-        results = await self.documents_find(query, limit=1)
-        return results[0] if results else None
-    
-    async def documents_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one document"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            doc_id = uuid4()
-            await conn.execute(
-                """INSERT INTO documents (
-                    id, case_id, filename, doc_type, analysis, uploaded_at, uploaded_by
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7)""",
-                doc_id,
-                UUID(doc["case_id"]),
-                doc["filename"],
-                doc.get("doc_type"),
-                json.dumps(doc.get("analysis", {})) if doc.get("analysis") else None,
-                doc.get("uploaded_at", datetime.now(timezone.utc)),
-                doc["uploaded_by"]
-            )
-            return str(doc_id)
-    
-    async def documents_count_documents(self, query: Dict[str, Any]) -> int:
-        """Count documents"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "case_id" in query:
-                conditions.append(f"case_id = ${param_idx}")
-                params.append(UUID(query["case_id"]))
-                param_idx += 1
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            sql = f"SELECT COUNT(*) FROM documents {where_clause}"
-            count = await conn.fetchval(sql, *params)
-            return count
-    
-    # Drafts, approvals, decisions operations (similar pattern)
-    async def drafts_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one draft"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            if "case_id" in query:
-                row = await conn.fetchrow(
-                    "SELECT * FROM drafts WHERE case_id = $1",
-                    UUID(query["case_id"])
-                )
-                return self._deserialize_doc(row) if row else None
-            return None
-    
-    async def drafts_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one draft"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            draft_id = uuid4()
-            await conn.execute(
-                """INSERT INTO drafts (
-                    id, case_id, decision_framing, known_inputs, declared_assumptions,
-                    alternatives, risk_and_downside, recommendation, ai_model, created_at
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)""",
-                draft_id,
-                UUID(doc["case_id"]),
-                json.dumps(doc.get("decision_framing")) if doc.get("decision_framing") else None,
-                json.dumps(doc.get("known_inputs")) if doc.get("known_inputs") else None,
-                json.dumps(doc.get("declared_assumptions")) if doc.get("declared_assumptions") else None,
-                json.dumps(doc.get("alternatives")) if doc.get("alternatives") else None,
-                json.dumps(doc.get("risk_and_downside")) if doc.get("risk_and_downside") else None,
-                json.dumps(doc.get("recommendation")) if doc.get("recommendation") else None,
-                doc.get("ai_model"),
-                doc.get("created_at", datetime.now(timezone.utc))
-            )
-            return str(draft_id)
-    
-    async def drafts_update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
-        """Update one draft"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            where_conditions = []
-            params = []
-            param_idx = 1
-            
-            if "case_id" in query:
-                where_conditions.append(f"case_id = ${param_idx}")
-                params.append(UUID(query["case_id"]))
-                param_idx += 1
-            
-            if not where_conditions:
-                return False
-            
-            set_clauses = []
-            set_values = update.get("$set", {})
-            
-            for key, value in set_values.items():
-                if key in ['decision_framing', 'known_inputs', 'declared_assumptions',
-                          'alternatives', 'risk_and_downside', 'recommendation']:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(json.dumps(value) if value else None)
-                else:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(value)
-                param_idx += 1
-            
-            if not set_clauses:
-                return False
-            
-            sql = f"UPDATE drafts SET {', '.join(set_clauses)} WHERE {' AND '.join(where_conditions)}"
-            result = await conn.execute(sql, *params)
-            return result != "UPDATE 0"
-    
-    async def approvals_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one approval"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "case_id" in query:
-                conditions.append(f"case_id = ${param_idx}")
-                params.append(UUID(query["case_id"]))
-                param_idx += 1
-            if "section_key" in query:
-                conditions.append(f"section_key = ${param_idx}")
-                params.append(query["section_key"])
-                param_idx += 1
-            
-            if not conditions:
-                return None
-            
-            sql = f"SELECT * FROM approvals WHERE {' AND '.join(conditions)} LIMIT 1"
-            row = await conn.fetchrow(sql, *params)
-            return self._deserialize_doc(row) if row else None
-    
-    async def approvals_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one approval"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            approval_id = uuid4()
-            await conn.execute(
-                """INSERT INTO approvals (
-                    id, case_id, section_key, approved_by, approved_at, content_snapshot
-                ) VALUES ($1, $2, $3, $4, $5, $6)""",
-                approval_id,
-                UUID(doc["case_id"]),
-                doc["section_key"],
-                doc["approved_by"],
-                doc.get("approved_at", datetime.now(timezone.utc)),
-                json.dumps(doc.get("content_snapshot")) if doc.get("content_snapshot") else None
-            )
-            return str(approval_id)
-    
-    async def approvals_find(self, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find approvals"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "case_id" in query:
-                conditions.append(f"case_id = ${param_idx}")
-                params.append(UUID(query["case_id"]))
-                param_idx += 1
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            
-            order_clause = ""
-            if sort:
-                for field, direction in sort:
-                    dir_str = "DESC" if direction == -1 else "ASC"
-                    order_clause = f"ORDER BY {field} {dir_str}"
-            
-            limit_clause = f"LIMIT {limit}" if limit else ""
-            
-            sql = f"SELECT * FROM approvals {where_clause} {order_clause} {limit_clause}"
-            rows = await conn.fetch(sql, *params)
-            return [self._deserialize_doc(row) for row in rows]
-    
-    async def decisions_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one decision"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            if "case_id" in query:
-                row = await conn.fetchrow(
-                    "SELECT * FROM decisions WHERE case_id = $1",
-                    UUID(query["case_id"])
-                )
-                return self._deserialize_doc(row) if row else None
-            return None
-    
-    async def decisions_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one decision"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            decision_id = uuid4()
-            await conn.execute(
-                """INSERT INTO decisions (
-                    id, case_id, final_choice, is_override, override_rationale,
-                    recommended_choice, decided_by, decided_at
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)""",
-                decision_id,
-                UUID(doc["case_id"]),
-                doc["final_choice"],
-                doc.get("is_override", False),
-                doc.get("override_rationale"),
-                doc.get("recommended_choice"),
-                doc["decided_by"],
-                doc.get("decided_at", datetime.now(timezone.utc))
-            )
-            return str(decision_id)
-    
-    async def historical_find(self, sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find historical entries"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            order_clause = ""
-            if sort:
-                for field, direction in sort:
-                    dir_str = "DESC" if direction == -1 else "ASC"
-                    order_clause = f"ORDER BY {field} {dir_str}"
-            
-            limit_clause = f"LIMIT {limit}" if limit else ""
-            
-            sql = f"SELECT * FROM historical {order_clause} {limit_clause}"
-            rows = await conn.fetch(sql)
-            return [self._deserialize_doc(row) for row in rows]
-    
-    async def historical_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one historical entry"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            if "_id" in query:
-                row = await conn.fetchrow(
-                    "SELECT * FROM historical WHERE id = $1",
-                    UUID(query["_id"])
-                )
-                return self._deserialize_doc(row) if row else None
-            return None
-    
-    # MongoDB-like interface for compatibility
-    @property
-    def users(self):
-        return self
-    
-    @property
-    def cases(self):
-        return self
-    
-    @property
-    def timeline_events(self):
-        return self
-    
-    @property
-    def audit_entries(self):
-        return self
-    
-    @property
-    def documents(self):
-        return self
-    
-    @property
-    def drafts(self):
-        return self
-    
-    @property
-    def approvals(self):
-        return self
-    
-    @property
-    def decisions(self):
-        return self
-    
-    @property
-    def historical(self):
-        return self
-    
-    # Operator operations
-    async def operators_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one operator"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as conn:
-            if "_id" in query or "id" in query:
-                operator_id = UUID(query.get("_id") or query.get("id"))
-                row = await conn.fetchrow("SELECT * FROM operators WHERE id = $1", operator_id)
-            elif "email" in query:
-                row = await conn.fetchrow("SELECT * FROM operators WHERE email = $1", query["email"])
-            else:
-                return None
-            return self._deserialize_doc(row) if row else None
-
-    async def operators_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert operator"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as conn:
-            operator_id = UUID(doc.get("id") or uuid4())
-            await conn.execute(
-                """INSERT INTO operators (
-                    id, company_name, email, phone, fleet_size, account_type, settings, created_at, updated_at, created_by
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)""",
-                operator_id, doc["company_name"], doc["email"], doc.get("phone"),
-                doc.get("fleet_size", 0), doc.get("account_type", "pilot"),
-                json.dumps(doc.get("settings", {})),
-                doc.get("created_at", datetime.now(timezone.utc)),
-                doc.get("updated_at", datetime.now(timezone.utc)),
-                UUID(doc["created_by"]) if doc.get("created_by") else None
-            )
-            return str(operator_id)
+            params = bind(binders, query_operands(query))
+        except ValueError:
+            # A filter value that cannot be cast to its column (e.g. a malformed id) matches nothing
+            return []
+        if limit:
+            params.append(int(limit))
 
-    async def fleet_vehicles_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one fleet vehicle"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as conn:
-            if "_id" in query or "id" in query:
-                vehicle_id = UUID(query.get("_id") or query.get("id"))
-                row = await conn.fetchrow("SELECT * FROM fleet_vehicles WHERE id = $1", vehicle_id)
-            else:
-                return None
-            return self._deserialize_doc(row) if row else None
-
-    async def fleet_vehicles_find(self, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find fleet vehicles"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as conn:
-            sql = "SELECT * FROM fleet_vehicles WHERE 1=1"
-            params = []
-            param_idx = 1
-            
-            if "operator_id" in query:
-                sql += f" AND operator_id = ${param_idx}"
-                params.append(UUID(query["operator_id"]))
-                param_idx += 1
-            
-            if "vehicle_number" in query:
-                sql += f" AND vehicle_number = ${param_idx}"
-                params.append(query["vehicle_number"])
-                param_idx += 1
-            
-            if sort:
-                order_clause = self._build_order_clause(sort)
-                sql += f" ORDER BY {order_clause}"
-            else:
-                sql += " ORDER BY created_at DESC"
-            
-            if limit:
-                sql += f" LIMIT {limit}"
-            
+        async with self._acquire(read_only=True) as conn:
             rows = await conn.fetch(sql, *params)
             return [self._deserialize_doc(row) for row in rows]
 
-    async def fleet_vehicles_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert fleet vehicle"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as conn:
-            vehicle_id = UUID(doc.get("id") or uuid4())
-            await conn.execute(
-                """INSERT INTO fleet_vehicles (
-                    id, operator_id, vehicle_number, vehicle_type, driver_name, driver_phone, route, status, metadata, created_at, updated_at
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)""",
-                vehicle_id, UUID(doc["operator_id"]), doc["vehicle_number"], doc.get("vehicle_type", "truck"),
-                doc.get("driver_name"), doc.get("driver_phone"), doc.get("route"),
-                doc.get("status", "active"), json.dumps(doc.get("metadata", {})),
-                doc.get("created_at", datetime.now(timezone.utc)),
-                doc.get("updated_at", datetime.now(timezone.utc))
-            )
-            return str(vehicle_id)
+    async def find_one(self, table: str, query: Dict[str, Any], sort: Optional[List] = None) -> Optional[Dict[str, Any]]:
+        """Find the first row matching a query, or None"""
+        rows = await self.find(table, query, sort=sort, limit=1)
+        return rows[0] if rows else None
 
-    async def magic_links_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one magic link"""
+    async def count(self, table: str, query: Dict[str, Any]) -> int:
+        """Count rows matching a query"""
         if not self.pool:
             raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as conn:
-            if "token" in query:
-                row = await conn.fetchrow("SELECT * FROM magic_links WHERE token = $1", query["token"])
-            elif "_id" in query or "id" in query:
-                link_id = UUID(query.get("_id") or query.get("id"))
-                row = await conn.fetchrow("SELECT * FROM magic_links WHERE id = $1", link_id)
-            else:
-                return None
-            return self._deserialize_doc(row) if row else None
-
-    async def magic_links_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert magic link"""
+
+        sql, binders = compile_count(get_table(table), query_shape(query))
+        try:
+            params = bind(binders, query_operands(query))
+        except ValueError:
+            return 0
+
+        async with self._acquire(read_only=True) as conn:
+            return await conn.fetchval(sql, *params)
+
+    def _prepare_insert(self, spec, doc: Dict[str, Any]):
+        """
+        Map a document onto the table's columns for INSERT. Only known columns
+        are written; the spec's defaults fill missing columns and the rest fall
+        back to the database defaults.
+        Returns (columns, params, row_id, ignored_keys); raises ValueError for
+        missing required fields or values that do not fit their column.
+        """
+        values = {}
+        ignored = []
+        for key, value in doc.items():
+            column = spec.primary_key if key == "_id" else key
+            if column not in spec.columns:
+                ignored.append(key)
+                continue
+            values[column] = value
+        for column, default in spec.defaults.items():
+            if column not in values:
+                values[column] = default() if callable(default) else default
+
+        missing = [column for column in spec.required if values.get(column) is None]
+        if missing:
+            raise ValueError(f"Missing required {spec.name} fields: {', '.join(missing)}")
+
+        values[spec.primary_key] = values.get(spec.primary_key) or uuid4()
+
+        # Spec column order keeps one SQL string per column set
+        columns = tuple(column for column in spec.columns if column in values)
+        try:
+            params = [coerce_param(spec.columns[column], values[column]) for column in columns]
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid {spec.name} value: {e}")
+        return columns, params, params[columns.index(spec.primary_key)], ignored
+
+    async def insert_one(self, table: str, doc: Dict[str, Any]) -> str:
+        """Insert one row, return its ID"""
         if not self.pool:
             raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as conn:
-            link_id = UUID(doc.get("id") or uuid4())
-            await conn.execute(
-                """INSERT INTO magic_links (
-                    id, operator_id, vehicle_id, token, expires_at, used_count, max_uses, created_at, last_used_at
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)""",
-                link_id, UUID(doc["operator_id"]), UUID(doc["vehicle_id"]), doc["token"],
-                doc["expires_at"], doc.get("used_count", 0), doc.get("max_uses"),
-                doc.get("created_at", datetime.now(timezone.utc)), doc.get("last_used_at")
-            )
-            return str(link_id)
 
-    async def magic_links_update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
-        """Update magic link (e.g., increment used_count)"""
+        spec = get_table(table)
+        columns, params, row_id, ignored = self._prepare_insert(spec, doc)
+        for key in ignored:
+            print(f"Warning: Ignoring unknown {table} column in insert: {key}")
+
+        async with self._acquire() as conn:
+            await conn.execute(compile_insert(spec, columns), *params)
+        return str(row_id)
+
+    async def insert_many(self, table: str, docs: List[Dict[str, Any]]) -> Tuple[List[Optional[str]], Dict[int, str]]:
+        """
+        Insert many rows in one transaction using executemany, one statement
+        per distinct column set. If a batch fails, its rows are retried one by
+        one in savepoints so only the bad rows are rejected.
+
+        Returns (ids, errors): ids is aligned with docs (None where the row
+        failed) and errors maps the index of each failed doc to its message.
+        """
         if not self.pool:
             raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as conn:
-            where_conditions = []
-            params = []
-            param_idx = 1
-            
-            if "token" in query:
-                where_conditions.append(f"token = ${param_idx}")
-                params.append(query["token"])
-                param_idx += 1
-            
-            if not where_conditions:
-                return False
-            
-            set_clauses = []
-            set_values = update.get("$set", {})
-            for key, value in set_values.items():
-                set_clauses.append(f"{key} = ${param_idx}")
-                params.append(value)
-                param_idx += 1
-            
-            if not set_clauses:
-                return False
-            
-            sql = f"UPDATE magic_links SET {', '.join(set_clauses)} WHERE {' AND '.join(where_conditions)}"
-            result = await conn.execute(sql, *params)
-            return result != "UPDATE 0"
-    
-    async def operators_update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
-        """Update operator"""
+
+        spec = get_table(table)
+        ids: List[Optional[str]] = [None] * len(docs)
+        errors: Dict[int, str] = {}
+        batches: Dict[tuple, list] = {}
+        ignored_keys = set()
+
+        for index, doc in enumerate(docs):
+            try:
+                columns, params, row_id, ignored = self._prepare_insert(spec, doc)
+            except ValueError as e:
+                errors[index] = str(e)
+                continue
+            ignored_keys.update(ignored)
+            batches.setdefault(columns, []).append((index, params, row_id))
+
+        for key in sorted(ignored_keys):
+            print(f"Warning: Ignoring unknown {table} column in insert: {key}")
+
+        if not batches:
+            return ids, errors
+
+        async with self.transaction() as conn:
+            for columns, rows in batches.items():
+                sql = compile_insert(spec, columns)
+                try:
+                    async with conn.transaction():
+                        await conn.executemany(sql, [params for _, params, _ in rows])
+                except asyncpg.PostgresError:
+                    for index, params, row_id in rows:
+                        try:
+                            async with conn.transaction():
+                                await conn.execute(sql, *params)
+                        except asyncpg.PostgresError as e:
+                            errors[index] = str(e)
+                            continue
+                        ids[index] = str(row_id)
+                    continue
+                for index, _, row_id in rows:
+                    ids[index] = str(row_id)
+
+        return ids, errors
+
+    async def update_one(self, table: str, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        """
+        Update the first row matching a query. Accepts {"$set": {...}},
+        {"$inc": {...}} (both may be combined) or a plain dict of new values;
+        unknown columns and operators are skipped.
+        """
         if not self.pool:
             raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as conn:
-            where_conditions = []
-            params = []
-            param_idx = 1
-            
-            if "_id" in query or "id" in query:
-                operator_id = UUID(query.get("_id") or query.get("id"))
-                where_conditions.append(f"id = ${param_idx}")
-                params.append(operator_id)
-                param_idx += 1
-            
-            if not where_conditions:
-                return False
-            
-            set_clauses = []
-            set_values = update.get("$set", {})
-            for key, value in set_values.items():
-                if key == "settings":
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(json.dumps(value) if value else "{}")
-                else:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(value)
-                param_idx += 1
-            
-            if not set_clauses:
-                return False
-            
-            sql = f"UPDATE operators SET {', '.join(set_clauses)} WHERE {' AND '.join(where_conditions)}"
+
+        spec = get_table(table)
+        if not query:
+            return False
+
+        if any(key.startswith("$") for key in update):
+            for operator in set(update) - {"$set", "$inc"}:
+                print(f"Warning: Ignoring unsupported {table} update operator: {operator}")
+            changes = {"$set": update.get("$set", {}), "$inc": update.get("$inc", {})}
+        else:
+            changes = {"$set": update, "$inc": {}}
+
+        values = {"$set": {}, "$inc": {}}
+        for operator, fields in changes.items():
+            for key, value in fields.items():
+                if key not in spec.columns or key == spec.primary_key:
+                    print(f"Warning: Ignoring unknown {table} column in update: {key}")
+                    continue
+                values[operator][key] = coerce_param(spec.columns[key], value)
+        set_values, inc_values = values["$set"], values["$inc"]
+        if not set_values and not inc_values:
+            return False
+
+        sql, binders = compile_update_one(spec, tuple(set_values), query_shape(query), tuple(inc_values))
+        try:
+            params = list(set_values.values()) + list(inc_values.values()) + bind(binders, query_operands(query))
+        except ValueError:
+            return False
+
+        async with self._acquire() as conn:
             result = await conn.execute(sql, *params)
             return result != "UPDATE 0"
-    
-    async def fleet_vehicles_update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
-        """Update fleet vehicle"""
+
+    async def delete_one(self, table: str, query: Dict[str, Any]) -> bool:
+        """Delete the first row matching a query"""
         if not self.pool:
             raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as conn:
-            where_conditions = []
-            params = []
-            param_idx = 1
-            
-            if "_id" in query or "id" in query:
-                vehicle_id = UUID(query.get("_id") or query.get("id"))
-                where_conditions.append(f"id = ${param_idx}")
-                params.append(vehicle_id)
-                param_idx += 1
-            
-            if not where_conditions:
-                return False
-            
-            set_clauses = []
-            set_values = update.get("$set", {})
-            for key, value in set_values.items():
-                if key == "metadata":
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(json.dumps(value) if value else "{}")
-                else:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(value)
-                param_idx += 1
-            
-            if not set_clauses:
-                return False
-            
-            sql = f"UPDATE fleet_vehicles SET {', '.join(set_clauses)} WHERE {' AND '.join(where_conditions)}"
+
+        spec = get_table(table)
+        if not query:
+            return False
+
+        sql, binders = compile_delete_one(spec, query_shape(query))
+        try:
+            params = bind(binders, query_operands(query))
+        except ValueError:
+            return False
+
+        async with self._acquire() as conn:
             result = await conn.execute(sql, *params)
-            return result != "UPDATE 0"
-    
-    # Facilities operations
-    async def facilities_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one facility"""
+            return result != "DELETE 0"
+
+    async def find_page(
+        self,
+        table: str,
+        query: Dict[str, Any],
+        limit: int,
+        after: Optional[tuple] = None,
+        descending: bool = True,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Find one page ordered by (sort_field, id), resuming after a keyset cursor"""
+        spec = get_table(table)
+        conditions, params, _ = build_conditions(spec, query)
+        return await self._fetch_page(
+            table, conditions, params, spec.sort_field, limit,
+            after=after, descending=descending, offset=offset
+        )
+
+    # Special-purpose queries
+    async def cases_load_detail(
+        self,
+        case_id: str,
+        operator_id: str,
+        timeline_limit: int = 500,
+        timeline_after: Optional[tuple] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Load a case with its timeline, draft, approvals and decision in one
+        round trip. Related rows are aggregated with json_agg subqueries and
+        timestamps are decoded back to datetimes, as a plain find returns them.
+        The timeline is newest first and holds up to timeline_limit + 1 events
+        (the extra one signals another page); approvals are oldest first.
+        Returns None if the case does not exist or belongs to another operator.
+        """
         if not self.pool:
             raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            if "_id" in query or "id" in query:
-                facility_id = query.get("_id") or query.get("id")
-                if isinstance(facility_id, str):
-                    try:
-                        facility_id = UUID(facility_id)
-                    except ValueError:
-                        return None
-                row = await conn.fetchrow("SELECT * FROM facilities WHERE id = $1", facility_id)
-                return self._deserialize_doc(row) if row else None
-            elif "code" in query:
-                row = await conn.fetchrow("SELECT * FROM facilities WHERE code = $1", query["code"])
-                return self._deserialize_doc(row) if row else None
+
+        params = [UUID(str(case_id)), UUID(str(operator_id))]
+        keyset_clause = ""
+        if timeline_after:
+            keyset_clause = "AND (timestamp, id) < ($3, $4)"
+            params.extend([timeline_after[0], timeline_after[1]])
+        params.append(timeline_limit + 1)
+        limit_param = f"${len(params)}"
+
+        sql = f"""
+            SELECT
+                row_to_json(c) AS case_doc,
+                (SELECT COALESCE(json_agg(t ORDER BY t.timestamp DESC, t.id DESC), '[]'::json)
+                   FROM (SELECT * FROM timeline_events
+                          WHERE case_id = c.id {keyset_clause}
+                          ORDER BY timestamp DESC, id DESC
+                          LIMIT {limit_param}) t) AS timeline,
+                (SELECT row_to_json(d) FROM drafts d WHERE d.case_id = c.id LIMIT 1) AS draft,
+                (SELECT COALESCE(json_agg(a ORDER BY a.approved_at, a.id), '[]'::json)
+                   FROM (SELECT * FROM approvals WHERE case_id = c.id
+                          ORDER BY approved_at, id LIMIT 100) a) AS approvals,
+                (SELECT row_to_json(x) FROM decisions x WHERE x.case_id = c.id LIMIT 1) AS decision
+            FROM cases c
+            WHERE c.id = $1 AND c.operator_id = $2
+        """
+
+        async with self._acquire(read_only=True) as conn:
+            row = await conn.fetchrow(sql, *params)
+
+        if not row:
             return None
-    
-    async def facilities_find(self, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find facilities"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "type" in query:
-                conditions.append(f"type = ${param_idx}")
-                params.append(query["type"])
-                param_idx += 1
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            order_clause = "ORDER BY name ASC"
-            if sort:
-                for field, direction in sort:
-                    dir_str = "DESC" if direction == -1 else "ASC"
-                    order_clause = f"ORDER BY {field} {dir_str}"
-            
-            limit_clause = f"LIMIT {limit}" if limit else ""
-            sql = f"SELECT * FROM facilities {where_clause} {order_clause} {limit_clause}"
-            rows = await conn.fetch(sql, *params)
-            return [self._deserialize_doc(row) for row in rows]
-    
-    async def facilities_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one facility"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            facility_id = uuid4()
-            await conn.execute(
-                """INSERT INTO facilities (
-                    id, external_id, name, type, code, address, location, metadata, created_by
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)""",
-                facility_id,
-                doc.get("external_id"),
-                doc["name"],
-                doc["type"],
-                doc.get("code"),
-                json.dumps(doc.get("address")) if doc.get("address") else None,
-                json.dumps(doc.get("location")) if doc.get("location") else None,
-                json.dumps(doc.get("metadata", {})) if doc.get("metadata") else "{}",
-                UUID(doc["created_by"]) if doc.get("created_by") else None
-            )
-            return str(facility_id)
-    
-    async def facilities_update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
-        """Update one facility"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            facility_id = query.get("_id") or query.get("id")
-            if isinstance(facility_id, str):
-                facility_id = UUID(facility_id)
-            
-            # Extract $set from MongoDB-style update
-            set_values = update.get("$set", update)
-            
-            set_clauses = []
-            params = []
-            param_idx = 1
-            
-            for key, value in set_values.items():
-                if key in ["address", "location", "metadata"]:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(json.dumps(value) if value else None)
-                else:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(value)
-                param_idx += 1
-            
-            if not set_clauses:
-                return False
-            
-            params.append(facility_id)
-            sql = f"UPDATE facilities SET {', '.join(set_clauses)} WHERE id = ${param_idx}"
-            result = await conn.execute(sql, *params)
-            return result == "UPDATE 1"
-    
-    # Parties operations
-    async def parties_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one party"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            if "_id" in query or "id" in query:
-                party_id = query.get("_id") or query.get("id")
-                if isinstance(party_id, str):
-                    try:
-                        party_id = UUID(party_id)
-                    except ValueError:
-                        return None
-                row = await conn.fetchrow("SELECT * FROM parties WHERE id = $1", party_id)
-                return self._deserialize_doc(row) if row else None
-            elif "code" in query:
-                row = await conn.fetchrow("SELECT * FROM parties WHERE code = $1", query["code"])
-                return self._deserialize_doc(row) if row else None
+
+        return {
+            "case": self._json_doc(row["case_doc"], "cases"),
+            "timeline": [self._json_doc(event, "timeline_events") for event in self._json_value(row["timeline"])],
+            "draft": self._json_doc(row["draft"], "drafts"),
+            "approvals": [self._json_doc(approval, "approvals") for approval in self._json_value(row["approvals"])],
+            "decision": self._json_doc(row["decision"], "decisions"),
+        }
+
+    def _json_value(self, value: Any) -> Any:
+        """Decode a json column value (asyncpg returns json as text without a codec)"""
+        return json.loads(value) if isinstance(value, str) else value
+
+    def _json_doc(self, value: Any, table: str) -> Optional[Dict[str, Any]]:
+        """
+        Decode a row_to_json document and add the MongoDB-style _id.
+        JSON carries timestamps as strings; timestamptz columns of the table
+        are restored to datetimes.
+        """
+        doc = self._json_value(value)
+        if doc is None:
             return None
-    
-    async def parties_find(self, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find parties"""
+        for column, column_type in get_table(table).columns.items():
+            if column_type == "timestamptz" and isinstance(doc.get(column), str):
+                doc[column] = datetime.fromisoformat(doc[column])
+        if "id" in doc and "_id" not in doc:
+            doc["_id"] = doc["id"]
+        return doc
+
+    async def _fetch_page(
+        self,
+        table: str,
+        conditions: List[str],
+        params: List[Any],
+        sort_field: str,
+        limit: int,
+        after: Optional[tuple] = None,
+        descending: bool = True,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch up to limit + 1 rows ordered by (sort_field, id).
+        The extra row tells the caller whether another page exists.
+        `after` is the (sort_value, id) of the last row of the previous page.
+        """
         if not self.pool:
             raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "type" in query:
-                conditions.append(f"type = ${param_idx}")
-                params.append(query["type"])
-                param_idx += 1
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            order_clause = "ORDER BY name ASC"
-            if sort:
-                for field, direction in sort:
-                    dir_str = "DESC" if direction == -1 else "ASC"
-                    order_clause = f"ORDER BY {field} {dir_str}"
-            
-            limit_clause = f"LIMIT {limit}" if limit else ""
-            sql = f"SELECT * FROM parties {where_clause} {order_clause} {limit_clause}"
+
+        conditions = list(conditions)
+        params = list(params)
+        param_idx = len(params) + 1
+
+        if after:
+            comparison = "<" if descending else ">"
+            conditions.append(f"({sort_field}, id) {comparison} (${param_idx}, ${param_idx + 1})")
+            params.extend([after[0], after[1]])
+            param_idx += 2
+
+        direction = "DESC" if descending else "ASC"
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"SELECT * FROM {table} {where_clause} ORDER BY {sort_field} {direction}, id {direction} LIMIT ${param_idx}"
+        params.append(limit + 1)
+
+        if offset and not after:
+            sql += f" OFFSET ${param_idx + 1}"
+            params.append(offset)
+
+        async with self._acquire(read_only=True) as conn:
             rows = await conn.fetch(sql, *params)
             return [self._deserialize_doc(row) for row in rows]
-    
-    async def parties_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one party"""
+
+    async def timeline_events_find_latest(self, case_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Find the most recent timeline event for each case in one query"""
         if not self.pool:
             raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            party_id = uuid4()
-            await conn.execute(
-                """INSERT INTO parties (
-                    id, external_id, name, type, code, contact_info, metadata, created_by
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)""",
-                party_id,
-                doc.get("external_id"),
-                doc["name"],
-                doc["type"],
-                doc.get("code"),
-                json.dumps(doc.get("contact_info")) if doc.get("contact_info") else None,
-                json.dumps(doc.get("metadata", {})) if doc.get("metadata") else "{}",
-                UUID(doc["created_by"]) if doc.get("created_by") else None
+
+        if not case_ids:
+            return {}
+
+        async with self._acquire(read_only=True) as conn:
+            # DISTINCT ON walks idx_timeline_events_case_timestamp once per case
+            rows = await conn.fetch(
+                """SELECT DISTINCT ON (case_id) * FROM timeline_events
+                   WHERE case_id = ANY($1::uuid[])
+                   ORDER BY case_id, timestamp DESC""",
+                [UUID(str(cid)) for cid in case_ids]
             )
-            return str(party_id)
-    
-    async def parties_update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
-        """Update one party"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            party_id = query.get("_id") or query.get("id")
-            if isinstance(party_id, str):
-                party_id = UUID(party_id)
-            
-            # Extract $set from MongoDB-style update
-            set_values = update.get("$set", update)
-            
-            set_clauses = []
-            params = []
-            param_idx = 1
-            
-            for key, value in set_values.items():
-                if key in ["contact_info", "metadata"]:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(json.dumps(value) if value else None)
-                else:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(value)
-                param_idx += 1
-            
-            if not set_clauses:
-                return False
-            
-            params.append(party_id)
-            sql = f"UPDATE parties SET {', '.join(set_clauses)} WHERE id = ${param_idx}"
-            result = await conn.execute(sql, *params)
-            return result == "UPDATE 1"
-    
-    # DisputePackets operations
-    async def dispute_packets_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one dispute packet"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            if "_id" in query or "id" in query:
-                packet_id = query.get("_id") or query.get("id")
-                if isinstance(packet_id, str):
-                    try:
-                        packet_id = UUID(packet_id)
-                    except ValueError:
-                        return None
-                row = await conn.fetchrow("SELECT * FROM dispute_packets WHERE id = $1", packet_id)
-                return self._deserialize_doc(row) if row else None
-            return None
-    
-    async def dispute_packets_find(self, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find dispute packets"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "movement_id" in query:
-                conditions.append(f"movement_id = ${param_idx}")
-                params.append(UUID(query["movement_id"]))
-                param_idx += 1
-            
-            if "status" in query:
-                conditions.append(f"status = ${param_idx}")
-                params.append(query["status"])
-                param_idx += 1
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            order_clause = "ORDER BY created_at DESC"
-            if sort:
-                for field, direction in sort:
-                    dir_str = "DESC" if direction == -1 else "ASC"
-                    order_clause = f"ORDER BY {field} {dir_str}"
-            
-            limit_clause = f"LIMIT {limit}" if limit else ""
-            sql = f"SELECT * FROM dispute_packets {where_clause} {order_clause} {limit_clause}"
-            rows = await conn.fetch(sql, *params)
-            return [self._deserialize_doc(row) for row in rows]
-    
-    async def dispute_packets_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one dispute packet"""
+            latest = {}
+            for row in rows:
+                doc = self._deserialize_doc(row)
+                latest[str(doc["case_id"])] = doc
+            return latest
+
+    async def magic_links_add_usage(self, usage: Dict[str, Tuple[int, datetime]]) -> int:
+        """
+        Add coalesced use counts to magic links in one statement.
+        usage maps token -> (uses, last_used_at). Returns the number of links updated.
+        """
         if not self.pool:
             raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            packet_id = uuid4()
-            # Convert UUID arrays
-            selected_events = [UUID(e) for e in doc.get("selected_events", [])] if doc.get("selected_events") else []
-            selected_attachments = [UUID(a) for a in doc.get("selected_attachments", [])] if doc.get("selected_attachments") else []
-            
-            await conn.execute(
-                """INSERT INTO dispute_packets (
-                    id, movement_id, external_id, invoice_id, template_type, status,
-                    selected_events, selected_attachments, narrative, generated_at,
-                    submitted_at, resolved_at, outcome, outcome_amount, metadata, created_by
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16)""",
-                packet_id,
-                UUID(doc["movement_id"]),
-                doc.get("external_id"),
-                doc.get("invoice_id"),
-                doc.get("template_type"),
-                doc.get("status", "draft"),
-                selected_events,
-                selected_attachments,
-                doc.get("narrative"),
-                doc.get("generated_at"),
-                doc.get("submitted_at"),
-                doc.get("resolved_at"),
-                doc.get("outcome"),
-                doc.get("outcome_amount"),
-                json.dumps(doc.get("metadata", {})) if doc.get("metadata") else "{}",
-                UUID(doc["created_by"]) if doc.get("created_by") else None
+
+        if not usage:
+            return 0
+
+        tokens = list(usage)
+        async with self._acquire() as conn:
+            result = await conn.execute(
+                """UPDATE magic_links AS m
+                   SET used_count = COALESCE(m.used_count, 0) + u.uses,
+                       last_used_at = GREATEST(m.last_used_at, u.last_used_at)
+                   FROM unnest($1::text[], $2::integer[], $3::timestamptz[]) AS u(token, uses, last_used_at)
+                   WHERE m.token = u.token""",
+                tokens,
+                [usage[token][0] for token in tokens],
+                [usage[token][1] for token in tokens]
             )
-            return str(packet_id)
-    
-    async def dispute_packets_update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
-        """Update one dispute packet"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            packet_id = query.get("_id") or query.get("id")
-            if isinstance(packet_id, str):
-                packet_id = UUID(packet_id)
-            
-            # Extract $set from MongoDB-style update
-            set_values = update.get("$set", update)
-            
-            set_clauses = []
-            params = []
-            param_idx = 1
-            
-            for key, value in set_values.items():
-                if key == "selected_events" and value:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append([UUID(e) for e in value])
-                elif key == "selected_attachments" and value:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append([UUID(a) for a in value])
-                elif key == "metadata":
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(json.dumps(value) if value else "{}")
-                else:
-                    set_clauses.append(f"{key} = ${param_idx}")
-                    params.append(value)
-                param_idx += 1
-            
-            if not set_clauses:
-                return False
-            
-            params.append(packet_id)
-            sql = f"UPDATE dispute_packets SET {', '.join(set_clauses)} WHERE id = ${param_idx}"
-            result = await conn.execute(sql, *params)
-            return result == "UPDATE 1"
-    
-    # Attachments operations
-    async def attachments_find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find one attachment"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            if "_id" in query or "id" in query:
-                attachment_id = query.get("_id") or query.get("id")
-                if isinstance(attachment_id, str):
-                    try:
-                        attachment_id = UUID(attachment_id)
-                    except ValueError:
-                        return None
-                row = await conn.fetchrow("SELECT * FROM attachments WHERE id = $1", attachment_id)
-                return self._deserialize_doc(row) if row else None
-            return None
-    
-    async def attachments_find(self, query: Dict[str, Any], sort: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Find attachments"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            conditions = []
-            params = []
-            param_idx = 1
-            
-            if "event_id" in query:
-                conditions.append(f"event_id = ${param_idx}")
-                params.append(UUID(query["event_id"]))
-                param_idx += 1
-            
-            if "movement_id" in query:
-                conditions.append(f"movement_id = ${param_idx}")
-                params.append(UUID(query["movement_id"]))
-                param_idx += 1
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            order_clause = "ORDER BY created_at DESC"
-            if sort:
-                for field, direction in sort:
-                    dir_str = "DESC" if direction == -1 else "ASC"
-                    order_clause = f"ORDER BY {field} {dir_str}"
-            
-            limit_clause = f"LIMIT {limit}" if limit else ""
-            sql = f"SELECT * FROM attachments {where_clause} {order_clause} {limit_clause}"
-            rows = await conn.fetch(sql, *params)
-            return [self._deserialize_doc(row) for row in rows]
-    
-    async def attachments_insert_one(self, doc: Dict[str, Any]) -> str:
-        """Insert one attachment"""
+            return int(result.split()[-1]) if result else 0
+
+    async def resolution_stats_refresh(self, since: Optional[datetime] = None, samples: int = 5) -> int:
+        """
+        Recompute resolution_stats for every (operator, disruption type) with a
+        resolved case updated after since (all of them when since is None).
+        Rows are written per lane and per type. Returns the number of rows
+        written.
+        """
         if not self.pool:
             raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            attachment_id = uuid4()
-            await conn.execute(
-                """INSERT INTO attachments (
-                    id, event_id, movement_id, filename, file_type, mime_type,
-                    file_size, storage_url, storage_key, metadata, uploaded_by
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)""",
-                attachment_id,
-                UUID(doc["event_id"]) if doc.get("event_id") else None,
-                UUID(doc["movement_id"]) if doc.get("movement_id") else None,
-                doc["filename"],
-                doc["file_type"],
-                doc.get("mime_type"),
-                doc.get("file_size"),
-                doc.get("storage_url"),
-                doc.get("storage_key"),
-                json.dumps(doc.get("metadata", {})) if doc.get("metadata") else "{}",
-                UUID(doc["uploaded_by"]) if doc.get("uploaded_by") else None
+
+        async with self._acquire() as conn:
+            result = await conn.execute(
+                """WITH touched AS (
+                       SELECT DISTINCT operator_id, disruption_details->>'disruption_type' AS disruption_type
+                       FROM cases
+                       WHERE status = 'RESOLVED'
+                         AND operator_id IS NOT NULL
+                         AND disruption_details->>'disruption_type' IS NOT NULL
+                         AND ($1::timestamptz IS NULL OR updated_at > $1)
+                   ),
+                   resolved AS (
+                       SELECT c.id::text AS case_id,
+                              c.operator_id,
+                              t.disruption_type,
+                              COALESCE(lower(trim(c.lane)), '') AS lane,
+                              NULLIF(trim(c.rca->>'root_cause'), '') AS root_cause,
+                              COALESCE(r.resolved_at, c.updated_at) AS resolved_at,
+                              GREATEST(EXTRACT(EPOCH FROM COALESCE(r.resolved_at, c.updated_at) - c.created_at) / 3600.0, 0)::double precision AS hours
+                       FROM cases c
+                       JOIN touched t
+                         ON c.operator_id = t.operator_id
+                        AND c.disruption_details->>'disruption_type' = t.disruption_type
+                       LEFT JOIN LATERAL (
+                           SELECT max(a.timestamp) AS resolved_at
+                           FROM audit_entries a
+                           WHERE a.case_id = c.id::text
+                             AND a.action = 'STATE_TRANSITION'
+                             AND a.payload->>'to_state' = 'RESOLVED'
+                       ) r ON true
+                       WHERE c.status = 'RESOLVED'
+                   ),
+                   grouped AS (
+                       SELECT operator_id, disruption_type,
+                              COALESCE(lane, '*') AS lane,
+                              count(*) AS case_count,
+                              percentile_cont(ARRAY[0.5, 0.75, 0.9]) WITHIN GROUP (ORDER BY hours) AS percentiles,
+                              (array_agg(case_id ORDER BY resolved_at DESC))[1:$2] AS sample_case_ids,
+                              max(resolved_at) AS last_resolved_at
+                       FROM resolved
+                       GROUP BY GROUPING SETS (
+                           (operator_id, disruption_type, lane),
+                           (operator_id, disruption_type)
+                       )
+                   ),
+                   cause_counts AS (
+                       SELECT operator_id, disruption_type,
+                              COALESCE(lane, '*') AS lane,
+                              root_cause,
+                              count(*) AS n
+                       FROM resolved
+                       WHERE root_cause IS NOT NULL
+                       GROUP BY GROUPING SETS (
+                           (operator_id, disruption_type, lane, root_cause),
+                           (operator_id, disruption_type, root_cause)
+                       )
+                   ),
+                   top_causes AS (
+                       SELECT operator_id, disruption_type, lane,
+                              jsonb_agg(jsonb_build_object('root_cause', root_cause, 'count', n) ORDER BY n DESC, root_cause) AS top_root_causes
+                       FROM (
+                           SELECT *, row_number() OVER (
+                               PARTITION BY operator_id, disruption_type, lane ORDER BY n DESC, root_cause
+                           ) AS cause_rank
+                           FROM cause_counts
+                       ) ranked
+                       WHERE cause_rank <= 3
+                       GROUP BY operator_id, disruption_type, lane
+                   )
+                   INSERT INTO resolution_stats (
+                       operator_id, disruption_type, lane, case_count,
+                       p50_hours, p75_hours, p90_hours, top_root_causes,
+                       sample_case_ids, last_resolved_at, updated_at
+                   )
+                   SELECT g.operator_id, g.disruption_type, g.lane, g.case_count,
+                          g.percentiles[1], g.percentiles[2], g.percentiles[3],
+                          COALESCE(c.top_root_causes, '[]'::jsonb),
+                          g.sample_case_ids, g.last_resolved_at, NOW()
+                   FROM grouped g
+                   LEFT JOIN top_causes c USING (operator_id, disruption_type, lane)
+                   ON CONFLICT (operator_id, disruption_type, lane) DO UPDATE SET
+                       case_count = EXCLUDED.case_count,
+                       p50_hours = EXCLUDED.p50_hours,
+                       p75_hours = EXCLUDED.p75_hours,
+                       p90_hours = EXCLUDED.p90_hours,
+                       top_root_causes = EXCLUDED.top_root_causes,
+                       sample_case_ids = EXCLUDED.sample_case_ids,
+                       last_resolved_at = EXCLUDED.last_resolved_at,
+                       updated_at = EXCLUDED.updated_at""",
+                since,
+                samples
             )
-            return str(attachment_id)
-    
-    async def attachments_delete_one(self, query: Dict[str, Any]) -> bool:
-        """Delete one attachment"""
-        if not self.pool:
-            raise RuntimeError("Database not connected")
-        
-        async with self.pool.acquire() as conn:
-            attachment_id = query.get("_id") or query.get("id")
-            if isinstance(attachment_id, str):
-                attachment_id = UUID(attachment_id)
-            
-            result = await conn.execute("DELETE FROM attachments WHERE id = $1", attachment_id)
-            return result == "DELETE 1"
+            return int(result.split()[-1]) if result else 0
+
+    async def audit_entries_find_page(self, query: Dict[str, Any], limit: int, after: Optional[tuple] = None, descending: bool = True) -> List[Dict[str, Any]]:
+        """
+        Find one page of audit entries ordered by (timestamp, id).
+        Filter by "case_id", or by "operator_id" to cover every case the operator owns.
+        """
+        query = dict(query)
+        operator_id = query.pop("operator_id", None)
+        conditions, params, param_idx = build_conditions(get_table("audit_entries"), query)
+        if operator_id is not None:
+            conditions.append(f"case_id IN (SELECT id::text FROM cases WHERE operator_id = ${param_idx})")
+            params.append(UUID(str(operator_id)))
 
+        return await self._fetch_page("audit_entries", conditions, params, "timestamp", limit, after=after, descending=descending)
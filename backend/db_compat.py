@@ -3,9 +3,10 @@ Database Compatibility Layer
 Makes Supabase adapter work with existing MongoDB-style code
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Awaitable, Callable, Dict, Any, List, Optional
 from db_adapter import SupabaseAdapter
-from uuid import UUID
+from db_tables import get_table
+from pagination import decode_cursor, split_page
 
 
 class DBCursor:
@@ -30,237 +31,177 @@ class DBCursor:
         return self
 
 
+class InsertResult:
+    """MongoDB-style insert_one result"""
+
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class InsertManyResult:
+    """
+    MongoDB-style insert_many result. inserted_ids holds the IDs of the rows
+    that were written; errors maps the index of each rejected document to
+    its error message.
+    """
+
+    def __init__(self, inserted_ids, errors):
+        self.inserted_ids = inserted_ids
+        self.errors = errors
+
+
+class UpdateResult:
+    """MongoDB-style update_one result"""
+
+    def __init__(self, matched_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = matched_count
+        self.upserted_id = upserted_id
+
+
 class DBCollection:
     """Mimics MongoDB collection for compatibility"""
     
-    def __init__(self, adapter: SupabaseAdapter, collection_name: str):
+    def __init__(
+        self,
+        adapter: SupabaseAdapter,
+        collection_name: str,
+        write_hooks: Optional[List[Callable[[Dict[str, Any]], Awaitable[None]]]] = None
+    ):
         self.adapter = adapter
         self.collection_name = collection_name
+        self.write_hooks = write_hooks if write_hooks is not None else []
+
+    @property
+    def spec(self):
+        """Table spec backing this collection"""
+        return get_table(self.collection_name)
     
     async def find_one(self, query: Dict[str, Any], sort: Optional[List] = None):
         """Find one document"""
-        # Convert ObjectId strings to UUID format if needed
         query = self._convert_query(query)
-        
-        if self.collection_name == "users":
-            return await self.adapter.users_find_one(query)
-        elif self.collection_name == "cases":
-            return await self.adapter.cases_find_one(query)
-        elif self.collection_name == "timeline_events":
-            return await self.adapter.timeline_events_find_one(query, sort=sort)
-        elif self.collection_name == "audit_entries":
-            return None  # Not implemented yet
-        elif self.collection_name == "documents":
-            return await self.adapter.documents_find_one(query)
-        elif self.collection_name == "drafts":
-            return await self.adapter.drafts_find_one(query)
-        elif self.collection_name == "approvals":
-            return await self.adapter.approvals_find_one(query)
-        elif self.collection_name == "decisions":
-            return await self.adapter.decisions_find_one(query)
-        elif self.collection_name == "historical":
-            return await self.adapter.historical_find_one(query)
-        elif self.collection_name == "facilities":
-            return await self.adapter.facilities_find_one(query)
-        elif self.collection_name == "parties":
-            return await self.adapter.parties_find_one(query)
-        elif self.collection_name == "dispute_packets":
-            return await self.adapter.dispute_packets_find_one(query)
-        elif self.collection_name == "attachments":
-            return await self.adapter.attachments_find_one(query)
-        elif self.collection_name == "operators":
-            return await self.adapter.operators_find_one(query)
-        elif self.collection_name == "fleet_vehicles":
-            return await self.adapter.fleet_vehicles_find_one(query)
-        elif self.collection_name == "magic_links":
-            return await self.adapter.magic_links_find_one(query)
-        else:
-            raise NotImplementedError(f"Collection {self.collection_name} not implemented")
+        return await self.adapter.find_one(self.collection_name, query, sort=sort)
     
     async def find(self, query: Dict[str, Any] = None, sort: Optional[List] = None, limit: Optional[int] = None):
-        """Find documents"""
-        if query is None:
-            query = {}
-        
-        query = self._convert_query(query)
-        
-        if self.collection_name == "users":
-            results = []  # Not implemented
-        elif self.collection_name == "cases":
-            # Use provided sort/limit or defaults
-            sort = sort or [("updated_at", -1)]
-            limit = limit or 100
-            results = await self.adapter.cases_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "timeline_events":
-            sort = sort or [("timestamp", -1)]
-            results = await self.adapter.timeline_events_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "audit_entries":
-            sort = sort or [("timestamp", -1)]
-            results = await self.adapter.audit_entries_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "documents":
-            sort = sort or [("uploaded_at", -1)]
-            results = await self.adapter.documents_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "approvals":
-            results = await self.adapter.approvals_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "historical":
-            sort = sort or [("created_at", -1)]
-            limit = limit or 20
-            results = await self.adapter.historical_find(sort=sort, limit=limit)
-        elif self.collection_name == "facilities":
-            sort = sort or [("name", 1)]
-            results = await self.adapter.facilities_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "parties":
-            sort = sort or [("name", 1)]
-            results = await self.adapter.parties_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "dispute_packets":
-            sort = sort or [("created_at", -1)]
-            results = await self.adapter.dispute_packets_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "attachments":
-            sort = sort or [("created_at", -1)]
-            results = await self.adapter.attachments_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "events":
-            results = await self.adapter.events_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "fleet_vehicles":
-            results = await self.adapter.fleet_vehicles_find(query, sort=sort, limit=limit)
-        elif self.collection_name == "operators":
-            # Operators don't have a find method yet, return empty for now
-            results = []
-        elif self.collection_name == "magic_links":
-            # Magic links don't have a find method yet, return empty for now
-            results = []
-        else:
-            raise NotImplementedError(f"Collection {self.collection_name} not implemented")
-        
+        """Find documents (default sort and limit come from the table spec; limit=0 means no limit)"""
+        query = self._convert_query(query or {})
+        results = await self.adapter.find(self.collection_name, query, sort=sort, limit=limit)
         return DBCursor(results)
-    
+
+    async def find_page(
+        self,
+        query: Dict[str, Any] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+        ascending: bool = False
+    ):
+        """
+        Find one page using keyset pagination over (sort_field, id), where
+        sort_field is the leading column of the table's default sort.
+        Returns (documents, next_cursor); next_cursor is None on the last page.
+        Raises ValueError for a malformed cursor.
+        """
+        query = self._convert_query(query or {})
+        spec = get_table(self.collection_name)
+        after = decode_cursor(cursor, spec.columns[spec.sort_field]) if cursor else None
+
+        if self.collection_name == "audit_entries":
+            # Supports the virtual "operator_id" filter
+            rows = await self.adapter.audit_entries_find_page(query, limit, after=after, descending=not ascending)
+        else:
+            rows = await self.adapter.find_page(
+                self.collection_name, query, limit, after=after, descending=not ascending, offset=offset
+            )
+
+        return split_page(rows, limit, self.spec.sort_field)
+
+    async def find_latest_by_case(self, case_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Find the newest document per case_id, keyed by case_id"""
+        if self.collection_name == "timeline_events":
+            return await self.adapter.timeline_events_find_latest([str(cid) for cid in case_ids])
+        raise NotImplementedError(f"find_latest_by_case not implemented for {self.collection_name}")
+
     async def insert_one(self, doc: Dict[str, Any]):
         """Insert one document"""
-        method_map = {
-            "users": self.adapter.users_insert_one,
-            "cases": self.adapter.cases_insert_one,
-            "timeline_events": self.adapter.timeline_events_insert_one,
-            "audit_entries": self.adapter.audit_entries_insert_one,
-            "documents": self.adapter.documents_insert_one,
-            "drafts": self.adapter.drafts_insert_one,
-            "approvals": self.adapter.approvals_insert_one,
-            "decisions": self.adapter.decisions_insert_one,
-            "facilities": self.adapter.facilities_insert_one,
-            "parties": self.adapter.parties_insert_one,
-            "dispute_packets": self.adapter.dispute_packets_insert_one,
-            "attachments": self.adapter.attachments_insert_one,
-            "operators": self.adapter.operators_insert_one,
-            "fleet_vehicles": self.adapter.fleet_vehicles_insert_one,
-            "magic_links": self.adapter.magic_links_insert_one,
-        }
-        
-        method = method_map.get(self.collection_name)
-        if not method:
-            raise NotImplementedError(f"Collection {self.collection_name} not implemented")
-        
-        # Convert ObjectId to UUID if needed
         doc = self._convert_doc(doc)
-        doc_id = await method(doc)
-        
-        # Return MongoDB-style result
-        class InsertResult:
-            def __init__(self, inserted_id):
-                self.inserted_id = inserted_id
-        
+        doc_id = await self.adapter.insert_one(self.collection_name, doc)
+        await self._after_write({"_id": doc_id})
         return InsertResult(doc_id)
     
+    async def insert_many(self, docs: List[Dict[str, Any]]):
+        """Insert many documents in one round trip per column set; bad rows are reported, not raised"""
+        ids, errors = await self.adapter.insert_many(
+            self.collection_name, [self._convert_doc(doc) for doc in docs]
+        )
+        inserted_ids = [doc_id for doc_id in ids if doc_id is not None]
+        for doc_id in inserted_ids:
+            await self._after_write({"_id": doc_id})
+        return InsertManyResult(inserted_ids, errors)
+
     async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
         """Update one document"""
-        method_map = {
-            "cases": self.adapter.cases_update_one,
-            "drafts": self.adapter.drafts_update_one,
-            "facilities": self.adapter.facilities_update_one,
-            "parties": self.adapter.parties_update_one,
-            "dispute_packets": self.adapter.dispute_packets_update_one,
-            "operators": self.adapter.operators_update_one if hasattr(self.adapter, 'operators_update_one') else None,
-            "fleet_vehicles": self.adapter.fleet_vehicles_update_one if hasattr(self.adapter, 'fleet_vehicles_update_one') else None,
-            "magic_links": self.adapter.magic_links_update_one if hasattr(self.adapter, 'magic_links_update_one') else None,
-        }
-        
-        method = method_map.get(self.collection_name)
-        if not method:
-            # For master_data collections, handle upsert by inserting if not exists
-            if upsert and self.collection_name.startswith("master_"):
-                existing = await self.find_one(query)
-                if not existing:
-                    doc = update.get("$set", {})
-                    doc.update(query)
-                    result = await self.insert_one(doc)
-                    class UpdateResult:
-                        def __init__(self, matched_count, upserted_id=None):
-                            self.matched_count = matched_count
-                            self.modified_count = matched_count
-                            self.upserted_id = upserted_id
-                    return UpdateResult(0, result.inserted_id)
-                else:
-                    # Document exists but no update method - return success
-                    class UpdateResult:
-                        def __init__(self, matched_count):
-                            self.matched_count = matched_count
-                            self.modified_count = matched_count
-                    return UpdateResult(1)
-            raise NotImplementedError(f"Collection {self.collection_name} not implemented")
-        
         query = self._convert_query(query)
         
         # Handle upsert: try update first, if no match and upsert=True, insert
         if upsert:
-            # Check if document exists
             existing = await self.find_one(query)
             if not existing:
-                # Insert instead
-                doc = update.get("$set", {})
                 # Merge query fields into doc for insert
+                doc = dict(update.get("$set", {}))
                 doc.update(query)
                 result = await self.insert_one(doc)
-                class UpdateResult:
-                    def __init__(self, matched_count, upserted_id=None):
-                        self.matched_count = matched_count
-                        self.modified_count = matched_count
-                        self.upserted_id = upserted_id
                 return UpdateResult(0, result.inserted_id)
         
-        # Extract $set from MongoDB-style update
-        update_dict = update.get("$set", update) if isinstance(update, dict) else update
-        result = await method(query, update_dict)
-        
-        # Return MongoDB-style result
-        class UpdateResult:
-            def __init__(self, matched_count):
-                self.matched_count = matched_count
-                self.modified_count = matched_count
-        
+        result = await self.adapter.update_one(self.collection_name, query, update)
+        if result:
+            await self._after_write(query)
         return UpdateResult(1 if result else 0)
-    
-    def count_documents(self, query: Dict[str, Any] = None):
+
+    async def count_documents(self, query: Dict[str, Any] = None) -> int:
         """Count documents"""
         if query is None:
             query = {}
         
-        if self.collection_name == "documents":
-            return self.adapter.documents_count_documents(query)
-        # For others, use find and count
-        cursor = self.find(query)
-        return len(cursor.results)
+        query = self._convert_query(query)
+        
+        return await self.adapter.count(self.collection_name, query)
     
+    async def _after_write(self, query: Dict[str, Any]):
+        """Run write hooks with a query matching the written document"""
+        for hook in self.write_hooks:
+            await hook(query)
+
     def create_index(self, field: str, **kwargs):
         """Create index (no-op, indexes created in migration)"""
         return None
     
     def _convert_query(self, query: Dict[str, Any]) -> Dict[str, Any]:
-        """Convert MongoDB query to Supabase query"""
+        """
+        Convert MongoDB query to Supabase query.
+
+        Nested sub-documents are flattened into dotted paths, so
+        {"disruption_details": {"disruption_type": "x"}} becomes
+        {"disruption_details.disruption_type": "x"}. Operator dicts such as
+        {"$in": [...]} or {"$gte": dt} are passed through for the adapter to
+        compile into SQL.
+        """
         converted = {}
         for key, value in query.items():
             if key == "_id":
-                # Convert ObjectId string to UUID
-                if isinstance(value, str):
-                    converted["_id"] = value
+                # Convert ObjectId/UUID values to strings
+                if isinstance(value, dict):
+                    converted["_id"] = {
+                        op: [str(v) for v in operand] if isinstance(operand, (list, tuple, set)) else (
+                            str(operand) if operand is not None else None
+                        )
+                        for op, operand in value.items()
+                    }
                 else:
-                    converted["_id"] = str(value)
+                    converted["_id"] = value if isinstance(value, str) else str(value)
+            elif isinstance(value, dict) and value and not any(k.startswith("$") for k in value):
+                nested = self._convert_query({f"{key}.{k}": v for k, v in value.items()})
+                converted.update(nested)
             else:
                 converted[key] = value
         return converted
@@ -282,11 +223,55 @@ class DBDatabase:
     def __init__(self, adapter: SupabaseAdapter):
         self.adapter = adapter
         self._collections = {}
+        self._write_hooks: Dict[str, List[Callable[[Dict[str, Any]], Awaitable[None]]]] = {}
+
+    def on_write(self, collection_name: str, hook: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """
+        Register an async hook run after each insert or update in a collection,
+        e.g. to invalidate caches. The hook receives the write's query
+        ({"_id": new_id} for inserts), which may not name the document's ID.
+        """
+        self._write_hooks.setdefault(collection_name, []).append(hook)
     
+    async def load_case_detail(
+        self,
+        case_id: str,
+        operator_id: str,
+        timeline_limit: int = 500,
+        timeline_cursor: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Load a case with timeline, draft, approvals and decision in one query.
+        Adds "timeline_next_cursor" for paging through older timeline events.
+        Raises ValueError for a malformed cursor.
+        """
+        after = decode_cursor(timeline_cursor) if timeline_cursor else None
+        detail = await self.adapter.cases_load_detail(
+            case_id, operator_id, timeline_limit=timeline_limit, timeline_after=after
+        )
+        if detail is None:
+            return None
+        detail["timeline"], detail["timeline_next_cursor"] = split_page(
+            detail["timeline"], timeline_limit, "timestamp"
+        )
+        return detail
+
+    def transaction(self):
+        """
+        Unit of work: run a group of writes on one connection in one transaction.
+
+            async with db.transaction():
+                await db.timeline_events.insert_one(event)
+                await db.cases.update_one({"_id": case_id}, {"$set": {"updated_at": now}})
+        """
+        return self.adapter.transaction()
+
     def __getitem__(self, collection_name: str) -> DBCollection:
         """Get collection"""
         if collection_name not in self._collections:
-            self._collections[collection_name] = DBCollection(self.adapter, collection_name)
+            self._collections[collection_name] = DBCollection(
+                self.adapter, collection_name, self._write_hooks.setdefault(collection_name, [])
+            )
         return self._collections[collection_name]
     
     def __getattr__(self, collection_name: str) -> DBCollection:
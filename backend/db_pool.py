@@ -0,0 +1,146 @@
+"""
+Connection Pool Configuration
+Env-driven pool profiles for the Supabase adapter.
+
+DB_POOL_PROFILE selects a profile:
+  serverless-pgbouncer  (default) Supavisor/PgBouncer transaction mode, port 6543.
+                        Tiny pool, prepared statements disabled.
+  session-pooler        Supavisor session mode, port 5432 on *.pooler.supabase.com.
+                        Prepared statements are safe; moderate pool.
+  direct                Direct connection from long-running workers.
+                        Large statement cache and pool.
+
+DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_STATEMENT_CACHE_SIZE and
+DB_COMMAND_TIMEOUT override individual settings. DB_SSL_MODE (require,
+prefer, disable) skips SSL negotiation fallbacks entirely.
+"""
+
+import logging
+import os
+import ssl
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """Settings passed to asyncpg.create_pool"""
+    profile: str
+    min_size: int
+    max_size: int
+    statement_cache_size: int
+    command_timeout: float = 30
+    ssl_mode: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, env: Optional[Dict[str, str]] = None) -> "PoolConfig":
+        """Build a config from DB_POOL_PROFILE and the DB_* overrides"""
+        env = os.environ if env is None else env
+        name = env.get("DB_POOL_PROFILE", DEFAULT_PROFILE).strip().lower()
+        if name not in POOL_PROFILES:
+            logger.warning("Unknown DB_POOL_PROFILE %r, using %s", name, DEFAULT_PROFILE)
+            name = DEFAULT_PROFILE
+        config = POOL_PROFILES[name]
+
+        overrides = {}
+        for field_name, env_name, cast in (
+            ("min_size", "DB_POOL_MIN_SIZE", int),
+            ("max_size", "DB_POOL_MAX_SIZE", int),
+            ("statement_cache_size", "DB_STATEMENT_CACHE_SIZE", int),
+            ("command_timeout", "DB_COMMAND_TIMEOUT", float),
+        ):
+            if env.get(env_name):
+                try:
+                    overrides[field_name] = cast(env[env_name])
+                except ValueError:
+                    logger.warning("Ignoring invalid %s=%r", env_name, env[env_name])
+        ssl_mode = env.get("DB_SSL_MODE", "").strip().lower()
+        if ssl_mode:
+            if ssl_mode in SSL_MODES:
+                overrides["ssl_mode"] = ssl_mode
+            else:
+                logger.warning("Ignoring invalid DB_SSL_MODE=%r", ssl_mode)
+
+        config = replace(config, **overrides)
+        if config.min_size > config.max_size:
+            config = replace(config, min_size=config.max_size)
+        return config
+
+
+DEFAULT_PROFILE = "serverless-pgbouncer"
+
+POOL_PROFILES = {
+    # Transaction-mode poolers reassign server connections per transaction,
+    # so named prepared statements would leak between clients
+    "serverless-pgbouncer": PoolConfig("serverless-pgbouncer", min_size=1, max_size=5, statement_cache_size=0),
+    "session-pooler": PoolConfig("session-pooler", min_size=2, max_size=10, statement_cache_size=100),
+    "direct": PoolConfig("direct", min_size=2, max_size=20, statement_cache_size=500),
+}
+
+# asyncpg ssl values in the order they are tried when DB_SSL_MODE is not set
+SSL_MODES = ("require", "prefer", "disable")
+
+# SSL mode that last connected successfully, per (host, port), for this process
+_ssl_mode_by_host: Dict[Tuple[Optional[str], int], str] = {}
+
+
+def _host_key(dsn: str) -> Tuple[Optional[str], int]:
+    parsed = urlparse(dsn)
+    return parsed.hostname, parsed.port or 5432
+
+
+def _is_ssl_error(error: Exception) -> bool:
+    """True when a connect failure is about SSL negotiation rather than credentials or DNS"""
+    if isinstance(error, ssl.SSLError):
+        return True
+    if isinstance(error, (asyncpg.InvalidPasswordError, asyncpg.InvalidAuthorizationSpecificationError)):
+        return False
+    return "ssl" in str(error).lower()
+
+
+async def create_pool(
+    dsn: str,
+    config: PoolConfig,
+    init: Optional[Callable[[Any], Any]] = None
+) -> asyncpg.Pool:
+    """
+    Create a pool using the config. Without DB_SSL_MODE, tries the SSL mode
+    that worked last time for this host first and only falls back to the
+    next mode on SSL negotiation errors, so a bad password or host fails
+    after one attempt.
+    """
+    host = _host_key(dsn)
+    if config.ssl_mode:
+        modes = [config.ssl_mode]
+    else:
+        remembered = _ssl_mode_by_host.get(host)
+        modes = [remembered] if remembered else list(SSL_MODES[:2])
+
+    last_error: Optional[Exception] = None
+    for mode in modes:
+        try:
+            pool = await asyncpg.create_pool(
+                dsn,
+                min_size=config.min_size,
+                max_size=config.max_size,
+                command_timeout=config.command_timeout,
+                statement_cache_size=config.statement_cache_size,
+                ssl=False if mode == "disable" else mode,
+                init=init
+            )
+        except Exception as e:
+            last_error = e
+            _ssl_mode_by_host.pop(host, None)
+            if not _is_ssl_error(e):
+                break
+            logger.warning("Connection with ssl=%s failed: %s", mode, e)
+            continue
+        _ssl_mode_by_host[host] = mode
+        return pool
+
+    raise last_error
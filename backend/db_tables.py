@@ -0,0 +1,442 @@
+"""
+Table Registry
+Declarative specs for every table the MongoDB-style compat layer can reach.
+The adapter's generic find/insert/update methods and the query compiler are
+driven entirely by these specs - adding a table means adding a TableSpec here.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass(frozen=True, eq=False)
+class TableSpec:
+    """
+    Shape of one table.
+
+    columns maps column name -> PostgreSQL type (uuid, text, integer, bigint,
+    numeric, boolean, timestamptz, jsonb, text[], uuid[]). defaults are applied
+    on insert when a column is missing; callables are invoked per insert.
+    filters limits which columns may appear in a query (None = any column).
+    Specs hash by identity, so compiled SQL can be cached per spec.
+    """
+    name: str
+    columns: Dict[str, str]
+    primary_key: str = "id"
+    default_sort: Tuple[Tuple[str, int], ...] = ()
+    default_limit: Optional[int] = None
+    filters: Optional[FrozenSet[str]] = None
+    defaults: Dict[str, Any] = field(default_factory=dict)
+    required: Tuple[str, ...] = ()
+
+    @property
+    def json_columns(self) -> FrozenSet[str]:
+        return frozenset(col for col, col_type in self.columns.items() if col_type == "jsonb")
+
+    @property
+    def sort_field(self) -> str:
+        """Leading sort column; keyset pages are ordered by (sort_field, id)"""
+        return self.default_sort[0][0] if self.default_sort else self.primary_key
+
+
+# Columns of the cases table and their PostgreSQL types.
+# "_id" is accepted as an alias for "id" (MongoDB compatibility).
+CASE_COLUMNS = {
+    "id": "uuid",
+    "operator_id": "uuid",
+    "decision_owner_id": "uuid",
+    "vehicle_id": "uuid",
+    "status": "text",
+    "operator_email": "text",
+    "decision_owner_email": "text",
+    "coordination_status": "text",
+    "created_via": "text",
+    "external_id": "text",
+    "container_id": "text",
+    "truck_id": "text",
+    "bill_of_lading": "text",
+    "lane": "text",
+    "description": "text",
+    "voice_transcript": "text",
+    "rca_performed_by": "text",
+    "evidence_score": "integer",
+    "created_at": "timestamptz",
+    "updated_at": "timestamptz",
+    "evidence_ready_at": "timestamptz",
+    "rca_performed_at": "timestamptz",
+    "planned_start_date": "timestamptz",
+    "planned_end_date": "timestamptz",
+    "actual_start_date": "timestamptz",
+    "actual_end_date": "timestamptz",
+    "disruption_details": "jsonb",
+    "shipment_identifiers": "jsonb",
+    "financial_impact": "jsonb",
+    "structured_context": "jsonb",
+    "responsibility": "jsonb",
+    "rca": "jsonb",
+    "enhanced_rca": "jsonb",
+    "evidence_score_breakdown": "jsonb",
+    "stakeholders": "jsonb",
+}
+
+
+_SPECS = [
+    TableSpec(
+        name="users",
+        columns={
+            "id": "uuid",
+            "email": "text",
+            "password_hash": "text",
+            "created_at": "timestamptz",
+            "updated_at": "timestamptz",
+        },
+        default_sort=(("created_at", -1),),
+        filters=frozenset({"id", "email"}),
+        defaults={"created_at": _utcnow},
+        required=("email", "password_hash"),
+    ),
+    TableSpec(
+        name="cases",
+        columns=CASE_COLUMNS,
+        default_sort=(("updated_at", -1),),
+        default_limit=100,
+        defaults={
+            "status": "REPORTED",
+            "disruption_details": dict,
+            "shipment_identifiers": dict,
+            "created_at": _utcnow,
+            "updated_at": _utcnow,
+        },
+        required=("operator_email", "description"),
+    ),
+    TableSpec(
+        name="timeline_events",
+        columns={
+            "id": "uuid",
+            "case_id": "uuid",
+            "actor": "text",
+            "action": "text",
+            "content": "text",
+            "source_type": "text",
+            "reliability": "text",
+            "metadata": "jsonb",
+            "timestamp": "timestamptz",
+            "gps": "jsonb",
+            "device_id": "text",
+            "captured_at": "timestamptz",
+            "edited_at": "timestamptz",
+        },
+        default_sort=(("timestamp", -1),),
+        defaults={"metadata": dict, "timestamp": _utcnow},
+        required=("case_id", "actor", "action", "content", "source_type", "reliability"),
+    ),
+    TableSpec(
+        name="audit_entries",
+        columns={
+            "id": "uuid",
+            "case_id": "text",
+            "actor": "text",
+            "action": "text",
+            "payload": "jsonb",
+            "timestamp": "timestamptz",
+        },
+        default_sort=(("timestamp", -1),),
+        defaults={"payload": dict, "timestamp": _utcnow},
+        required=("case_id", "actor", "action"),
+    ),
+    TableSpec(
+        name="documents",
+        columns={
+            "id": "uuid",
+            "case_id": "uuid",
+            "filename": "text",
+            "doc_type": "text",
+            "analysis": "jsonb",
+            "uploaded_at": "timestamptz",
+            "uploaded_by": "text",
+        },
+        default_sort=(("uploaded_at", -1),),
+        defaults={"uploaded_at": _utcnow},
+        required=("case_id", "filename", "uploaded_by"),
+    ),
+    TableSpec(
+        name="drafts",
+        columns={
+            "id": "uuid",
+            "case_id": "uuid",
+            "decision_framing": "jsonb",
+            "known_inputs": "jsonb",
+            "declared_assumptions": "jsonb",
+            "alternatives": "jsonb",
+            "risk_and_downside": "jsonb",
+            "recommendation": "jsonb",
+            "ai_model": "text",
+            "created_at": "timestamptz",
+            "updated_at": "timestamptz",
+        },
+        default_sort=(("created_at", -1),),
+        defaults={"created_at": _utcnow},
+        required=("case_id",),
+    ),
+    TableSpec(
+        name="approvals",
+        columns={
+            "id": "uuid",
+            "case_id": "uuid",
+            "section_key": "text",
+            "approved_by": "text",
+            "approved_at": "timestamptz",
+            "content_snapshot": "jsonb",
+        },
+        default_sort=(("approved_at", 1),),
+        defaults={"approved_at": _utcnow},
+        required=("case_id", "section_key", "approved_by"),
+    ),
+    TableSpec(
+        name="decisions",
+        columns={
+            "id": "uuid",
+            "case_id": "uuid",
+            "final_choice": "text",
+            "is_override": "boolean",
+            "override_rationale": "text",
+            "recommended_choice": "text",
+            "decided_by": "text",
+            "decided_at": "timestamptz",
+        },
+        default_sort=(("decided_at", -1),),
+        defaults={"is_override": False, "decided_at": _utcnow},
+        required=("case_id", "final_choice", "decided_by"),
+    ),
+    TableSpec(
+        name="historical",
+        columns={
+            "id": "uuid",
+            "data": "jsonb",
+            "created_at": "timestamptz",
+        },
+        default_sort=(("created_at", -1),),
+        default_limit=20,
+        required=("data",),
+    ),
+    TableSpec(
+        name="master_data",
+        columns={
+            "id": "uuid",
+            "entity_type": "text",
+            "code": "text",
+            "name": "text",
+            "metadata": "jsonb",
+            "created_at": "timestamptz",
+        },
+        default_sort=(("name", 1),),
+        defaults={"metadata": dict},
+        required=("entity_type", "code", "name"),
+    ),
+    TableSpec(
+        name="facilities",
+        columns={
+            "id": "uuid",
+            "external_id": "text",
+            "name": "text",
+            "type": "text",
+            "code": "text",
+            "address": "jsonb",
+            "location": "jsonb",
+            "metadata": "jsonb",
+            "created_at": "timestamptz",
+            "updated_at": "timestamptz",
+            "created_by": "uuid",
+        },
+        default_sort=(("name", 1),),
+        defaults={"metadata": dict},
+        required=("name", "type"),
+    ),
+    TableSpec(
+        name="parties",
+        columns={
+            "id": "uuid",
+            "external_id": "text",
+            "name": "text",
+            "type": "text",
+            "code": "text",
+            "contact_info": "jsonb",
+            "metadata": "jsonb",
+            "created_at": "timestamptz",
+            "updated_at": "timestamptz",
+            "created_by": "uuid",
+        },
+        default_sort=(("name", 1),),
+        defaults={"metadata": dict},
+        required=("name", "type"),
+    ),
+    TableSpec(
+        name="dispute_packets",
+        columns={
+            "id": "uuid",
+            "movement_id": "uuid",
+            "external_id": "text",
+            "invoice_id": "text",
+            "template_type": "text",
+            "status": "text",
+            "selected_events": "uuid[]",
+            "selected_attachments": "uuid[]",
+            "narrative": "text",
+            "generated_at": "timestamptz",
+            "submitted_at": "timestamptz",
+            "resolved_at": "timestamptz",
+            "outcome": "text",
+            "outcome_amount": "numeric",
+            "metadata": "jsonb",
+            "created_at": "timestamptz",
+            "updated_at": "timestamptz",
+            "created_by": "uuid",
+        },
+        default_sort=(("created_at", -1),),
+        defaults={"status": "draft", "selected_events": list, "selected_attachments": list, "metadata": dict},
+        required=("movement_id",),
+    ),
+    TableSpec(
+        name="attachments",
+        columns={
+            "id": "uuid",
+            "event_id": "uuid",
+            "movement_id": "uuid",
+            "filename": "text",
+            "file_type": "text",
+            "mime_type": "text",
+            "file_size": "bigint",
+            "storage_url": "text",
+            "storage_key": "text",
+            "metadata": "jsonb",
+            "created_at": "timestamptz",
+            "uploaded_by": "uuid",
+        },
+        default_sort=(("created_at", -1),),
+        defaults={"metadata": dict},
+        required=("filename", "file_type"),
+    ),
+    TableSpec(
+        name="operators",
+        columns={
+            "id": "uuid",
+            "company_name": "text",
+            "email": "text",
+            "phone": "text",
+            "fleet_size": "integer",
+            "account_type": "text",
+            "settings": "jsonb",
+            "created_at": "timestamptz",
+            "updated_at": "timestamptz",
+            "created_by": "uuid",
+        },
+        default_sort=(("created_at", -1),),
+        defaults={"settings": dict, "created_at": _utcnow, "updated_at": _utcnow},
+        required=("company_name", "email"),
+    ),
+    TableSpec(
+        name="fleet_vehicles",
+        columns={
+            "id": "uuid",
+            "operator_id": "uuid",
+            "vehicle_number": "text",
+            "vehicle_type": "text",
+            "driver_name": "text",
+            "driver_phone": "text",
+            "route": "text",
+            "status": "text",
+            "metadata": "jsonb",
+            "created_at": "timestamptz",
+            "updated_at": "timestamptz",
+        },
+        default_sort=(("created_at", -1),),
+        defaults={"metadata": dict, "created_at": _utcnow, "updated_at": _utcnow},
+        required=("operator_id", "vehicle_number"),
+    ),
+    TableSpec(
+        name="magic_links",
+        columns={
+            "id": "uuid",
+            "operator_id": "uuid",
+            "vehicle_id": "uuid",
+            "token": "text",
+            "expires_at": "timestamptz",
+            "used_count": "integer",
+            "max_uses": "integer",
+            "created_at": "timestamptz",
+            "last_used_at": "timestamptz",
+        },
+        default_sort=(("created_at", -1),),
+        defaults={"used_count": 0, "created_at": _utcnow},
+        required=("token", "expires_at"),
+    ),
+    TableSpec(
+        name="webhooks",
+        columns={
+            "id": "uuid",
+            "operator_id": "uuid",
+            "user_id": "uuid",
+            "url": "text",
+            "events": "text[]",
+            "secret": "text",
+            "active": "boolean",
+            "last_triggered_at": "timestamptz",
+            "failure_count": "integer",
+            "created_at": "timestamptz",
+            "updated_at": "timestamptz",
+        },
+        default_sort=(("created_at", -1),),
+        defaults={"created_at": _utcnow},
+        required=("url", "events"),
+    ),
+    TableSpec(
+        name="api_keys",
+        columns={
+            "id": "uuid",
+            "user_id": "uuid",
+            "name": "text",
+            "key_hash": "text",
+            "created_at": "timestamptz",
+            "last_used_at": "timestamptz",
+            "is_active": "boolean",
+        },
+        default_sort=(("created_at", -1),),
+        filters=frozenset({"id", "user_id", "key_hash", "is_active"}),
+        defaults={"is_active": True, "created_at": _utcnow},
+        required=("user_id", "key_hash"),
+    ),
+    TableSpec(
+        name="resolution_stats",
+        columns={
+            "id": "uuid",
+            "operator_id": "uuid",
+            "disruption_type": "text",
+            "lane": "text",
+            "case_count": "integer",
+            "p50_hours": "numeric",
+            "p75_hours": "numeric",
+            "p90_hours": "numeric",
+            "top_root_causes": "jsonb",
+            "sample_case_ids": "text[]",
+            "last_resolved_at": "timestamptz",
+            "updated_at": "timestamptz",
+        },
+        default_sort=(("updated_at", -1),),
+        filters=frozenset({"id", "operator_id", "disruption_type", "lane", "updated_at"}),
+    ),
+]
+
+TABLES: Dict[str, TableSpec] = {spec.name: spec for spec in _SPECS}
+
+
+def get_table(name: str) -> TableSpec:
+    """Look up a table spec; unknown collections raise NotImplementedError"""
+    spec = TABLES.get(name)
+    if spec is None:
+        raise NotImplementedError(f"Collection {name} not implemented")
+    return spec
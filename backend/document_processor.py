@@ -8,7 +8,7 @@ import json
 import base64
 from typing import Dict, Any, List
 from dotenv import load_dotenv
-from llm_client import LlmChat, UserMessage
+from llm_client import LlmChat, LlmOverloadedError, UserMessage
 
 load_dotenv()
 
@@ -40,7 +40,7 @@ class DocumentProcessor:
                 api_key=self.api_key,
                 session_id=f"doc-analysis-{filename}",
                 system_message="You are a logistics document expert. Extract key fields like Invoice No, Date, Buyer, Seller, Items, HS Codes, Weights, and Container Numbers. Return ONLY JSON."
-            ).with_model("gemini", "gemini-2.5-flash") # Flash supports vision
+            ).for_task("document_analysis")
             
             prompt = f"""Analyze this {doc_type} document named '{filename}'.
             Extract the following fields if visible:
@@ -73,8 +73,12 @@ class DocumentProcessor:
             message = UserMessage(text=prompt, images=[b64_data])
             response = await chat.send_message(message)
             
-            return self._clean_json(response)
+            result = self._clean_json(response)
+            result["ai_model"] = chat.served_model
+            return result
 
+        except LlmOverloadedError:
+            raise
         except Exception as e:
             print(f"Document analysis failed: {e}")
             return {"error": str(e)}
@@ -88,7 +92,7 @@ class DocumentProcessor:
                 api_key=self.api_key,
                 session_id="doc-comparison",
                 system_message="You are a logistics auditor. Compare two documents and find discrepancies."
-            ).with_model("gemini", "gemini-2.5-flash")
+            ).for_task("document_comparison")
             
             prompt = f"""Compare these two logistics documents:
 
@@ -117,8 +121,12 @@ class DocumentProcessor:
             message = UserMessage(text=prompt)
             response = await chat.send_message(message)
             
-            return self._clean_json(response)
+            result = self._clean_json(response)
+            result["ai_model"] = chat.served_model
+            return result
 
+        except LlmOverloadedError:
+            raise
         except Exception as e:
             return {"error": str(e)}
 
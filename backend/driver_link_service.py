@@ -0,0 +1,111 @@
+"""
+Driver Link Service
+Resolves driver magic-link tokens for the /api/driver/* endpoints.
+
+Drivers on weak connections retry a lot, so resolved link+vehicle pairs are
+cached until the link expires (or the cache TTL passes), and use counts are
+coalesced in memory and written in batches instead of once per hit. Batches
+are written when flush_threshold uses pile up and by run_flush_loop every
+flush_interval, so counts land even when no further driver request arrives.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from cache import TTLCache
+from db_compat import DBDatabase
+
+
+class DriverLinkService:
+    def __init__(
+        self,
+        db,
+        maxsize: int = 10000,
+        ttl: float = 300.0,
+        flush_interval: float = 30.0,
+        flush_threshold: int = 100
+    ):
+        self.db = db
+        self.cache = TTLCache(maxsize, ttl)
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        # token -> [uses, last_used_at] not yet written
+        self._pending: Dict[str, list] = {}
+        self._last_flush = time.monotonic()
+
+    async def resolve(self, token: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Return (magic_link, vehicle) for a token. magic_link is None for an
+        unknown token and vehicle is None if the vehicle no longer exists.
+        Only complete pairs for unexpired links are cached.
+        """
+        context = self.cache.get(token)
+        if context is not None:
+            return context
+
+        magic_link = await self.db.magic_links.find_one({"token": token})
+        if not magic_link:
+            return None, None
+
+        vehicle = await self.db.fleet_vehicles.find_one({"_id": magic_link.get("vehicle_id")})
+        if vehicle:
+            self.cache.set(token, (magic_link, vehicle), self._ttl_for(magic_link))
+        return magic_link, vehicle
+
+    def _ttl_for(self, magic_link: Dict[str, Any]) -> float:
+        """Cache TTL capped at the link's remaining lifetime"""
+        expires_at = magic_link.get("expires_at")
+        if not isinstance(expires_at, datetime):
+            return self.cache.ttl
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+        return min(self.cache.ttl, remaining)
+
+    def invalidate(self, token: str) -> None:
+        """Drop a cached token, e.g. after the link is revoked"""
+        self.cache.pop(token)
+
+    async def record_use(self, token: str) -> None:
+        """Count one use of a link; flushes when enough uses or time have accumulated"""
+        pending = self._pending.setdefault(token, [0, None])
+        pending[0] += 1
+        pending[1] = datetime.now(timezone.utc)
+
+        if (
+            sum(uses for uses, _ in self._pending.values()) >= self.flush_threshold
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            await self.flush()
+
+    async def run_flush_loop(self) -> None:
+        """Flush pending use counts every flush_interval until cancelled"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write pending use counts. Counts that fail to write are kept for the next flush."""
+        if not self._pending:
+            return
+        usage = {token: (uses, last_used_at) for token, (uses, last_used_at) in self._pending.items()}
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+        try:
+            if isinstance(self.db, DBDatabase):
+                await self.db.adapter.magic_links_add_usage(usage)
+            else:
+                # MongoDB fallback; one $inc per token
+                for token, (uses, last_used_at) in usage.items():
+                    await self.db.magic_links.update_one(
+                        {"token": token},
+                        {"$inc": {"used_count": uses}, "$set": {"last_used_at": last_used_at}}
+                    )
+        except Exception as e:
+            print(f"Warning: Failed to flush magic link usage: {e}")
+            for token, (uses, last_used_at) in usage.items():
+                pending = self._pending.setdefault(token, [0, last_used_at])
+                pending[0] += uses
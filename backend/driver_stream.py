@@ -0,0 +1,132 @@
+"""
+Driver Stream Session
+State for one streaming voice report (WebSocket /api/driver/stream/{token}).
+
+The driver app sends the recording as binary frames. Each frame is a
+self-contained clip: the app restarts its recorder every few seconds, so
+every webm chunk carries its own header. Each clip is transcribed as soon as
+it arrives (normalized and segmented like an uploaded report), and the
+transcript so far is pushed back to the driver. The case is created once the
+transcript has enough words to be useful, and its description is brought up
+to date with the final transcript when the driver finishes.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from audio_segmenter import stitch_transcripts
+
+# Words of transcript needed before the case is created
+DRIVER_STREAM_MIN_WORDS = int(os.getenv("DRIVER_STREAM_MIN_WORDS", "8"))
+DRIVER_STREAM_MAX_CHUNK_BYTES = int(os.getenv("DRIVER_STREAM_MAX_CHUNK_BYTES", str(5 * 1024 * 1024)))
+DRIVER_STREAM_MAX_CHUNKS = int(os.getenv("DRIVER_STREAM_MAX_CHUNKS", "120"))
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class DriverStreamSession:
+    """Transcribes clips as they arrive and creates the case early"""
+
+    def __init__(
+        self,
+        transcribe: Callable[[bytes], Awaitable[Dict[str, Any]]],
+        create_case: Callable[[str, Optional[Dict[str, Any]]], Awaitable[str]],
+        update_case: Callable[[str, str, Optional[Dict[str, Any]]], Awaitable[None]],
+        send: Send,
+        min_words: int = DRIVER_STREAM_MIN_WORDS,
+        concurrency: int = 2
+    ):
+        self.transcribe = transcribe
+        self.create_case = create_case
+        self.update_case = update_case
+        self.send = send
+        self.min_words = min_words
+        self.case_id: Optional[str] = None
+        self.results: List[Dict[str, Any]] = []
+        self.bytes_received = 0
+        self._tasks: List[asyncio.Task] = []
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._case_lock = asyncio.Lock()
+        self._connected = True
+
+    def transcript(self) -> str:
+        return stitch_transcripts(self.results)["transcript"]
+
+    def transcription(self) -> Dict[str, Any]:
+        """Timeline metadata, in the shape the upload endpoint stores"""
+        failed = [r for r in self.results if not r.get("success")]
+        return {
+            "segments": sum(r.get("segments") or 1 for r in self.results),
+            "partial": bool(failed),
+            "duration": round(sum(r.get("duration") or 0 for r in self.results), 2),
+            "chunks": len(self.results),
+            "streamed": True,
+            "bytes_received": self.bytes_received
+        }
+
+    async def _notify(self, message: Dict[str, Any]) -> None:
+        if not self._connected:
+            return
+        try:
+            await self.send(message)
+        except Exception:
+            # Driver went away; keep transcribing so the report still lands
+            self._connected = False
+
+    async def add_chunk(self, data: bytes) -> None:
+        """Queue one clip for transcription"""
+        if len(data) > DRIVER_STREAM_MAX_CHUNK_BYTES:
+            raise ValueError(f"Audio chunk larger than {DRIVER_STREAM_MAX_CHUNK_BYTES} bytes")
+        if len(self._tasks) >= DRIVER_STREAM_MAX_CHUNKS:
+            raise ValueError(f"More than {DRIVER_STREAM_MAX_CHUNKS} audio chunks")
+        self.bytes_received += len(data)
+        index = len(self._tasks)
+        self._tasks.append(asyncio.create_task(self._process(index, data)))
+
+    async def _process(self, index: int, data: bytes) -> None:
+        async with self._semaphore:
+            try:
+                result = await self.transcribe(data)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+        # Clips do not overlap, so start/end only order them for stitching
+        self.results.append({**result, "index": index, "start": float(index), "end": float(index)})
+
+        if result.get("success"):
+            await self._notify({
+                "type": "transcript",
+                "index": index,
+                "text": result.get("transcript", ""),
+                "transcript": self.transcript()
+            })
+        else:
+            print(f"Warning: Streamed chunk {index} failed to transcribe: {result.get('error')}")
+            await self._notify({"type": "chunk_failed", "index": index})
+
+        if self.case_id is None and len(self.transcript().split()) >= self.min_words:
+            try:
+                await self._ensure_case()
+            except Exception as e:
+                # finish() tries again with the full transcript
+                print(f"Warning: Early case creation failed: {e}")
+
+    async def _ensure_case(self, transcript: Optional[str] = None) -> str:
+        async with self._case_lock:
+            if self.case_id is None:
+                self.case_id = await self.create_case(transcript or self.transcript(), self.transcription())
+                await self._notify({"type": "case_created", "case_id": self.case_id})
+            return self.case_id
+
+    async def finish(self) -> Dict[str, Any]:
+        """Wait for outstanding clips, then create or update the case with the full transcript"""
+        await asyncio.gather(*self._tasks)
+        if not self.results:
+            return {"case_id": None, "transcript": ""}
+
+        transcript = self.transcript() or "Voice report (transcription failed)"
+        if self.case_id is not None:
+            await self.update_case(self.case_id, transcript, self.transcription())
+        else:
+            await self._ensure_case(transcript)
+        return {"case_id": self.case_id, "transcript": transcript}
@@ -0,0 +1,148 @@
+"""
+LLM Response Cache
+Content-addressed cache for chat completions, so identical prompts (regenerate,
+refresh, re-running an agent on an unchanged case) skip the OpenAI call.
+
+Keys are a SHA-256 of (model, messages, temperature); image payloads are
+reduced to their own digest first. Values are JSON entries holding the answer
+and the model that produced it (a fallback model may answer a call keyed
+under the first model of its route). LLM_CACHE_BACKEND selects the backend:
+  memory  (default) in-process LRU
+  sqlite  file at LLM_CACHE_PATH, shared by workers on one host
+  off     disabled
+LLM_CACHE_TTL_SECONDS sets the TTL (default 3600) and LLM_CACHE_MAX_SIZE the
+in-memory size (default 1000).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from cache import TTLCache
+
+
+def _image_digest(url: str) -> str:
+    return "sha256:" + hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], temperature: float) -> str:
+    """Hash of everything that determines a completion"""
+    normalized = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = [
+                {"type": "image_url", "image_url": _image_digest(part["image_url"]["url"])}
+                if part.get("type") == "image_url" else part
+                for part in content
+            ]
+        normalized.append({"role": message.get("role"), "content": content})
+    payload = json.dumps(
+        {"model": model, "messages": normalized, "temperature": temperature, "entry": 2},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def encode_entry(text: str, model: Optional[str]) -> str:
+    """Cache value for an answer and the model that served it"""
+    return json.dumps({"text": text, "model": model}, separators=(",", ":"))
+
+
+def decode_entry(value: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(answer, served model) from a cache value; (None, None) on a miss or unreadable entry"""
+    if value is None:
+        return None, None
+    try:
+        entry = json.loads(value)
+        return entry["text"], entry.get("model")
+    except (ValueError, TypeError, KeyError):
+        return None, None
+
+
+class MemoryLlmCache:
+    """In-process LRU with TTL"""
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 3600.0):
+        self._cache = TTLCache(maxsize, ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        self._cache.set(key, value)
+
+
+class SqliteLlmCache:
+    """SQLite table keyed by hash; expired rows are pruned as new ones are written"""
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, ttl: float = 3600.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl)
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self._set, key, value)
+
+
+_default_cache: Any = None
+_default_cache_loaded = False
+
+
+def get_llm_cache():
+    """Cache backend configured by LLM_CACHE_BACKEND, or None when disabled"""
+    global _default_cache, _default_cache_loaded
+    if _default_cache_loaded:
+        return _default_cache
+
+    backend = os.getenv("LLM_CACHE_BACKEND", "memory").strip().lower()
+    ttl = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+    if backend in ("off", "none", "") or ttl <= 0:
+        _default_cache = None
+    elif backend == "sqlite":
+        path = os.getenv("LLM_CACHE_PATH", "/tmp/ward_llm_cache.sqlite3")
+        try:
+            _default_cache = SqliteLlmCache(path, ttl)
+        except sqlite3.Error as e:
+            print(f"Warning: LLM cache at {path} unavailable, using memory: {e}")
+            _default_cache = MemoryLlmCache(ttl=ttl)
+    else:
+        if backend != "memory":
+            print(f"Warning: Unknown LLM_CACHE_BACKEND '{backend}', using memory")
+        _default_cache = MemoryLlmCache(int(os.getenv("LLM_CACHE_MAX_SIZE", "1000")), ttl)
+    _default_cache_loaded = True
+    return _default_cache
@@ -2,36 +2,393 @@
 LLM Client - Replaces emergentintegrations with OpenAI
 """
 
+import asyncio
+import heapq
+import itertools
+import logging
 import os
-from typing import Optional, List, Union
-from openai import AsyncOpenAI
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, List, Tuple, Union
+import httpx
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 import json
 
+from llm_cache import cache_key, decode_entry, encode_entry, get_llm_cache
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+# Process-wide OpenAI clients by (api_key, event loop). Pooled connections
+# belong to the loop that opened them, so each loop gets its own client.
+_clients: Dict[Tuple[Optional[str], int], Tuple[Optional[asyncio.AbstractEventLoop], AsyncOpenAI]] = {}
+
+
+def _http_limits() -> httpx.Limits:
+    """Connection pool limits from LLM_HTTP_MAX_CONNECTIONS, LLM_HTTP_MAX_KEEPALIVE and LLM_HTTP_KEEPALIVE_EXPIRY"""
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "50")),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+    )
+
+
+def get_openai_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    """Shared AsyncOpenAI client with a keep-alive connection pool (HTTP/2 when h2 is installed)"""
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    # Forget clients whose loop has finished (serverless invocations, tests)
+    for stale in [k for k, (l, _) in _clients.items() if l is not None and l.is_closed()]:
+        del _clients[stale]
+
+    key = (api_key, id(loop))
+    entry = _clients.get(key)
+    if entry is None:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            http_client=DefaultAsyncHttpxClient(limits=_http_limits(), http2=_HTTP2)
+        )
+        entry = _clients[key] = (loop, client)
+    return entry[1]
+
+
+async def close_llm_clients():
+    """Close every shared client (called on shutdown)"""
+    entries = list(_clients.values())
+    _clients.clear()
+    for _, client in entries:
+        try:
+            await client.close()
+        except Exception as e:
+            print(f"Warning: Failed to close OpenAI client: {e}")
+
+
+# Priority lanes: lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BATCH = 2
+
+# Seconds a call may queue for a slot before LlmOverloadedError, per priority
+QUEUE_TIMEOUTS = {PRIORITY_INTERACTIVE: 10.0, PRIORITY_DEFAULT: 30.0, PRIORITY_BATCH: 120.0}
+
+
+class LlmOverloadedError(Exception):
+    """An LLM call could not start before its queue deadline (served as HTTP 429)"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _TokenBucket:
+    """Refills per_minute units a minute; goes negative when usage beats the estimate"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+
+class _ModelLane:
+    """Scheduling state for one model"""
+
+    def __init__(self, max_concurrency: int, rpm: float, tpm: float):
+        self.loop = asyncio.get_running_loop()
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.requests = _TokenBucket(rpm)
+        self.tokens = _TokenBucket(tpm)
+        # Heap of (priority, seq, tokens, future)
+        self.waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class LlmScheduler:
+    """
+    Admission control for LLM calls, per model: at most max_concurrency calls
+    in flight, requests- and tokens-per-minute buckets, and a priority queue so
+    interactive calls go ahead of batch work. A call that cannot start before
+    its queue deadline raises LlmOverloadedError instead of piling onto the
+    provider and coming back as a provider 429.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        rpm: float = 500,
+        tpm: float = 200000,
+        max_queue: int = 200,
+        queue_timeouts: Optional[Dict[int, float]] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_queue = max_queue
+        self.queue_timeouts = dict(QUEUE_TIMEOUTS, **(queue_timeouts or {}))
+        self._lanes: Dict[str, _ModelLane] = {}
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "LlmScheduler":
+        """Limits from LLM_MAX_CONCURRENCY, LLM_RPM, LLM_TPM and LLM_MAX_QUEUE (per model)"""
+        return cls(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            rpm=float(os.getenv("LLM_RPM", "500")),
+            tpm=float(os.getenv("LLM_TPM", "200000")),
+            max_queue=int(os.getenv("LLM_MAX_QUEUE", "200"))
+        )
+
+    def _lane(self, model: str) -> _ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None or lane.loop.is_closed():
+            lane = self._lanes[model] = _ModelLane(self.max_concurrency, self.rpm, self.tpm)
+        return lane
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        model: str,
+        priority: int = PRIORITY_DEFAULT,
+        tokens: int = 1000,
+        queue_timeout: Optional[float] = None
+    ):
+        """
+        Hold a call slot for model. tokens is an estimate; set usage["tokens"]
+        on the yielded dict to the real count so the TPM bucket is corrected.
+        """
+        lane = self._lane(model)
+        if queue_timeout is None:
+            queue_timeout = self.queue_timeouts.get(priority, QUEUE_TIMEOUTS[PRIORITY_DEFAULT])
+        await self._admit(lane, model, priority, tokens, queue_timeout)
+        usage = {"tokens": tokens}
+        try:
+            yield usage
+        finally:
+            lane.tokens.take(usage["tokens"] - tokens)
+            self._release(lane)
+
+    async def _admit(self, lane: _ModelLane, model: str, priority: int, tokens: int, queue_timeout: float):
+        rate_wait = max(lane.requests.wait_time(1), lane.tokens.wait_time(tokens))
+        if rate_wait > queue_timeout:
+            raise LlmOverloadedError(f"LLM rate limit reached for {model}", retry_after=rate_wait)
+        if len(lane.waiters) >= self.max_queue:
+            raise LlmOverloadedError(f"LLM queue full for {model}", retry_after=max(rate_wait, 1.0))
+
+        future = lane.loop.create_future()
+        heapq.heappush(lane.waiters, (priority, next(self._seq), tokens, future))
+        self._dispatch(lane)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), queue_timeout)
+        except asyncio.TimeoutError:
+            # Not admitted in time (cancel() is False if it was admitted meanwhile)
+            if future.cancel():
+                raise LlmOverloadedError(f"LLM queue timeout for {model}", retry_after=max(rate_wait, 1.0))
+        except BaseException:
+            if not future.cancel():
+                self._release(lane)
+            raise
+
+    def _release(self, lane: _ModelLane):
+        lane.in_flight -= 1
+        self._dispatch(lane)
+
+    def _dispatch(self, lane: _ModelLane):
+        """Admit waiters in priority order while concurrency and rate limits allow"""
+        while lane.waiters and lane.in_flight < lane.max_concurrency:
+            _, _, tokens, future = lane.waiters[0]
+            if future.done():
+                heapq.heappop(lane.waiters)
+                continue
+            wait = max(lane.requests.wait_time(1), lane.tokens.wait_time(tokens))
+            if wait > 0:
+                if lane.timer is None:
+                    lane.timer = lane.loop.call_later(wait, self._on_timer, lane)
+                return
+            heapq.heappop(lane.waiters)
+            lane.requests.take(1)
+            lane.tokens.take(tokens)
+            lane.in_flight += 1
+            future.set_result(None)
+
+    def _on_timer(self, lane: _ModelLane):
+        lane.timer = None
+        self._dispatch(lane)
+
+
+llm_scheduler = LlmScheduler.from_env()
+
+
+def _estimate_tokens(messages: List[Dict[str, Any]], max_output: int = 500) -> int:
+    """Rough prompt size (4 characters a token, 800 per image) plus an output allowance"""
+    chars = 0
+    images = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            for part in content:
+                if part.get("type") == "image_url":
+                    images += 1
+                else:
+                    chars += len(part.get("text", ""))
+        elif content:
+            chars += len(content)
+    return chars // 4 + images * 800 + max_output
+
+
+# Model tiers by cost. The vision tier is only used for messages with images.
+MODEL_TIERS = {
+    "fast": os.getenv("LLM_FAST_MODEL", "gpt-4o-mini"),
+    "reasoning": os.getenv("LLM_REASONING_MODEL", "gpt-4o"),
+    "vision": os.getenv("LLM_VISION_MODEL", "gpt-4o"),
+}
+
+# Tiers tried in order for each task; later entries are fallbacks. Short
+# structured tasks (questions, labels, rankings) run on the fast tier.
+# Override a route with LLM_ROUTE_<TASK>, e.g. LLM_ROUTE_RCA=fast,reasoning
+# (tier names or model ids).
+TASK_ROUTES = {
+    "clarity_questions": ("fast", "reasoning"),
+    "helper_questions": ("fast", "reasoning"),
+    "driver_response": ("fast", "reasoning"),
+    "decision_guidance": ("fast", "reasoning"),
+    "extract_disruption": ("fast", "reasoning"),
+    "responsibility": ("fast", "reasoning"),
+    "document_comparison": ("fast", "reasoning"),
+    "document_analysis": ("vision",),
+    "decision_structure": ("reasoning", "fast"),
+    "rca": ("reasoning", "fast"),
+    "default": ("fast", "reasoning"),
+}
+
+# Errors after which the next model in the route is tried. LlmOverloadedError
+# is not one of them: under load the 429 should reach the caller right away
+# instead of queueing again for a more expensive model.
+_FALLBACK_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.NotFoundError,
+)
+
+
+def route_models(task: Optional[str], has_images: bool = False) -> List[str]:
+    """Models to try for a task, cheapest suitable first"""
+    override = os.getenv(f"LLM_ROUTE_{task.upper()}") if task else None
+    if override:
+        tiers = [t.strip() for t in override.split(",") if t.strip()]
+    else:
+        tiers = list(TASK_ROUTES.get(task or "default", TASK_ROUTES["default"]))
+    if has_images:
+        tiers = ["vision"]
+    models = []
+    for tier in tiers:
+        model = MODEL_TIERS.get(tier, tier)
+        if model not in models:
+            models.append(model)
+    return models
+
+
 class LlmChat:
     """Replacement for emergentintegrations LlmChat using OpenAI"""
     
-    def __init__(self, api_key: str, session_id: str, system_message: str):
+    def __init__(self, api_key: str, session_id: str, system_message: str, cache=None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        self.client = AsyncOpenAI(api_key=self.api_key)
+        self.client = get_openai_client(self.api_key)
         self.session_id = session_id
         self.system_message = system_message
-        self.model = "gpt-4o-mini"  # Default model
+        self.model = MODEL_TIERS["fast"]  # Default model
+        self.task: Optional[str] = None
+        self.served_model: Optional[str] = None  # Model that answered the last call
+        self.temperature = 0.7
+        self.priority = PRIORITY_DEFAULT
+        self.scheduler = llm_scheduler
         self.messages = [{"role": "system", "content": system_message}]
+        # Response cache (see llm_cache); defaults to the LLM_CACHE_BACKEND cache
+        self.cache = cache if cache is not None else get_llm_cache()
     
     def with_model(self, provider: str, model: str):
         """Set the model (for compatibility with emergentintegrations API)"""
-        # Map Gemini models to OpenAI equivalents
+        # Map Gemini models to OpenAI equivalents; images still go to the vision tier
         if "gemini" in model.lower() or "flash" in model.lower():
-            # Use vision-capable model if images are expected
-            self.model = "gpt-4o"  # Vision-capable model
+            self.model = MODEL_TIERS["fast"]
         elif "gpt" in model.lower():
             self.model = model
         else:
-            self.model = "gpt-4o-mini"
+            self.model = MODEL_TIERS["fast"]
+        return self
+    
+    def for_task(self, task: str):
+        """Route calls by task (see TASK_ROUTES) instead of a fixed model"""
+        self.task = task
+        return self
+    
+    def _models(self, has_images: bool) -> List[str]:
+        if self.task:
+            return route_models(self.task, has_images)
+        return [MODEL_TIERS["vision"] if has_images else self.model]
+    
+    def _fallback(self, model: str, models: List[str], error: Exception):
+        if model == models[-1]:
+            raise error
+        next_model = models[models.index(model) + 1]
+        print(f"Warning: {model} failed for {self.task or 'chat'}, falling back to {next_model}: {error}")
+    
+    def _log_call(self, cached: bool) -> None:
+        logger.info(
+            "LLM call task=%s model=%s cached=%s session=%s",
+            self.task or "chat", self.served_model, cached, self.session_id
+        )
+    
+    def with_priority(self, priority: int):
+        """Set the scheduling lane (PRIORITY_INTERACTIVE, PRIORITY_DEFAULT or PRIORITY_BATCH)"""
+        self.priority = priority
         return self
     
-    async def send_message(self, message) -> str:
-        """Send a message and get response"""
+    async def send_message(
+        self,
+        message,
+        use_cache: bool = True,
+        priority: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        stream: bool = False
+    ) -> Union[str, AsyncIterator[str]]:
+        """
+        Send a message and get response. Identical conversations are answered
+        from the response cache unless use_cache=False (the fresh answer is
+        still stored). Calls are admitted by the LLM scheduler; raises
+        LlmOverloadedError if no slot frees up within queue_timeout.
+
+        With stream=True, returns an async iterator of text chunks instead.
+        The call is scheduled when iteration starts; the full answer is added
+        to the history and the cache once the iterator is exhausted.
+        """
         # Handle UserMessage objects with images
         if hasattr(message, 'text'):
             content = []
@@ -63,23 +420,104 @@ class LlmChat:
         # Add user message
         self.messages.append({"role": "user", "content": user_content})
         
-        # Use vision model if images are present
-        model = "gpt-4o" if (hasattr(message, 'images') and message.images) else self.model
+        # Vision models only when images are present; cached under the first choice
+        models = self._models(bool(getattr(message, 'images', None)))
         
-        # Call OpenAI
-        response = await self.client.chat.completions.create(
-            model=model,
-            messages=self.messages,
-            temperature=0.7
-        )
+        key = cache_key(models[0], self.messages, self.temperature) if self.cache else None
+        if stream:
+            return self._stream_reply(models, key, use_cache, priority, queue_timeout)
+        response_text, cached_model = decode_entry(await self.cache.get(key) if key and use_cache else None)
         
-        # Extract response text
-        response_text = response.choices[0].message.content
+        cached = response_text is not None
+        if cached:
+            self.served_model = cached_model
+        else:
+            # Call OpenAI, falling back along the route
+            for model in models:
+                try:
+                    async with self.scheduler.slot(
+                        model,
+                        priority=self.priority if priority is None else priority,
+                        tokens=_estimate_tokens(self.messages),
+                        queue_timeout=queue_timeout
+                    ) as usage:
+                        response = await self.client.chat.completions.create(
+                            model=model,
+                            messages=self.messages,
+                            temperature=self.temperature
+                        )
+                        total_tokens = getattr(getattr(response, "usage", None), "total_tokens", None)
+                        if total_tokens:
+                            usage["tokens"] = total_tokens
+                    self.served_model = model
+                    break
+                except _FALLBACK_ERRORS as e:
+                    self._fallback(model, models, e)
+            
+            # Extract response text
+            response_text = response.choices[0].message.content
+            if key and response_text is not None:
+                await self.cache.set(key, encode_entry(response_text, self.served_model))
         
+        self._log_call(cached)
         # Add assistant response to history
         self.messages.append({"role": "assistant", "content": response_text})
         
         return response_text
+    
+    async def _stream_reply(
+        self,
+        models: List[str],
+        key: Optional[str],
+        use_cache: bool,
+        priority: Optional[int],
+        queue_timeout: Optional[float]
+    ) -> AsyncIterator[str]:
+        """Yield the answer as it arrives (a cached answer comes as one chunk)"""
+        response_text, cached_model = decode_entry(await self.cache.get(key) if key and use_cache else None)
+        cached = response_text is not None
+        if cached:
+            self.served_model = cached_model
+            yield response_text
+        else:
+            parts = []
+            for model in models:
+                try:
+                    async with self.scheduler.slot(
+                        model,
+                        priority=self.priority if priority is None else priority,
+                        tokens=_estimate_tokens(self.messages),
+                        queue_timeout=queue_timeout
+                    ) as usage:
+                        response = await self.client.chat.completions.create(
+                            model=model,
+                            messages=self.messages,
+                            temperature=self.temperature,
+                            stream=True,
+                            stream_options={"include_usage": True}
+                        )
+                        self.served_model = model
+                        async for chunk in response:
+                            total_tokens = getattr(getattr(chunk, "usage", None), "total_tokens", None)
+                            if total_tokens:
+                                usage["tokens"] = total_tokens
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if delta:
+                                parts.append(delta)
+                                yield delta
+                    break
+                except _FALLBACK_ERRORS as e:
+                    # Only fall back before anything has been streamed
+                    if parts:
+                        raise
+                    self._fallback(model, models, e)
+            
+            response_text = "".join(parts)
+            if key:
+                await self.cache.set(key, encode_entry(response_text, self.served_model))
+        
+        self._log_call(cached)
+        self.messages.append({"role": "assistant", "content": response_text})
 
 
 class UserMessage:
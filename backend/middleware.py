@@ -1,10 +1,13 @@
 """
 FastAPI Middleware
-Request logging, performance monitoring, error handling
+Request logging, performance monitoring, error handling, read-replica routing
 """
 
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Optional
+from db_adapter import pin_reads_to_primary
+import os
 import time
 import logging
 
@@ -59,3 +62,34 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
             # Re-raise to let FastAPI handle it
             raise
 
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    """
+    Keeps reads on the primary database when a replica could be stale:
+    during write requests, when the client sends X-Read-Primary, and for a
+    short window (READ_YOUR_WRITES_SECONDS) after the client's last write,
+    tracked with a cookie.
+    """
+    
+    COOKIE_NAME = "ward_read_primary"
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+    
+    def __init__(self, app, window_seconds: Optional[int] = None):
+        super().__init__(app)
+        if window_seconds is None:
+            window_seconds = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+        self.window_seconds = window_seconds
+    
+    async def dispatch(self, request: Request, call_next):
+        is_write = request.method not in self.SAFE_METHODS
+        if is_write or request.headers.get("X-Read-Primary") or request.cookies.get(self.COOKIE_NAME):
+            pin_reads_to_primary()
+        
+        response = await call_next(request)
+        
+        if is_write and response.status_code < 400 and self.window_seconds > 0:
+            response.set_cookie(
+                self.COOKIE_NAME, "1",
+                max_age=self.window_seconds, httponly=True, samesite="lax"
+            )
+        return response
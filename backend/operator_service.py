@@ -49,9 +49,14 @@ class OperatorService:
         """
         Add a single vehicle to operator's fleet
         """
-        vehicle_id = str(uuid4())
-        vehicle = {
-            "id": vehicle_id,
+        vehicle = self._build_vehicle(operator_id, vehicle_data)
+        await self.db.fleet_vehicles.insert_one(vehicle)
+        return vehicle["id"]
+    
+    def _build_vehicle(self, operator_id: str, vehicle_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a fleet_vehicles document"""
+        return {
+            "id": str(uuid4()),
             "operator_id": operator_id,
             "vehicle_number": vehicle_data["vehicle_number"],
             "vehicle_type": vehicle_data.get("vehicle_type", "truck"),  # truck, container, trailer
@@ -62,14 +67,12 @@ class OperatorService:
             "created_at": datetime.now(timezone.utc),
             "updated_at": datetime.now(timezone.utc)
         }
-        
-        result = await self.db.fleet_vehicles.insert_one(vehicle)
-        return vehicle_id
     
     async def bulk_upload_fleet(self, operator_id: str, csv_content: str) -> Dict[str, Any]:
         """
         Bulk upload fleet from CSV
         Format: vehicle_number,driver_name,driver_phone,route,vehicle_type
+        Valid rows are written with a single insert_many call.
         """
         reader = csv.DictReader(io.StringIO(csv_content))
         results = {
@@ -78,6 +81,8 @@ class OperatorService:
             "errors": []
         }
         
+        vehicles = []
+        line_numbers = []
         for row in reader:
             try:
                 vehicle_data = {
@@ -93,12 +98,19 @@ class OperatorService:
                     results["errors"].append(f"Row {reader.line_num}: Missing vehicle_number")
                     continue
                 
-                await self.add_fleet_vehicle(operator_id, vehicle_data)
-                results["success"] += 1
+                vehicles.append(self._build_vehicle(operator_id, vehicle_data))
+                line_numbers.append(reader.line_num)
             except Exception as e:
                 results["failed"] += 1
                 results["errors"].append(f"Row {reader.line_num}: {str(e)}")
         
+        if vehicles:
+            result = await self.db.fleet_vehicles.insert_many(vehicles)
+            results["success"] += len(result.inserted_ids)
+            results["failed"] += len(result.errors)
+            for index, error in sorted(result.errors.items()):
+                results["errors"].append(f"Row {line_numbers[index]}: {error}")
+        
         return results
     
     async def generate_driver_magic_link(self, operator_id: str, vehicle_id: str) -> str:
@@ -147,13 +159,12 @@ class OperatorService:
         
         # Get cases for operator's vehicles
         try:
-            cases_cursor = await self.db.cases.find({
-                "operator_id": operator_id
-            })
-            cases = await cases_cursor.to_list(length=1000)
-            # Filter by date in Python (since we can't easily do date filtering in query)
             cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
-            cases = [c for c in cases if c.get("created_at") and c.get("created_at") >= cutoff_date] if cases else []
+            cases_cursor = await self.db.cases.find({
+                "operator_id": operator_id,
+                "created_at": {"$gte": cutoff_date}
+            }, limit=0)
+            cases = await cases_cursor.to_list()
         except Exception as e:
             print(f"Warning: Failed to fetch cases: {e}")
             cases = []
@@ -0,0 +1,66 @@
+"""
+Keyset Pagination
+Opaque cursor tokens over (sort_value, id) pairs, e.g. (updated_at, id)
+for movements, (timestamp, id) for timeline and audit entries or (name, id)
+for facilities and parties. Tokens carry the value as JSON; decode_cursor
+restores its type from the sort column's type in the table spec.
+"""
+
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+
+def _text(value: Any) -> str:
+    if not isinstance(value, str):
+        raise ValueError("Expected a string")
+    return value
+
+
+# Sort column type -> parser for the JSON value stored in a cursor
+_CURSOR_TYPES: Dict[str, Callable[[Any], Any]] = {
+    "timestamptz": datetime.fromisoformat,
+    "text": _text,
+    "uuid": UUID,
+    "integer": int,
+    "bigint": int,
+    "numeric": Decimal,
+}
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    """Encode the last row of a page as an opaque, URL-safe token"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    elif isinstance(sort_value, (Decimal, UUID)):
+        sort_value = str(sort_value)
+    payload = json.dumps({"v": sort_value, "id": str(row_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, column_type: str = "timestamptz") -> Tuple[Any, UUID]:
+    """
+    Decode a cursor token for a sort column of the given PostgreSQL type;
+    raises ValueError if it is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return _CURSOR_TYPES[column_type](payload["v"]), UUID(payload["id"])
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+
+def split_page(rows: List[Dict[str, Any]], limit: int, sort_field: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Trim a page fetched with limit + 1 rows.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    items = rows[:limit]
+    last = items[-1]
+    return items, encode_cursor(last.get(sort_field), last.get("id") or last.get("_id"))
@@ -0,0 +1,279 @@
+"""
+Query Compiler
+Turns MongoDB-style queries into parameterized PostgreSQL for a TableSpec.
+
+SQL text depends only on the *shape* of a query - which fields, which
+operators, and whether a value is NULL - never on the values themselves, so
+each shape is compiled once and cached. `$in` binds a single array parameter
+(= ANY($n)), so the shape does not change with the list length either.
+"""
+
+import json
+from datetime import datetime
+from functools import lru_cache
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from db_tables import TableSpec
+
+# Comparison operators supported in query dicts, e.g. {"created_at": {"$gte": dt}}
+QUERY_OPERATORS = {"$in": None, "$ne": None, "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+SQL_CACHE_SIZE = 2048
+
+Binder = Callable[[Any], List[Any]]
+
+
+def coerce_param(col_type: str, value: Any) -> Any:
+    """Convert a value to the Python type asyncpg expects for a column"""
+    if value is None:
+        return None
+    if col_type.endswith("[]"):
+        return [coerce_param(col_type[:-2], v) for v in value]
+    if col_type == "uuid":
+        return value if isinstance(value, UUID) else UUID(str(value))
+    if col_type == "timestamptz":
+        if isinstance(value, str):
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return value
+    if col_type in ("integer", "bigint"):
+        return int(value)
+    if col_type == "text":
+        return value if isinstance(value, str) else str(value)
+    # jsonb, boolean and numeric are handled by asyncpg and the JSON codecs
+    return value
+
+
+def json_text(value: Any) -> str:
+    """Render a value the way PostgreSQL's ->> operator renders it"""
+    return value if isinstance(value, str) else json.dumps(value, default=str)
+
+
+def _operand_kind(op: str, operand: Any) -> str:
+    """The part of an operand that changes the generated SQL"""
+    if operand is None and op in ("$eq", "$ne"):
+        return "null"
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        if isinstance(operand, (int, float)) and not isinstance(operand, bool):
+            return "numeric"
+        if isinstance(operand, datetime):
+            return "timestamptz"
+        return "text"
+    return ""
+
+
+def _query_items(query: Dict[str, Any]):
+    """Yield (field, op, operand) for every condition in a query"""
+    for key, value in query.items():
+        if isinstance(value, dict) and value and all(k.startswith("$") for k in value):
+            for op, operand in value.items():
+                yield key, op, operand
+        else:
+            yield key, "$eq", value
+
+
+def query_shape(query: Dict[str, Any]) -> Tuple[Tuple[str, str, str], ...]:
+    """Hashable shape of a query: ((field, op, operand_kind), ...)"""
+    return tuple((key, op, _operand_kind(op, operand)) for key, op, operand in _query_items(query))
+
+
+def query_operands(query: Dict[str, Any]) -> List[Any]:
+    """Operands of a query, in the same order as query_shape()"""
+    return [operand for _, _, operand in _query_items(query)]
+
+
+def bind(binders: Sequence[Binder], operands: Sequence[Any]) -> List[Any]:
+    """Produce positional parameters for compiled conditions"""
+    params = []
+    for binder, operand in zip(binders, operands):
+        params.extend(binder(operand))
+    return params
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def compile_where(spec: TableSpec, shape: Tuple, param_idx: int = 1):
+    """
+    Compile a query shape into SQL conditions.
+
+    Supports equality, $in, $ne, $gt, $gte, $lt and $lte on the table's
+    columns, and dotted paths into JSONB columns such as
+    "disruption_details.disruption_type". JSONB equality compiles to a
+    containment test (@>) so GIN indexes can be used.
+
+    Returns (conditions, binders, next_param_idx). Raises ValueError for
+    unknown fields or operators.
+    """
+    conditions = []
+    binders = []
+
+    for key, op, kind in shape:
+        field = spec.primary_key if key == "_id" else key
+        column, _, path = field.partition(".")
+        col_type = spec.columns.get(column)
+        if col_type is None or (spec.filters is not None and column not in spec.filters):
+            raise ValueError(f"Unsupported filter field: {key}")
+        if op != "$eq" and op not in QUERY_OPERATORS:
+            raise ValueError(f"Unsupported query operator: {op}")
+
+        if path:
+            condition, binder = _json_path_condition(column, path, op, kind, param_idx)
+        else:
+            condition, binder = _column_condition(column, col_type, op, kind, param_idx)
+        conditions.append(condition)
+        binders.append(binder)
+        if kind != "null":
+            param_idx += 1
+
+    return tuple(conditions), tuple(binders), param_idx
+
+
+def _no_params(_operand: Any) -> List[Any]:
+    return []
+
+
+def _column_condition(column: str, col_type: str, op: str, kind: str, param_idx: int):
+    """Build one condition on a plain column"""
+    placeholder = f"${param_idx}"
+
+    if op == "$eq":
+        if kind == "null":
+            return f"{column} IS NULL", _no_params
+        if col_type == "jsonb":
+            return f"{column} @> {placeholder}::jsonb", lambda v: [v]
+        return f"{column} = {placeholder}", lambda v: [coerce_param(col_type, v)]
+
+    if col_type == "jsonb":
+        raise ValueError(f"Operator {op} requires a dotted path into {column}")
+
+    if op == "$ne":
+        if kind == "null":
+            return f"{column} IS NOT NULL", _no_params
+        return f"{column} IS DISTINCT FROM {placeholder}", lambda v: [coerce_param(col_type, v)]
+
+    if op == "$in":
+        return f"{column} = ANY({placeholder}::{col_type}[])", lambda v: [[coerce_param(col_type, x) for x in v]]
+
+    return f"{column} {QUERY_OPERATORS[op]} {placeholder}", lambda v: [coerce_param(col_type, v)]
+
+
+def _json_path_condition(column: str, path: str, op: str, kind: str, param_idx: int):
+    """Build one condition on a dotted path inside a JSONB column"""
+    keys = path.split(".")
+    if not all(_IDENTIFIER_RE.match(k) for k in keys):
+        raise ValueError(f"Invalid JSON path: {column}.{path}")
+
+    placeholder = f"${param_idx}"
+    if len(keys) == 1:
+        accessor = f"({column}->>'{keys[0]}')"
+    else:
+        accessor = f"({column} #>> '{{{','.join(keys)}}}')"
+
+    if op == "$eq":
+        if kind == "null":
+            return f"{accessor} IS NULL", _no_params
+
+        def nest(value: Any) -> List[Any]:
+            for k in reversed(keys):
+                value = {k: value}
+            return [value]
+
+        return f"{column} @> {placeholder}::jsonb", nest
+
+    if op == "$ne":
+        if kind == "null":
+            return f"{accessor} IS NOT NULL", _no_params
+        return f"{accessor} IS DISTINCT FROM {placeholder}", lambda v: [json_text(v)]
+
+    if op == "$in":
+        return f"{accessor} = ANY({placeholder}::text[])", lambda v: [[json_text(x) for x in v]]
+
+    symbol = QUERY_OPERATORS[op]
+    if kind in ("numeric", "timestamptz"):
+        return f"{accessor}::{kind} {symbol} {placeholder}", lambda v: [v]
+    return f"{accessor} {symbol} {placeholder}", lambda v: [json_text(v)]
+
+
+def build_conditions(spec: TableSpec, query: Dict[str, Any], param_idx: int = 1):
+    """Compile and bind a query in one step. Returns (conditions, params, next_param_idx)."""
+    conditions, binders, next_idx = compile_where(spec, query_shape(query), param_idx)
+    return list(conditions), bind(binders, query_operands(query)), next_idx
+
+
+def normalize_sort(sort: Optional[Sequence]) -> Tuple[Tuple[str, int], ...]:
+    """Hashable form of [(field, direction), ...]"""
+    return tuple((field, direction) for field, direction in sort or ())
+
+
+def order_clause(spec: TableSpec, sort: Tuple[Tuple[str, int], ...]) -> str:
+    """Build the body of an ORDER BY clause from ((field, direction), ...)"""
+    parts = []
+    for field, direction in sort:
+        field = spec.primary_key if field == "_id" else field
+        if not _IDENTIFIER_RE.match(field) or field not in spec.columns:
+            raise ValueError(f"Unsupported sort field: {field}")
+        parts.append(f"{field} {'DESC' if direction == -1 else 'ASC'}")
+    return ", ".join(parts)
+
+
+def _where(conditions: Sequence[str]) -> str:
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def compile_select(spec: TableSpec, shape: Tuple, sort: Tuple[Tuple[str, int], ...], has_limit: bool):
+    """SELECT for a query shape. The LIMIT, if any, is the last parameter. Returns (sql, binders)."""
+    conditions, binders, param_idx = compile_where(spec, shape)
+    sql = f"SELECT * FROM {spec.name}{_where(conditions)}"
+    if sort:
+        sql += f" ORDER BY {order_clause(spec, sort)}"
+    if has_limit:
+        sql += f" LIMIT ${param_idx}"
+    return sql, binders
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def compile_count(spec: TableSpec, shape: Tuple):
+    """SELECT COUNT(*) for a query shape. Returns (sql, binders)."""
+    conditions, binders, _ = compile_where(spec, shape)
+    return f"SELECT COUNT(*) FROM {spec.name}{_where(conditions)}", binders
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def compile_insert(spec: TableSpec, columns: Tuple[str, ...]) -> str:
+    """INSERT for a set of columns, in order"""
+    placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+    return f"INSERT INTO {spec.name} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def compile_update_one(spec: TableSpec, set_columns: Tuple[str, ...], shape: Tuple, inc_columns: Tuple[str, ...] = ()):
+    """
+    UPDATE of at most one matching row (MongoDB update_one semantics).
+    $set values come first, then $inc amounts (NULL counts as 0), then the
+    query parameters. Returns (sql, binders).
+    """
+    assignments = [f"{col} = ${i}" for i, col in enumerate(set_columns, start=1)]
+    assignments += [
+        f"{col} = COALESCE({col}, 0) + ${i}"
+        for i, col in enumerate(inc_columns, start=len(set_columns) + 1)
+    ]
+    set_clause = ", ".join(assignments)
+    conditions, binders, _ = compile_where(spec, shape, len(set_columns) + len(inc_columns) + 1)
+    pk = spec.primary_key
+    sql = (
+        f"UPDATE {spec.name} SET {set_clause} "
+        f"WHERE {pk} = (SELECT {pk} FROM {spec.name}{_where(conditions)} LIMIT 1)"
+    )
+    return sql, binders
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def compile_delete_one(spec: TableSpec, shape: Tuple):
+    """DELETE of at most one matching row. Returns (sql, binders)."""
+    conditions, binders, _ = compile_where(spec, shape)
+    pk = spec.primary_key
+    sql = f"DELETE FROM {spec.name} WHERE {pk} = (SELECT {pk} FROM {spec.name}{_where(conditions)} LIMIT 1)"
+    return sql, binders
@@ -3,8 +3,9 @@ Root Cause Analysis Engine for Ward v0
 Analyzes disruption patterns and suggests root causes + solutions
 """
 
-from typing import Dict, List, Any, Optional
-from llm_client import LlmChat, UserMessage
+import json
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
+from llm_client import LlmChat, LlmOverloadedError, UserMessage, PRIORITY_DEFAULT
 import os
 
 EMERGENT_LLM_KEY = os.environ.get("OPENAI_API_KEY") or os.environ.get("EMERGENT_LLM_KEY")
@@ -69,36 +70,62 @@ Format response as JSON:
             RCA report with root cause, actions, preventive measures
         """
         try:
-            # Build context from disruption and timeline
-            context = self._build_context(disruption_data, timeline_events)
-            
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"rca-{disruption_data.get('_id', 'unknown')}",
-                system_message=self.get_rca_system_prompt()
-            ).with_model("gemini", "gemini-2.5-flash")
-            
-            prompt = f"""Analyze this disruption and provide RCA:
-
-DISRUPTION:
-{context}
-
-Provide comprehensive RCA in JSON format."""
-            
-            message = UserMessage(text=prompt)
+            chat, message = self._rca_request(disruption_data, timeline_events)
             response = await chat.send_message(message)
             
             # Parse JSON response
-            import json
-            rca = json.loads(response.strip())
-            
+            rca = self.parse_rca(response, disruption_data)
+            rca["ai_model"] = chat.served_model
             return rca
         
+        except LlmOverloadedError:
+            # Not a reason to store a pattern-based RCA; the caller gets a 429
+            raise
         except Exception as e:
             print(f"RCA analysis error: {e}")
             # Fallback to basic RCA
             return self._fallback_rca(disruption_data)
     
+    async def stream_analysis(
+        self,
+        disruption_data: Dict[str, Any],
+        timeline_events: List[Dict[str, Any]]
+    ) -> Tuple[LlmChat, AsyncIterator[str]]:
+        """
+        Stream the raw RCA JSON. Returns the chat (its served_model is set once
+        streaming starts) and the chunks; parse the joined text with parse_rca().
+        """
+        chat, message = self._rca_request(disruption_data, timeline_events)
+        return chat, await chat.send_message(message, stream=True)
+    
+    def parse_rca(self, response: str, disruption_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Parse the model's RCA JSON, falling back to a pattern-based RCA"""
+        try:
+            return json.loads(response.strip())
+        except ValueError as e:
+            print(f"RCA analysis error: {e}")
+            return self._fallback_rca(disruption_data)
+    
+    def _rca_request(self, disruption_data: Dict[str, Any], timeline_events: List[Dict[str, Any]]):
+        """Chat and prompt for an RCA (someone is waiting on it, so not the batch lane)"""
+        # Build context from disruption and timeline
+        context = self._build_context(disruption_data, timeline_events)
+        
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=f"rca-{disruption_data.get('_id', 'unknown')}",
+            system_message=self.get_rca_system_prompt()
+        ).for_task("rca").with_priority(PRIORITY_DEFAULT)
+        
+        prompt = f"""Analyze this disruption and provide RCA:
+
+DISRUPTION:
+{context}
+
+Provide comprehensive RCA in JSON format."""
+        
+        return chat, UserMessage(text=prompt)
+    
     def _build_context(
         self,
         disruption_data: Dict[str, Any],
@@ -172,51 +199,32 @@ TIMELINE (what happened):
             "confidence": "low"
         }
     
-    async def suggest_similar_resolutions(
-        self,
-        disruption_type: str,
-        location: str
-    ) -> List[Dict[str, Any]]:
+    def suggest_similar_resolutions(self, stats: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Suggest how similar disruptions were resolved in the past
+        Summarize how similar disruptions were resolved in the past
         
         Args:
-            disruption_type: Type of disruption
-            location: Where it happened
+            stats: resolution_stats row for the disruption's scope (see ResolutionStatsService)
         
         Returns:
-            List of similar cases and their resolutions
+            Most common root causes with their share of resolved cases and
+            the typical resolution time for the scope
         """
-        # For demo: hardcoded patterns
-        # In production: query resolved cases from DB
+        if not stats or not stats.get("case_count"):
+            return []
         
-        patterns = {
-            "customs_hold": [
-                {
-                    "case": "Container stuck at JNPT - invoice mismatch",
-                    "resolution": "CHA submitted revised invoice, cleared in 6 hours",
-                    "time_saved": "18 hours (vs usual 24h)"
-                },
-                {
-                    "case": "Customs assessment pending - missing COO",
-                    "resolution": "Shipper couriered COO to CHA, submitted same day",
-                    "time_saved": "48 hours (vs usual 72h)"
-                }
-            ],
-            "port_congestion": [
-                {
-                    "case": "Mundra port congestion - 3 day delay",
-                    "resolution": "Rerouted next shipment to Nhava Sheva",
-                    "time_saved": "Prevented future delays"
-                }
-            ],
-            "truck_breakdown": [
-                {
-                    "case": "Truck breakdown on NH-8 - engine failure",
-                    "resolution": "Arranged backup truck from nearest depot within 4 hours",
-                    "time_saved": "8 hours (vs waiting for repair)"
-                }
-            ]
-        }
+        case_count = stats["case_count"]
+        hours = stats.get("resolution_hours") or {}
+        typical = None
+        if hours.get("p50") is not None:
+            typical = f"{hours['p50']:g}h median, {hours['p90']:g}h p90" if hours.get("p90") is not None else f"{hours['p50']:g}h median"
         
-        return patterns.get(disruption_type, [])
+        return [
+            {
+                "root_cause": cause.get("root_cause"),
+                "cases": cause.get("count"),
+                "share": round(cause.get("count", 0) / case_count, 2),
+                "typical_resolution_time": typical
+            }
+            for cause in stats.get("top_root_causes") or []
+        ]
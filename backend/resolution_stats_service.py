@@ -0,0 +1,102 @@
+"""
+Resolution Stats Service
+Precomputed resolution history for /api/cases/{id}/similar-resolutions.
+
+resolution_stats holds, per operator and (disruption_type, lane),
+resolution-time percentiles, the most common root causes (from rca) and the
+most recently resolved case IDs, plus a rollup over every lane. Rows are
+refreshed for the disruption types that had a case resolved since the last
+refresh: in the background after each transition to RESOLVED and from
+POST /api/admin/resolution-stats/refresh (for a scheduler).
+"""
+
+import time
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from db_compat import DBDatabase
+
+ALL = "*"
+
+# Re-scan this far behind the last refresh for transactions still in flight
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+def normalize_scope(value: Optional[str]) -> str:
+    """Lane as stored in resolution_stats"""
+    return (value or "").strip().lower()
+
+
+class ResolutionStatsService:
+    def __init__(self, db, min_cases: int = 3):
+        self.db = db
+        # Fall back to a broader row when the exact scope has fewer cases
+        self.min_cases = min_cases
+
+    async def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Recompute stats for types with newly resolved cases (all types when full)"""
+        if not isinstance(self.db, DBDatabase):
+            print("Warning: Resolution stats need the Supabase database; skipping refresh")
+            return {"rows": 0, "since": None}
+
+        since = None
+        if not full:
+            latest = await self.db.resolution_stats.find_one({}, sort=[("updated_at", -1)])
+            if latest and latest.get("updated_at"):
+                since = latest["updated_at"] - REFRESH_OVERLAP
+
+        started = time.monotonic()
+        rows = await self.db.adapter.resolution_stats_refresh(since)
+        return {"rows": rows, "since": since, "duration_ms": round((time.monotonic() - started) * 1000)}
+
+    async def get_stats(
+        self,
+        operator_id: str,
+        disruption_type: str,
+        lane: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Most specific stats row with at least min_cases cases: the lane, then
+        the whole type. Reads both scopes in one query.
+        """
+        if not disruption_type:
+            return None
+
+        lane = normalize_scope(lane)
+        scopes = [lane, ALL]
+        cursor = await self.db.resolution_stats.find(
+            {
+                "operator_id": str(operator_id),
+                "disruption_type": disruption_type,
+                "lane": {"$in": list({lane, ALL})}
+            },
+            limit=0
+        )
+        rows = {row.get("lane"): row for row in await cursor.to_list()}
+
+        candidates = [rows[scope] for scope in scopes if scope in rows]
+        if not candidates:
+            return None
+        best = next((row for row in candidates if (row.get("case_count") or 0) >= self.min_cases), candidates[-1])
+        return self._serialize(best)
+
+    @staticmethod
+    def _serialize(row: Dict[str, Any]) -> Dict[str, Any]:
+        def hours(value):
+            return round(float(value), 1) if isinstance(value, (Decimal, float, int)) else None
+
+        return {
+            "disruption_type": row.get("disruption_type"),
+            "lane": row.get("lane"),
+            "case_count": row.get("case_count") or 0,
+            "resolution_hours": {
+                "p50": hours(row.get("p50_hours")),
+                "p75": hours(row.get("p75_hours")),
+                "p90": hours(row.get("p90_hours"))
+            },
+            "top_root_causes": row.get("top_root_causes") or [],
+            "sample_case_ids": list(row.get("sample_case_ids") or []),
+            "last_resolved_at": row.get("last_resolved_at"),
+            "updated_at": row.get("updated_at")
+        }
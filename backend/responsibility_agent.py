@@ -4,7 +4,7 @@ Analyzes case data to determine who is responsible for the disruption.
 """
 
 from typing import Dict, Any
-from llm_client import LlmChat, UserMessage
+from llm_client import LlmChat, LlmOverloadedError, UserMessage
 import os
 import json
 
@@ -42,7 +42,7 @@ class ResponsibilityAgent:
             api_key=self.api_key,
             session_id=f"resp-{case_id}",
             system_message="You are a logistics dispute arbitrator. Assign responsibility for the delay based on evidence."
-        ).with_model("gemini", "gemini-2.5-flash")
+        ).for_task("responsibility")
 
         prompt = f"""
         Based on the following case data, determine the PRIMARY responsible party for the disruption.
@@ -72,6 +72,7 @@ class ResponsibilityAgent:
                 text = text.split("```")[1].split("```")[0]
             
             result = json.loads(text.strip())
+            result["ai_model"] = chat.served_model
             
             # Update DB
             await self.db.cases.update_one(
@@ -81,6 +82,8 @@ class ResponsibilityAgent:
             
             return result
 
+        except LlmOverloadedError:
+            raise
         except Exception as e:
             print(f"Responsibility analysis failed: {e}")
             return {
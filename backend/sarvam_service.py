@@ -3,14 +3,45 @@
 import os
 import httpx
 import asyncio
-from typing import Dict, Any, Optional
+from typing import BinaryIO, Dict, Any, List, Optional, Union
 from dotenv import load_dotenv
 
+from audio_normalizer import prepare_for_stt
+from audio_segmenter import stitch_transcripts
+from tts_cache import get_tts_cache, tts_cache_key
+from voice_prompts import warmup_phrases
+
 load_dotenv()
 
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
 SARVAM_BASE_URL = "https://api.sarvam.ai"
 
+# Long recordings are split into segments of at most this many seconds,
+# transcribed up to SARVAM_STT_CONCURRENCY at a time
+SARVAM_STT_MAX_SECONDS = float(os.getenv("SARVAM_STT_MAX_SECONDS", "25"))
+SARVAM_STT_CONCURRENCY = int(os.getenv("SARVAM_STT_CONCURRENCY", "4"))
+
+SARVAM_TTS_MODEL = "bulbul:v2"
+
+# Upload content types by audio format (file extension)
+AUDIO_MIME_TYPES = {
+    "wav": "audio/wav",
+    "webm": "audio/webm",
+    "ogg": "audio/ogg",
+    "opus": "audio/ogg",
+    "mp3": "audio/mpeg",
+    "m4a": "audio/mp4",
+    "mp4": "audio/mp4",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+}
+
+
+def audio_mime_type(audio_format: Optional[str]) -> str:
+    """Content type for an audio format such as "webm" or "wav" (defaults to audio/wav)"""
+    return AUDIO_MIME_TYPES.get((audio_format or "wav").lower().lstrip("."), "audio/wav")
+
+
 class SarvamService:
     """Handles Sarvam AI Speech-to-Text and Text-to-Speech operations"""
     
@@ -22,6 +53,37 @@ class SarvamService:
         self.tts_headers = {
             "api-subscription-key": self.api_key  # TTS also uses subscription key
         }
+        # Pooled keep-alive client, opened by the app lifespan (or on first use)
+        # and bound to the event loop that opened it
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client; limits from SARVAM_HTTP_MAX_CONNECTIONS and SARVAM_HTTP_MAX_KEEPALIVE"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=SARVAM_BASE_URL,
+                timeout=60.0,
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("SARVAM_HTTP_MAX_CONNECTIONS", "20")),
+                    max_keepalive_connections=int(os.getenv("SARVAM_HTTP_MAX_KEEPALIVE", "10")),
+                    keepalive_expiry=float(os.getenv("SARVAM_HTTP_KEEPALIVE_EXPIRY", "60"))
+                )
+            )
+            self._client_loop = loop
+        return self._client
+    
+    async def open(self):
+        """Open the pooled client (app startup)"""
+        self.client()
+    
+    async def close(self):
+        """Close the pooled client (app shutdown)"""
+        if self._client is not None and not self._client.is_closed and self._client_loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
     
     async def speech_to_text(self, audio_file_path: str, language_code: str = "hi-IN") -> Dict[str, Any]:
         """
@@ -39,36 +101,59 @@ class SarvamService:
             Dictionary with transcript and metadata
         """
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                with open(audio_file_path, 'rb') as audio_file:
-                    files = {
-                        'file': (os.path.basename(audio_file_path), audio_file, 'audio/wav')
-                    }
-                    
-                    # Use Saarika model for transcription
-                    # IMPORTANT: language_code is REQUIRED for saarika:v1
-                    data = {
-                        'model': 'saarika:v1',
-                        'language_code': language_code  # MANDATORY parameter
-                    }
-                    
-                    response = await client.post(
-                        f"{SARVAM_BASE_URL}/speech-to-text",
-                        headers=self.stt_headers,
-                        files=files,
-                        data=data
-                    )
-                    
-                    response.raise_for_status()
-                    result = response.json()
-                    
-                    return {
-                        "transcript": result.get("transcript", ""),
-                        "language_code": result.get("language_code", "unknown"),
-                        "duration": result.get("duration"),
-                        "timestamps": result.get("timestamps", []),
-                        "success": True
-                    }
+            with open(audio_file_path, 'rb') as audio_file:
+                audio = audio_file.read()
+        except OSError as e:
+            return {"success": False, "error": f"Speech-to-text failed: {str(e)}"}
+        
+        return await self.speech_to_text_bytes(
+            audio,
+            audio_format=os.path.splitext(audio_file_path)[1] or "wav",
+            language_code=language_code,
+            filename=os.path.basename(audio_file_path)
+        )
+    
+    async def speech_to_text_bytes(
+        self,
+        audio: Union[bytes, BinaryIO],
+        audio_format: str = "wav",
+        language_code: str = "hi-IN",
+        filename: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Convert in-memory audio (bytes or a file-like object) to text; nothing
+        is written to disk. Same result as speech_to_text.
+        """
+        try:
+            audio_format = (audio_format or "wav").lower().lstrip(".")
+            files = {
+                'file': (filename or f"audio.{audio_format}", audio, audio_mime_type(audio_format))
+            }
+            
+            # Use Saarika model for transcription
+            # IMPORTANT: language_code is REQUIRED for saarika:v1
+            data = {
+                'model': 'saarika:v1',
+                'language_code': language_code  # MANDATORY parameter
+            }
+            
+            response = await self.client().post(
+                "/speech-to-text",
+                headers=self.stt_headers,
+                files=files,
+                data=data
+            )
+            
+            response.raise_for_status()
+            result = response.json()
+            
+            return {
+                "transcript": result.get("transcript", ""),
+                "language_code": result.get("language_code", "unknown"),
+                "duration": result.get("duration"),
+                "timestamps": result.get("timestamps", []),
+                "success": True
+            }
         
         except httpx.HTTPStatusError as e:
             return {
@@ -81,63 +166,167 @@ class SarvamService:
                 "error": f"Speech-to-text failed: {str(e)}"
             }
     
-    async def text_to_speech(self, text: str, language_code: str = "hi-IN", speaker: str = "anushka") -> bytes:
+    async def speech_to_text_segmented(
+        self,
+        audio: bytes,
+        audio_format: str = "wav",
+        language_code: str = "hi-IN",
+        max_seconds: Optional[float] = None,
+        overlap: float = 1.0,
+        concurrency: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Transcribe a recording of any length. It is normalized (16 kHz mono,
+        silence trimmed, see audio_normalizer) and split into segments that
+        are transcribed concurrently and stitched back together, so latency
+        is bounded by the longest segment. A failed
+        segment is retried once; if some still fail the result is partial
+        (success with partial=True and failed_segments) instead of an error.
+        """
+        prepared = await prepare_for_stt(audio, audio_format, max_seconds or SARVAM_STT_MAX_SECONDS, overlap)
+        segments = prepared.segments
+        semaphore = asyncio.Semaphore(concurrency or SARVAM_STT_CONCURRENCY)
+        
+        async def transcribe(segment):
+            async with semaphore:
+                for _ in range(2):
+                    result = await self.speech_to_text_bytes(
+                        segment.data,
+                        audio_format=segment.audio_format,
+                        language_code=language_code,
+                        filename=f"segment-{segment.index}.{segment.audio_format}"
+                    )
+                    if result.get("success"):
+                        break
+            return {**result, "index": segment.index, "start": segment.start, "end": segment.end}
+        
+        results = await asyncio.gather(*(transcribe(segment) for segment in segments))
+        succeeded = [r for r in results if r.get("success")]
+        if not succeeded:
+            return {"success": False, "error": results[0].get("error"), "segments": len(segments), "audio": prepared.stats}
+        
+        stitched = stitch_transcripts(results)
+        if stitched["failed_segments"]:
+            print(f"Warning: {len(stitched['failed_segments'])} of {len(segments)} audio segments failed to transcribe")
+        
+        return {
+            "transcript": stitched["transcript"],
+            "language_code": succeeded[0].get("language_code", "unknown"),
+            "duration": segments[-1].end or succeeded[0].get("duration"),
+            "timestamps": stitched["timestamps"],
+            "segments": len(segments),
+            "failed_segments": stitched["failed_segments"],
+            "partial": bool(stitched["failed_segments"]),
+            "audio": prepared.stats,
+            "success": True
+        }
+    
+    async def text_to_speech(
+        self,
+        text: str,
+        language_code: str = "hi-IN",
+        speaker: str = "anushka",
+        pitch: float = 0.0,
+        pace: float = 1.0,
+        loudness: float = 1.0,
+        use_cache: bool = True
+    ) -> bytes:
         """
         Convert text to speech using Sarvam AI Bulbul v2
-        Supports 11 Indian languages with natural voices
+        Supports 11 Indian languages with natural voices. Results are kept in
+        the TTS phrase cache (see tts_cache), so repeated prompts skip Sarvam.
         
         Args:
             text: Text to convert (up to 1500 characters)
             language_code: Language code (e.g., hi-IN, en-IN, ta-IN)
             speaker: Voice name (anushka, vidya, manisha, arya, etc.)
+            pitch, pace, loudness: Voice settings
+            use_cache: Read and write the phrase cache
         
         Returns:
             Audio bytes in WAV format
         """
+        cache = get_tts_cache() if use_cache else None
+        key = tts_cache_key(text, language_code, speaker, SARVAM_TTS_MODEL, pitch, pace, loudness) if cache else None
+        if cache:
+            cached = await cache.get(key)
+            if cached:
+                return cached
+        
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                payload = {
-                    "text": text,  # Single text, not array
-                    "language": language_code,
-                    "speaker": speaker,
-                    "model": "bulbul:v2",  # Updated to v2
-                    "enable_preprocessing": True,  # Better handling of numbers, dates, currencies
-                    "pitch": 0.0,
-                    "pace": 1.0,
-                    "loudness": 1.0
-                }
-                
-                response = await client.post(
-                    f"{SARVAM_BASE_URL}/text-to-speech",
-                    headers={
-                        **self.tts_headers,
-                        "Content-Type": "application/json"
-                    },
-                    json=payload
-                )
-                
-                response.raise_for_status()
-                
-                # Sarvam returns audio directly in response
-                # Check content type - could be audio/wav or application/json with base64
-                content_type = response.headers.get('content-type', '')
-                
-                if 'audio' in content_type:
-                    # Direct audio bytes
-                    return response.content
-                else:
-                    # JSON with base64 encoded audio
-                    result = response.json()
-                    import base64
-                    audio_base64 = result.get("audios", [""])[0] if isinstance(result.get("audios"), list) else result.get("audio", "")
-                    if audio_base64:
-                        audio_bytes = base64.b64decode(audio_base64)
-                        return audio_bytes
-                    return b""
+            payload = {
+                "text": text,  # Single text, not array
+                "language": language_code,
+                "speaker": speaker,
+                "model": SARVAM_TTS_MODEL,
+                "enable_preprocessing": True,  # Better handling of numbers, dates, currencies
+                "pitch": pitch,
+                "pace": pace,
+                "loudness": loudness
+            }
+            
+            response = await self.client().post(
+                "/text-to-speech",
+                headers={
+                    **self.tts_headers,
+                    "Content-Type": "application/json"
+                },
+                json=payload,
+                timeout=30.0
+            )
+            
+            response.raise_for_status()
+            
+            # Sarvam returns audio directly in response
+            # Check content type - could be audio/wav or application/json with base64
+            content_type = response.headers.get('content-type', '')
+            
+            if 'audio' in content_type:
+                # Direct audio bytes
+                audio_bytes = response.content
+            else:
+                # JSON with base64 encoded audio
+                result = response.json()
+                import base64
+                audio_base64 = result.get("audios", [""])[0] if isinstance(result.get("audios"), list) else result.get("audio", "")
+                audio_bytes = base64.b64decode(audio_base64) if audio_base64 else b""
         
         except Exception as e:
             print(f"Text-to-speech error: {e}")
             return b""  # Return empty bytes on error
+        
+        if cache and audio_bytes:
+            await cache.set(key, audio_bytes)
+        return audio_bytes
+    
+    async def warm_tts_cache(
+        self,
+        languages: Optional[List[str]] = None,
+        speaker: str = "anushka",
+        concurrency: int = 2
+    ) -> Dict[str, int]:
+        """
+        Pre-synthesize the fixed prompts the clients speak (voice_prompts) into the
+        TTS cache. Prompts already cached are skipped, so this only spends
+        quota on the first run or after eviction.
+        """
+        cache = get_tts_cache()
+        counts = {"cached": 0, "synthesized": 0, "failed": 0}
+        if cache is None or not self.api_key:
+            return counts
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def warm(text, language_code):
+            async with semaphore:
+                if await cache.get(tts_cache_key(text, language_code, speaker, SARVAM_TTS_MODEL)):
+                    counts["cached"] += 1
+                elif await self.text_to_speech(text, language_code, speaker):
+                    counts["synthesized"] += 1
+                else:
+                    counts["failed"] += 1
+        
+        await asyncio.gather(*(warm(text, language) for text, language in warmup_phrases(languages)))
+        return counts
     
     async def translate_and_transcribe(self, audio_file_path: str, source_language_code: str = "hi-IN") -> Dict[str, Any]:
         """
@@ -152,34 +341,54 @@ class SarvamService:
             Dictionary with English translation and original language
         """
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                with open(audio_file_path, 'rb') as audio_file:
-                    files = {
-                        'file': (os.path.basename(audio_file_path), audio_file, 'audio/wav')
-                    }
-                    
-                    # Saaras model for translation to English
-                    data = {
-                        'model': 'saaras:v1',
-                        'language_code': source_language_code  # Source language
-                    }
-                    
-                    response = await client.post(
-                        f"{SARVAM_BASE_URL}/speech-to-text-translate",
-                        headers=self.stt_headers,
-                        files=files,
-                        data=data
-                    )
-                    
-                    response.raise_for_status()
-                    result = response.json()
-                    
-                    return {
-                        "transcript": result.get("transcript", ""),  # English translation
-                        "language_code": result.get("language_code", "unknown"),
-                        "duration": result.get("duration"),
-                        "success": True
-                    }
+            with open(audio_file_path, 'rb') as audio_file:
+                audio = audio_file.read()
+        except OSError as e:
+            return {"success": False, "error": f"Translation failed: {str(e)}"}
+        
+        return await self.translate_and_transcribe_bytes(
+            audio,
+            audio_format=os.path.splitext(audio_file_path)[1] or "wav",
+            source_language_code=source_language_code,
+            filename=os.path.basename(audio_file_path)
+        )
+    
+    async def translate_and_transcribe_bytes(
+        self,
+        audio: Union[bytes, BinaryIO],
+        audio_format: str = "wav",
+        source_language_code: str = "hi-IN",
+        filename: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """In-memory variant of translate_and_transcribe"""
+        try:
+            audio_format = (audio_format or "wav").lower().lstrip(".")
+            files = {
+                'file': (filename or f"audio.{audio_format}", audio, audio_mime_type(audio_format))
+            }
+            
+            # Saaras model for translation to English
+            data = {
+                'model': 'saaras:v1',
+                'language_code': source_language_code  # Source language
+            }
+            
+            response = await self.client().post(
+                "/speech-to-text-translate",
+                headers=self.stt_headers,
+                files=files,
+                data=data
+            )
+            
+            response.raise_for_status()
+            result = response.json()
+            
+            return {
+                "transcript": result.get("transcript", ""),  # English translation
+                "language_code": result.get("language_code", "unknown"),
+                "duration": result.get("duration"),
+                "success": True
+            }
         
         except Exception as e:
             return {
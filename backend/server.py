@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, status, Response, BackgroundTasks, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional, Dict, Any
@@ -14,7 +15,7 @@ from contextlib import asynccontextmanager
 from uuid import UUID
 
 # Import AI modules
-from ai_decision import generate_decision_structure
+from ai_decision import generate_decision_structure, parse_decision_structure, stream_decision_structure
 from sarvam_service import sarvam_service
 from voice_assistant import voice_assistant
 from rca_engine import RCAEngine
@@ -22,12 +23,13 @@ from coordination_manager import CoordinationManager
 from master_data_service import MasterDataService
 from integration_service import integration_service
 from similarity_engine import SimilarityEngine
+from resolution_stats_service import ResolutionStatsService
 from analytics_service import AnalyticsService
 from fastapi import UploadFile, File
 from document_processor import document_processor
-import aiofiles
 import base64
 import io
+import json
 from dispute_service import DisputeBundleService
 from evidence_service import EvidenceService
 from responsibility_agent import ResponsibilityAgent
@@ -37,6 +39,12 @@ from operator_service import OperatorService
 # Import Supabase database adapter
 from db_adapter import SupabaseAdapter
 from db_compat import DBDatabase
+from cache import SharedCache, TTLCache
+from driver_link_service import DriverLinkService
+from llm_client import LlmOverloadedError, close_llm_clients
+from audio_normalizer import shutdown_audio_pool
+from sse import sse_llm_response, sse_result_response
+from driver_stream import DriverStreamSession
 
 # Initialize voice assistant and RCA engine (lazy initialization)
 rca_engine = None
@@ -85,6 +93,74 @@ JWT_EXPIRATION_HOURS = 24
 db_adapter = None
 db = None
 
+# Movement totals are expensive on large fleets; cache them briefly per filter set
+movement_count_cache = TTLCache(maxsize=1024, ttl=float(os.getenv("MOVEMENT_COUNT_CACHE_TTL", "30")))
+
+# Verified identities by JWT user_id, so authenticated requests skip the users lookup.
+# Shared across workers through Redis when REDIS_URL is set.
+user_cache = SharedCache(
+    "users",
+    maxsize=int(os.getenv("USER_CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+)
+
+
+async def invalidate_cached_user(query: Dict[str, Any]):
+    """Drop cached identities after a write to users"""
+    user_id = query.get("_id") or query.get("id")
+    if isinstance(user_id, (str, UUID)):
+        await user_cache.delete(str(user_id))
+    else:
+        await user_cache.clear()
+
+
+# Operator records by user_id for /api/operators/* endpoints
+operator_cache = SharedCache(
+    "operators",
+    maxsize=int(os.getenv("OPERATOR_CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.getenv("OPERATOR_CACHE_TTL_SECONDS", "60"))
+)
+
+
+async def invalidate_cached_operators(query: Dict[str, Any]):
+    """Drop cached operators after a write to operators (keys are user IDs, not operator IDs)"""
+    await operator_cache.clear()
+
+
+# Resolved driver magic links; use counts are written in batches
+driver_link_service = DriverLinkService(
+    None,
+    maxsize=int(os.getenv("DRIVER_LINK_CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.getenv("DRIVER_LINK_CACHE_TTL_SECONDS", "300")),
+    flush_interval=float(os.getenv("DRIVER_LINK_FLUSH_SECONDS", "30"))
+)
+
+
+def get_driver_link_service() -> DriverLinkService:
+    """Driver link service bound to the current database"""
+    driver_link_service.db = db
+    return driver_link_service
+
+
+async def invalidate_driver_links(query: Dict[str, Any]):
+    """Drop resolved driver links after a write to links or vehicles"""
+    driver_link_service.cache.clear()
+
+
+async def invalidate_movement_counts(query: Dict[str, Any]):
+    """Drop cached movement totals after any write to cases (status changes move cases between filters)"""
+    movement_count_cache.clear()
+
+
+def register_cache_hooks(database):
+    """Invalidate in-process caches when the underlying rows change"""
+    if isinstance(database, DBDatabase):
+        database.on_write("users", invalidate_cached_user)
+        database.on_write("operators", invalidate_cached_operators)
+        database.on_write("magic_links", invalidate_driver_links)
+        database.on_write("fleet_vehicles", invalidate_driver_links)
+        database.on_write("cases", invalidate_movement_counts)
+
 # For ObjectId compatibility (convert to UUID)
 class ObjectId:
     """Compatibility class for ObjectId"""
@@ -110,6 +186,7 @@ async def lifespan(app: FastAPI):
             db_adapter = SupabaseAdapter(SUPABASE_DB_URL)
             await db_adapter.connect()
             db = DBDatabase(db_adapter)
+            register_cache_hooks(db)
             print(f"✅ Connected to Supabase PostgreSQL")
         except Exception as e:
             print(f"❌ Failed to connect to Supabase: {e}")
@@ -140,9 +217,29 @@ async def lifespan(app: FastAPI):
     # Initialize Coordination Manager
     coordination_manager = CoordinationManager(db)
     
+    # Pooled Sarvam connections for voice endpoints
+    await sarvam_service.open()
+    
+    # Pre-synthesize the fixed client prompts into the TTS cache in the background
+    tts_warmup = None
+    if os.getenv("TTS_CACHE_WARMUP", "false").lower() in ("1", "true", "yes"):
+        tts_warmup = asyncio.create_task(sarvam_service.warm_tts_cache())
+    
+    # Write batched driver link use counts every DRIVER_LINK_FLUSH_SECONDS
+    driver_link_flush = asyncio.create_task(get_driver_link_service().run_flush_loop())
+    
     yield
     
     # Shutdown
+    if tts_warmup and not tts_warmup.done():
+        tts_warmup.cancel()
+    driver_link_flush.cancel()
+    await get_driver_link_service().flush()
+    await close_llm_clients()
+    await sarvam_service.close()
+    shutdown_audio_pool()
+    await user_cache.close()
+    await operator_cache.close()
     if USE_SUPABASE and db_adapter:
         await db_adapter.close()
         print("Closed Supabase connection")
@@ -169,17 +266,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Add monitoring middleware (if available)
 try:
-    from middleware import MonitoringMiddleware, ErrorHandlingMiddleware
+    from middleware import MonitoringMiddleware, ErrorHandlingMiddleware, ReadYourWritesMiddleware
     app.add_middleware(MonitoringMiddleware)
     app.add_middleware(ErrorHandlingMiddleware)
+    if os.getenv("SUPABASE_DB_REPLICA_URLS"):
+        app.add_middleware(ReadYourWritesMiddleware)
 except ImportError:
     # Middleware not critical, continue without it
     pass
 
+@app.exception_handler(LlmOverloadedError)
+async def llm_overloaded_handler(request, exc: LlmOverloadedError):
+    """LLM calls that could not be scheduled in time are 429s, not 500s"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"AI service busy, please retry: {str(exc)}"},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+    )
+
 security = HTTPBearer()
 
 # ============================================================================
@@ -300,7 +409,8 @@ class AssignOwner(BaseModel):
     owner_email: EmailStr
 
 class TransitionState(BaseModel):
-    target_status: str
+    next_state: DisruptionStatus
+    reason: Optional[str] = None
 
 # API v0 Models
 class CreateFacility(BaseModel):
@@ -421,21 +531,23 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        # Verify user exists - try both _id and id fields
-        user = await db.users.find_one({"_id": user_id})
-        if not user:
-            # Try with id field as fallback
-            user = await db.users.find_one({"id": user_id})
-        
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        
-        # Ensure we return the correct user_id format
-        actual_user_id = str(user.get("_id") or user.get("id") or user_id)
+        # The token is already verified; only confirm the user still exists
+        identity = await user_cache.get(user_id)
+        if identity is None:
+            user = await db.users.find_one({"_id": user_id})
+            if not user:
+                raise HTTPException(status_code=401, detail="User not found")
+            
+            # Ensure we return the correct user_id format
+            identity = {
+                "user_id": str(user.get("_id") or user.get("id") or user_id),
+                "email": user.get("email")
+            }
+            await user_cache.set(user_id, identity)
         
         return {
-            "user_id": actual_user_id,
-            "email": email or user.get("email")
+            "user_id": identity["user_id"],
+            "email": email or identity["email"]
         }
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -452,6 +564,7 @@ async def ensure_db_initialized():
                 db_adapter = SupabaseAdapter(SUPABASE_DB_URL)
                 await db_adapter.connect()
                 db = DBDatabase(db_adapter)
+                register_cache_hooks(db)
                 coordination_manager = CoordinationManager(db)
                 print("Database initialized in serverless function")
             except Exception as e:
@@ -660,53 +773,42 @@ async def list_cases(
     cursor = await db.cases.find(query, sort=[("updated_at", -1)], limit=100)
     cases = await cursor.to_list(length=100)
     
-    # Get last timeline event for each case
+    # Get last timeline event for every case in a single query
+    case_ids = [str(case.get("_id") or case.get("id")) for case in cases if case.get("_id") or case.get("id")]
+    try:
+        last_events = await db.timeline_events.find_latest_by_case(case_ids)
+    except Exception as e:
+        print(f"Error fetching last timeline events: {e}")
+        last_events = {}
+
     for case in cases:
-        # Ensure _id exists
         case_id = str(case.get("_id") or case.get("id"))
-        if not case_id:
-            continue  # Skip cases without ID
-        
-        try:
-            last_event = await db.timeline_events.find_one(
-                {"case_id": case_id},
-                sort=[("timestamp", -1)]
-            )
-            case["last_event"] = serialize_doc(last_event) if last_event else None
-        except Exception as e:
-            print(f"Error fetching timeline event for case {case_id}: {e}")
-            case["last_event"] = None
-    
+        last_event = last_events.get(case_id)
+        case["last_event"] = serialize_doc(last_event) if last_event else None
+
     return [serialize_doc(case) for case in cases]
 
 @app.get("/api/cases/{case_id}")
-async def get_case(case_id: str, current_user: dict = Depends(get_current_user)):
+async def get_case(
+    case_id: str,
+    timeline_limit: int = 500,
+    timeline_cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     try:
-        case = await db.cases.find_one({"_id": case_id, "operator_id": current_user["user_id"]})
-        if not case:
+        # Case, timeline, draft, approvals and decision in a single round trip
+        detail = await db.load_case_detail(
+            case_id,
+            current_user["user_id"],
+            timeline_limit=min(max(timeline_limit, 1), 1000),
+            timeline_cursor=timeline_cursor
+        )
+        if not detail:
             raise HTTPException(status_code=404, detail="Case not found")
         
-        # Get timeline events
-        timeline_cursor = await db.timeline_events.find({"case_id": case_id}, sort=[("timestamp", -1)], limit=500)
-        timeline_events = await timeline_cursor.to_list(length=500)
-        
-        # Get draft if exists (for legacy decision flow)
-        draft = await db.drafts.find_one({"case_id": case_id})
-        
-        # Get approvals (for legacy decision flow)
-        approvals_cursor = await db.approvals.find({"case_id": case_id}, limit=100)
-        approvals = await approvals_cursor.to_list(length=100)
-        
-        # Get decision if exists (for legacy decision flow)
-        decision = await db.decisions.find_one({"case_id": case_id})
-        
-        return serialize_doc({
-            "case": case,
-            "timeline": timeline_events,
-            "draft": draft,
-            "approvals": approvals,
-            "decision": decision
-        })
+        return serialize_doc(detail)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -733,29 +835,70 @@ async def generate_ai_draft(case_id: str, current_user: dict = Depends(get_curre
             shipment_data=case["shipment_identifiers"]
         )
         
-        # Store draft
-        draft = {
-            "case_id": case_id,
-            "decision_framing": decision_structure.get("decision_framing"),
-            "known_inputs": decision_structure.get("known_inputs"),
-            "declared_assumptions": decision_structure.get("declared_assumptions"),
-            "alternatives": decision_structure.get("alternatives"),
-            "risk_and_downside": decision_structure.get("alternatives", []),  # Same as alternatives for now
-            "recommendation": decision_structure.get("recommendation"),
-            "ai_model": "gemini-2.5-flash",
-            "created_at": datetime.now(timezone.utc)
-        }
+        return await store_ai_draft(case_id, decision_structure, current_user)
+    except HTTPException:
+        raise
+    except LlmOverloadedError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
+
+@app.post("/api/cases/{case_id}/ai_draft/stream")
+async def stream_ai_draft(case_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Generate the AI draft as server-sent events: token and section events
+    while the model writes, then the stored draft as the result event
+    """
+    try:
+        case = await db.cases.find_one({"_id": case_id, "operator_id": current_user["user_id"]})
+        if not case:
+            raise HTTPException(status_code=404, detail="Case not found")
         
-        result = await db.drafts.insert_one(draft)
-        draft["_id"] = result.inserted_id
+        existing_draft = await db.drafts.find_one({"case_id": case_id})
+        if existing_draft:
+            return sse_result_response(serialize_doc(existing_draft))
+        
+        chat, chunks = await stream_decision_structure(
+            description=case["description"],
+            disruption_details=case["disruption_details"],
+            shipment_data=case["shipment_identifiers"]
+        )
         
-        await log_audit(case_id, current_user["email"], "AI_DRAFT_GENERATED", {"model": "gemini-2.5-flash"})
-        await db.cases.update_one({"_id": case_id}, {"$set": {"status": "reviewing", "updated_at": datetime.utcnow()}})
+        async def finalize(response: str):
+            decision_structure = parse_decision_structure(response)
+            decision_structure["ai_model"] = chat.served_model
+            return await store_ai_draft(case_id, decision_structure, current_user)
         
-        return serialize_doc(draft)
+        return await sse_llm_response(chunks, finalize, sections=True)
+    except HTTPException:
+        raise
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
+async def store_ai_draft(case_id: str, decision_structure: dict, current_user: dict) -> dict:
+    """Store a generated decision structure as the case's draft"""
+    draft = {
+        "case_id": case_id,
+        "decision_framing": decision_structure.get("decision_framing"),
+        "known_inputs": decision_structure.get("known_inputs"),
+        "declared_assumptions": decision_structure.get("declared_assumptions"),
+        "alternatives": decision_structure.get("alternatives"),
+        "risk_and_downside": decision_structure.get("alternatives", []),  # Same as alternatives for now
+        "recommendation": decision_structure.get("recommendation"),
+        "ai_model": decision_structure.get("ai_model"),
+        "created_at": datetime.now(timezone.utc)
+    }
+    
+    result = await db.drafts.insert_one(draft)
+    draft["_id"] = result.inserted_id
+    
+    await log_audit(case_id, current_user["email"], "AI_DRAFT_GENERATED", {"model": draft["ai_model"]})
+    await db.cases.update_one({"_id": case_id}, {"$set": {"status": "reviewing", "updated_at": datetime.utcnow()}})
+    
+    return serialize_doc(draft)
+
 # ============================================================================
 # SECTION EDIT & APPROVAL ROUTES
 # ============================================================================
@@ -863,26 +1006,59 @@ async def finalize_decision(case_id: str, finalize_data: FinalizeDecision, curre
 # ============================================================================
 
 @app.get("/api/audit")
-async def list_audit_trail(current_user: dict = Depends(get_current_user)):
-    # Get all cases for this user
-    cases_cursor = await db.cases.find({"operator_id": current_user["user_id"]})
-    cases = await cases_cursor.to_list(length=None)
-    case_ids = [str(case.get("_id") or case.get("id")) for case in cases if case.get("_id") or case.get("id")]
+async def list_audit_trail(
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    # Audit entries across all of this user's cases, newest first.
+    # The cursor for the next page is returned in the X-Next-Cursor header.
+    limit = min(max(limit, 1), 500)
+    try:
+        entries, next_cursor = await db.audit_entries.find_page(
+            {"operator_id": current_user["user_id"]}, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Get audit entries for these cases
-    cursor = await db.audit_entries.find({"case_id": {"$in": case_ids}}, sort=[("timestamp", -1)], limit=100)
-    entries = await cursor.to_list(length=100)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [serialize_doc(entry) for entry in entries]
 
 @app.get("/api/cases/{case_id}/audit")
-async def get_case_audit(case_id: str, current_user: dict = Depends(get_current_user)):
+async def get_case_audit(
+    case_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Audit entries for a case, oldest first. Without limit or cursor the
+    whole trail is returned, as existing clients expect; pass limit (or
+    X-Next-Cursor back as cursor) to page through it instead.
+    """
     # Verify case belongs to user
     case = await db.cases.find_one({"_id": case_id, "operator_id": current_user["user_id"]})
     if not case:
         raise HTTPException(status_code=404, detail="Case not found")
     
-    cursor = await db.audit_entries.find({"case_id": case_id}, sort=[("timestamp", 1)])
-    entries = await cursor.to_list(length=None)
+    if limit is None and cursor is None:
+        entries_cursor = await db.audit_entries.find({"case_id": case_id}, sort=[("timestamp", 1)])
+        entries = await entries_cursor.to_list(length=None)
+        return [serialize_doc(entry) for entry in entries]
+    
+    limit = min(max(limit or 500, 1), 1000)
+    try:
+        entries, next_cursor = await db.audit_entries.find_page(
+            {"case_id": case_id}, limit=limit, cursor=cursor, ascending=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [serialize_doc(entry) for entry in entries]
 
 # ============================================================================
@@ -992,13 +1168,16 @@ async def analyze_responsibility(case_id: str, current_user: dict = Depends(get_
         )
         
         await log_audit(case_id, current_user["email"], "RESPONSIBILITY_ANALYZED", {
-            "responsible_party": responsibility_data.get("responsible_party")
+            "responsible_party": responsibility_data.get("responsible_party"),
+            "model": responsibility_data.get("ai_model")
         })
         
         return responsibility_data
         
     except HTTPException:
         raise
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to analyze responsibility: {str(e)}")
 
@@ -1029,6 +1208,8 @@ async def get_responsibility(case_id: str, current_user: dict = Depends(get_curr
         
     except HTTPException:
         raise
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get responsibility: {str(e)}")
 
@@ -1125,7 +1306,7 @@ async def assign_owner(case_id: str, assignment: AssignOwner, current_user: dict
         raise HTTPException(status_code=500, detail=f"Failed to assign owner: {str(e)}")
 
 @app.post("/api/cases/{case_id}/transition")
-async def transition_state(case_id: str, transition: TransitionState, current_user: dict = Depends(get_current_user)):
+async def transition_state(case_id: str, transition: TransitionState, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
     """
     Transition disruption to next state.
     ONLY the decision owner can advance states.
@@ -1163,46 +1344,54 @@ async def transition_state(case_id: str, transition: TransitionState, current_us
         
         now = datetime.now(timezone.utc)
         
-        # Update case status
-        await db.cases.update_one(
-            {"_id": case_id},
-            {
-                "$set": {
-                    "status": next_state,
-                    "updated_at": now
-                }
-            }
-        )
-        
-        # Create audit log
-        await log_audit(case_id, current_user["email"], "STATE_TRANSITION", {
-            "from_state": current_state,
-            "to_state": next_state,
-            "reason": transition.reason
-        })
-        
-        # Create timeline event
         content = f"State advanced from {current_state} to {next_state}"
         if transition.reason:
             content += f": {transition.reason}"
         
-        await db.timeline_events.insert_one({
-            "case_id": case_id,
-            "actor": current_user["email"],
-            "action": "STATE_TRANSITION",
-            "content": content,
-            "source_type": SourceType.SYSTEM.value,
-            "reliability": ReliabilityLevel.HIGH.value,
-            "timestamp": now,
-            "metadata": {
+        # Status change, audit entry and timeline event commit together
+        async with db.transaction():
+            await db.cases.update_one(
+                {"_id": case_id},
+                {
+                    "$set": {
+                        "status": next_state,
+                        "updated_at": now
+                    }
+                }
+            )
+            
+            await log_audit(case_id, current_user["email"], "STATE_TRANSITION", {
                 "from_state": current_state,
                 "to_state": next_state,
                 "reason": transition.reason
-            }
-        })
+            })
+            
+            await db.timeline_events.insert_one({
+                "case_id": case_id,
+                "actor": current_user["email"],
+                "action": "STATE_TRANSITION",
+                "content": content,
+                "source_type": SourceType.SYSTEM.value,
+                "reliability": ReliabilityLevel.HIGH.value,
+                "timestamp": now,
+                "metadata": {
+                    "from_state": current_state,
+                    "to_state": next_state,
+                    "reason": transition.reason
+                }
+            })
         
         # Get updated case
         updated_case = await db.cases.find_one({"_id": case_id})
+        
+        if next_state == DisruptionStatus.RESOLVED.value:
+            try:
+                await SimilarityEngine(db).index_resolved_case(updated_case, resolved_at=now)
+            except Exception as e:
+                print(f"Warning: Failed to index resolved case {case_id}: {e}")
+            # The rollup scans every resolved case of the type; keep it off the response path
+            background_tasks.add_task(_refresh_resolution_stats_after_resolve, case_id)
+        
         return serialize_doc(updated_case)
     
     except HTTPException:
@@ -1210,6 +1399,13 @@ async def transition_state(case_id: str, transition: TransitionState, current_us
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to transition state: {str(e)}")
 
+async def _refresh_resolution_stats_after_resolve(case_id: str):
+    """Refresh resolution stats after a case is resolved"""
+    try:
+        await ResolutionStatsService(db).refresh(full=False)
+    except Exception as e:
+        print(f"Warning: Failed to refresh resolution stats after {case_id}: {e}")
+
 @app.post("/api/cases/{case_id}/timeline")
 async def add_timeline_event(case_id: str, event_data: AddTimelineEvent, current_user: dict = Depends(get_current_user)):
     """
@@ -1235,14 +1431,20 @@ async def add_timeline_event(case_id: str, event_data: AddTimelineEvent, current
             "metadata": event_data.metadata or {}
         }
         
-        result = await db.timeline_events.insert_one(event)
-        event["_id"] = result.inserted_id
-        
-        # Update case timestamp
-        await db.cases.update_one(
-            {"_id": case_id},
-            {"$set": {"updated_at": now}}
-        )
+        # Event, case touch and audit entry commit together
+        async with db.transaction():
+            result = await db.timeline_events.insert_one(event)
+            event["_id"] = result.inserted_id
+            
+            await db.cases.update_one(
+                {"_id": case_id},
+                {"$set": {"updated_at": now}}
+            )
+            
+            await log_audit(case_id, current_user["email"], "TIMELINE_EVENT_ADDED", {
+                "source_type": event_data.source_type.value,
+                "reliability": event_data.reliability.value
+            })
         
         # Auto-calculate evidence score when new event is added
         try:
@@ -1251,12 +1453,6 @@ async def add_timeline_event(case_id: str, event_data: AddTimelineEvent, current
         except Exception as e:
             print(f"Warning: Failed to calculate evidence score: {e}")
         
-        # Create audit log
-        await log_audit(case_id, current_user["email"], "TIMELINE_EVENT_ADDED", {
-            "source_type": event_data.source_type.value,
-            "reliability": event_data.reliability.value
-        })
-        
         return serialize_doc(event)
     
     except HTTPException:
@@ -1265,18 +1461,34 @@ async def add_timeline_event(case_id: str, event_data: AddTimelineEvent, current
         raise HTTPException(status_code=500, detail=f"Failed to add timeline event: {str(e)}")
 
 @app.get("/api/cases/{case_id}/timeline")
-async def get_timeline(case_id: str, current_user: dict = Depends(get_current_user)):
+async def get_timeline(
+    case_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     """
-    Get all timeline events for a disruption.
+    Get timeline events for a disruption, newest first.
+    Pages are `limit` events long (1000 by default, as before paging, 200
+    when following a cursor); pass the X-Next-Cursor response header back
+    as `cursor` to fetch older events.
     """
     try:
         case = await db.cases.find_one({"_id": case_id, "operator_id": current_user["user_id"]})
         if not case:
             raise HTTPException(status_code=404, detail="Case not found")
         
-        cursor = await db.timeline_events.find({"case_id": case_id}, sort=[("timestamp", -1)], limit=1000)
-        events = await cursor.to_list(length=1000)
+        if limit is None:
+            limit = 200 if cursor else 1000
+        limit = min(max(limit, 1), 1000)
+        try:
+            events, next_cursor = await db.timeline_events.find_page({"case_id": case_id}, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return [serialize_doc(event) for event in events]
     
     except HTTPException:
@@ -1309,45 +1521,83 @@ async def perform_rca(case_id: str, current_user: dict = Depends(get_current_use
             [serialize_doc(event) for event in timeline_events]
         )
         
-        # Store RCA in case
-        now = datetime.now(timezone.utc)
-        await db.cases.update_one(
-            {"_id": case_id},
-            {
-                "$set": {
-                    "rca": rca_result,
-                    "rca_performed_at": now,
-                    "rca_performed_by": current_user["email"],
-                    "updated_at": now
-                }
-            }
-        )
+        return await store_rca(case_id, rca_result, current_user)
+    
+    except HTTPException:
+        raise
+    except LlmOverloadedError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"RCA failed: {str(e)}")
+
+@app.post("/api/cases/{case_id}/rca/stream")
+async def stream_rca(case_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Root Cause Analysis as server-sent events: token and section events while
+    the model writes, then the stored RCA as the result event
+    """
+    try:
+        case = await db.cases.find_one({"_id": case_id, "operator_id": current_user["user_id"]})
+        if not case:
+            raise HTTPException(status_code=404, detail="Case not found")
         
-        # Create timeline event for RCA
-        await db.timeline_events.insert_one({
-            "case_id": case_id,
-            "actor": "Ward AI",
-            "action": "RCA_PERFORMED",
-            "content": f"Root Cause Analysis completed: {rca_result.get('root_cause', 'Analysis in progress')}",
-            "source_type": SourceType.SYSTEM.value,
-            "reliability": ReliabilityLevel.HIGH.value,
-            "timestamp": now,
-            "metadata": rca_result
-        })
+        timeline_cursor = await db.timeline_events.find({"case_id": case_id}, sort=[("timestamp", 1)], limit=500)
+        timeline_events = await timeline_cursor.to_list(length=500)
         
-        # Log audit
-        await log_audit(case_id, current_user["email"], "RCA_PERFORMED", {
-            "root_cause": rca_result.get("root_cause"),
-            "confidence": rca_result.get("confidence")
-        })
+        engine = get_rca_engine()
+        case_doc = serialize_doc(case)
+        chat, chunks = await engine.stream_analysis(case_doc, [serialize_doc(event) for event in timeline_events])
+        
+        async def finalize(response: str):
+            rca_result = engine.parse_rca(response, case_doc)
+            rca_result["ai_model"] = chat.served_model
+            return await store_rca(case_id, rca_result, current_user)
         
-        return rca_result
+        return await sse_llm_response(chunks, finalize, sections=True)
     
     except HTTPException:
         raise
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"RCA failed: {str(e)}")
 
+async def store_rca(case_id: str, rca_result: dict, current_user: dict) -> dict:
+    """Store an RCA on the case, with a timeline event and audit entry"""
+    now = datetime.now(timezone.utc)
+    await db.cases.update_one(
+        {"_id": case_id},
+        {
+            "$set": {
+                "rca": rca_result,
+                "rca_performed_at": now,
+                "rca_performed_by": current_user["email"],
+                "updated_at": now
+            }
+        }
+    )
+    
+    # Create timeline event for RCA
+    await db.timeline_events.insert_one({
+        "case_id": case_id,
+        "actor": "Ward AI",
+        "action": "RCA_PERFORMED",
+        "content": f"Root Cause Analysis completed: {rca_result.get('root_cause', 'Analysis in progress')}",
+        "source_type": SourceType.SYSTEM.value,
+        "reliability": ReliabilityLevel.HIGH.value,
+        "timestamp": now,
+        "metadata": rca_result
+    })
+    
+    # Log audit
+    await log_audit(case_id, current_user["email"], "RCA_PERFORMED", {
+        "root_cause": rca_result.get("root_cause"),
+        "confidence": rca_result.get("confidence"),
+        "model": rca_result.get("ai_model")
+    })
+    
+    return rca_result
+
 @app.get("/api/cases/{case_id}/similar-resolutions")
 async def get_similar_resolutions(case_id: str, current_user: dict = Depends(get_current_user)):
     """
@@ -1360,15 +1610,16 @@ async def get_similar_resolutions(case_id: str, current_user: dict = Depends(get
             raise HTTPException(status_code=404, detail="Case not found")
         
         disruption_type = case.get("disruption_details", {}).get("disruption_type", "")
-        location = case.get("disruption_details", {}).get("identifier", "")
         
-        similar = await get_rca_engine().suggest_similar_resolutions(disruption_type, location)
+        stats = await ResolutionStatsService(db).get_stats(current_user["user_id"], disruption_type, case.get("lane"))
+        similar = get_rca_engine().suggest_similar_resolutions(stats)
         
         return {
             "case_id": case_id,
             "disruption_type": disruption_type,
             "similar_resolutions": similar,
-            "count": len(similar)
+            "count": len(similar),
+            "stats": stats
         }
     
     except HTTPException:
@@ -1391,20 +1642,13 @@ async def transcribe_voice(voice_data: VoiceTranscript, current_user: dict = Dep
         # Decode base64 audio
         audio_bytes = base64.b64decode(voice_data.audio_base64)
         
-        # Save temporarily
-        temp_file_path = f"/tmp/voice_{current_user['user_id']}_{datetime.utcnow().timestamp()}.{voice_data.audio_format}"
-        async with aiofiles.open(temp_file_path, 'wb') as f:
-            await f.write(audio_bytes)
-        
-        # Transcribe using Sarvam AI with explicit language code
-        result = await sarvam_service.speech_to_text(
-            temp_file_path, 
+        # Normalize and transcribe from memory using Sarvam AI with explicit language code
+        result = await sarvam_service.speech_to_text_segmented(
+            audio_bytes,
+            audio_format=voice_data.audio_format,
             language_code=voice_data.language_code
         )
         
-        # Clean up temp file
-        os.remove(temp_file_path)
-        
         if not result.get("success"):
             raise HTTPException(status_code=500, detail=result.get("error", "Transcription failed"))
         
@@ -1438,6 +1682,32 @@ async def generate_driver_response(request: dict, current_user: dict = Depends(g
             "safe": True  # Flag indicating this is a safe, non-decision response
         }
     
+    except LlmOverloadedError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate driver response: {str(e)}")
+
+@app.post("/api/voice/driver-response/stream")
+async def stream_driver_response(request: dict, current_user: dict = Depends(get_current_user)):
+    """Driver response as server-sent events (token events, then the full response as the result)"""
+    try:
+        driver_input = request.get("driver_input", "")
+        conversation_history = request.get("conversation_history", [])
+        
+        if not driver_input:
+            raise HTTPException(status_code=400, detail="Driver input is required")
+        
+        chunks = await voice_assistant.stream_driver_response(driver_input, conversation_history)
+        
+        async def finalize(response: str):
+            return {"response": response.strip(), "role": "driver", "safe": True}
+        
+        return await sse_llm_response(chunks, finalize)
+    
+    except HTTPException:
+        raise
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate driver response: {str(e)}")
 
@@ -1460,6 +1730,8 @@ async def generate_helper_questions(request: dict, current_user: dict = Depends(
             "count": len(questions)
         }
     
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate helper questions: {str(e)}")
 
@@ -1482,6 +1754,8 @@ async def generate_clarity_questions(transcript: dict, current_user: dict = Depe
             "count": len(questions)
         }
     
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate questions: {str(e)}")
 
@@ -1505,6 +1779,8 @@ async def extract_disruption_from_conversation(conversation: dict, current_user:
     
     except HTTPException:
         raise
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to extract disruption: {str(e)}")
 
@@ -1561,6 +1837,30 @@ async def generate_voice_guidance(disruption: dict, current_user: dict = Depends
         
         return guidance
     
+    except LlmOverloadedError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate guidance: {str(e)}")
+
+@app.post("/api/voice/decision-guidance/stream")
+async def stream_voice_guidance(disruption: dict, current_user: dict = Depends(get_current_user)):
+    """Decision guidance as server-sent events: a section event per protocol step, then the full guidance"""
+    try:
+        disruption_summary = disruption.get("summary", "")
+        if not disruption_summary:
+            raise HTTPException(status_code=400, detail="Disruption summary is required")
+        
+        chunks = await voice_assistant.stream_decision_guidance(disruption_summary)
+        
+        async def finalize(response: str):
+            return voice_assistant.parse_decision_guidance(response)
+        
+        return await sse_llm_response(chunks, finalize, sections=True)
+    
+    except HTTPException:
+        raise
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate guidance: {str(e)}")
 
@@ -1683,6 +1983,10 @@ async def perform_enhanced_rca(case_id: str, current_user: dict = Depends(get_cu
             }
         )
         return result
+    except HTTPException:
+        raise
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to perform enhanced RCA: {str(e)}")
 
@@ -1710,6 +2014,28 @@ async def seed_master_data(current_user: dict = Depends(get_current_user)):
     await service.seed_master_data()
     return {"status": "Master data seeded"}
 
+@app.post("/api/admin/resolution-stats/refresh")
+async def refresh_resolution_stats(full: bool = False, current_user: dict = Depends(get_current_user)):
+    """
+    Recompute resolution stats for disruption types with newly resolved cases
+    (every type with full=true). Safe to call from a scheduler.
+    """
+    try:
+        return await ResolutionStatsService(db).refresh(full=full)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to refresh resolution stats: {str(e)}")
+
+@app.post("/api/admin/tts-cache/warm")
+async def warm_tts_cache(current_user: dict = Depends(get_current_user)):
+    """
+    Pre-synthesize the fixed client prompts in all languages into the TTS
+    cache. Cached prompts are skipped. Safe to call from a scheduler.
+    """
+    try:
+        return await sarvam_service.warm_tts_cache()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to warm TTS cache: {str(e)}")
+
 @app.get("/api/master/lookup")
 async def lookup_entity(query: str, current_user: dict = Depends(get_current_user)):
     """
@@ -1829,6 +2155,10 @@ async def analyze_document(
         })
         
         return serialize_doc(doc_record)
+    except HTTPException:
+        raise
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
@@ -1865,6 +2195,10 @@ async def compare_documents_endpoint(
             })
             
         return comparison
+    except HTTPException:
+        raise
+    except LlmOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Comparison failed: {str(e)}")
 
@@ -2265,9 +2599,14 @@ async def list_movements(
     status: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """List movements with filters"""
+    """
+    List movements with filters, newest first.
+    Use `next_cursor` from the response as `cursor` to fetch the next page;
+    `offset` is still accepted for clients that have not moved to cursors.
+    """
     try:
         query = {"operator_id": current_user["user_id"]}
         
@@ -2280,16 +2619,25 @@ async def list_movements(
         if status:
             query["status"] = status
         
-        cursor = await db.cases.find(query, sort=[("updated_at", -1)], limit=min(limit, 100))
-        movements = await cursor.to_list(length=min(limit, 100))
+        limit = min(max(limit, 1), 100)
+        try:
+            movements, next_cursor = await db.cases.find_page(query, limit=limit, cursor=cursor, offset=max(offset, 0))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        count_key = (current_user["user_id"], container_id, truck_id, external_id, status)
+        total = await movement_count_cache.get_or_set(count_key, lambda: db.cases.count_documents(query))
         
         return {
-            "items": [serialize_doc(m) for m in movements[offset:offset+limit]],
-            "total": len(movements),
+            "items": [serialize_doc(m) for m in movements],
+            "total": total,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list movements: {str(e)}")
 
@@ -2380,19 +2728,20 @@ async def create_event(
             event["metadata"]["original_event_id"] = event_data.original_event_id
             event["edited_at"] = now  # Store edited_at timestamp
         
-        result = await db.timeline_events.insert_one(event)
-        event["_id"] = result.inserted_id
-        
-        # Update movement timestamp
-        await db.cases.update_one(
-            {"_id": event_data.movement_id},
-            {"$set": {"updated_at": now}}
-        )
-        
-        await log_audit(event_data.movement_id, current_user["email"], "EVENT_CREATED", {
-            "event_id": str(result.inserted_id),
-            "event_type": event_data.event_type
-        })
+        # Event, movement touch and audit entry commit together
+        async with db.transaction():
+            result = await db.timeline_events.insert_one(event)
+            event["_id"] = result.inserted_id
+            
+            await db.cases.update_one(
+                {"_id": event_data.movement_id},
+                {"$set": {"updated_at": now}}
+            )
+            
+            await log_audit(event_data.movement_id, current_user["email"], "EVENT_CREATED", {
+                "event_id": str(result.inserted_id),
+                "event_type": event_data.event_type
+            })
         
         return serialize_doc(event)
         
@@ -2464,21 +2813,23 @@ async def create_attachment(
             "uploaded_by": current_user["user_id"]
         }
         
-        result = await db.attachments.insert_one(attachment)
-        attachment["_id"] = result.inserted_id
-        
-        # Log to timeline if event_id provided
-        if event_id:
-            await db.timeline_events.insert_one({
-                "case_id": movement_id,
-                "actor": current_user["email"],
-                "action": "ATTACHMENT_UPLOADED",
-                "content": f"Uploaded {file_type}: {file.filename}",
-                "source_type": "system",
-                "reliability": "high",
-                "timestamp": datetime.now(timezone.utc),
-                "metadata": {"attachment_id": str(result.inserted_id)}
-            })
+        # Attachment row and its timeline entry commit together
+        async with db.transaction():
+            result = await db.attachments.insert_one(attachment)
+            attachment["_id"] = result.inserted_id
+            
+            # Log to timeline if event_id provided
+            if event_id:
+                await db.timeline_events.insert_one({
+                    "case_id": movement_id,
+                    "actor": current_user["email"],
+                    "action": "ATTACHMENT_UPLOADED",
+                    "content": f"Uploaded {file_type}: {file.filename}",
+                    "source_type": "system",
+                    "reliability": "high",
+                    "timestamp": datetime.now(timezone.utc),
+                    "metadata": {"attachment_id": str(result.inserted_id)}
+                })
         
         return serialize_doc(attachment)
         
@@ -2558,6 +2909,27 @@ class AddVehicle(BaseModel):
     driver_phone: Optional[str] = None
     route: Optional[str] = None
 
+_operator_service: Optional[OperatorService] = None
+
+def get_operator_service() -> OperatorService:
+    """Shared OperatorService for the current database"""
+    global _operator_service
+    if _operator_service is None or _operator_service.db is not db:
+        _operator_service = OperatorService(db)
+    return _operator_service
+
+async def get_current_operator(current_user: dict = Depends(get_current_user)) -> Optional[Dict[str, Any]]:
+    """
+    Operator account of the authenticated user, or None if they have none.
+    Cached per user ID; writes to operators invalidate the cache.
+    """
+    operator = await operator_cache.get(current_user["user_id"])
+    if operator is None:
+        operator = await db.operators.find_one({"email": current_user["email"]})
+        if operator:
+            await operator_cache.set(current_user["user_id"], operator)
+    return operator
+
 @app.post("/api/operators/create")
 async def create_operator_account(
     operator_data: CreateOperator,
@@ -2565,7 +2937,7 @@ async def create_operator_account(
 ):
     """Create transport operator account"""
     try:
-        operator_service = OperatorService(db)
+        operator_service = get_operator_service()
         operator_id = await operator_service.create_operator_account({
             "company_name": operator_data.company_name,
             "email": operator_data.email,
@@ -2581,17 +2953,16 @@ async def create_operator_account(
 @app.post("/api/operators/fleet/add")
 async def add_fleet_vehicle(
     vehicle_data: AddVehicle,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    operator: Optional[Dict[str, Any]] = Depends(get_current_operator)
 ):
     """Add a vehicle to operator's fleet"""
     try:
         await ensure_db_initialized()
         
-        # Find operator by user email
-        operator = await db.operators.find_one({"email": current_user["email"]})
         if not operator:
             # Create operator account for user if doesn't exist
-            operator_service = OperatorService(db)
+            operator_service = get_operator_service()
             operator_id = await operator_service.create_operator_account({
                 "company_name": current_user.get("email", "Unknown Company"),
                 "email": current_user["email"],
@@ -2602,7 +2973,7 @@ async def add_fleet_vehicle(
         else:
             operator_id = operator.get("_id") or operator.get("id")
         
-        operator_service = OperatorService(db)
+        operator_service = get_operator_service()
         vehicle_id = await operator_service.add_fleet_vehicle(operator_id, vehicle_data.dict())
         return {"vehicle_id": vehicle_id, "status": "added", "operator_id": operator_id}
     except Exception as e:
@@ -2611,14 +2982,12 @@ async def add_fleet_vehicle(
 @app.post("/api/operators/fleet/bulk-upload")
 async def bulk_upload_fleet(
     file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    operator: Optional[Dict[str, Any]] = Depends(get_current_operator)
 ):
     """Bulk upload fleet from CSV"""
     try:
         await ensure_db_initialized()
         
-        # Find operator by user email
-        operator = await db.operators.find_one({"email": current_user["email"]})
         if not operator:
             raise HTTPException(status_code=404, detail="Operator account not found. Please create one first.")
         
@@ -2626,7 +2995,7 @@ async def bulk_upload_fleet(
         content = await file.read()
         csv_content = content.decode('utf-8')
         
-        operator_service = OperatorService(db)
+        operator_service = get_operator_service()
         results = await operator_service.bulk_upload_fleet(operator_id, csv_content)
         return results
     except HTTPException:
@@ -2635,18 +3004,16 @@ async def bulk_upload_fleet(
         raise HTTPException(status_code=500, detail=f"Failed to upload fleet: {str(e)}")
 
 @app.get("/api/operators/fleet")
-async def get_operator_fleet(current_user: dict = Depends(get_current_user)):
+async def get_operator_fleet(operator: Optional[Dict[str, Any]] = Depends(get_current_operator)):
     """Get all vehicles for operator"""
     try:
         await ensure_db_initialized()
         
-        # Find operator by user email
-        operator = await db.operators.find_one({"email": current_user["email"]})
         if not operator:
             return []
         
         operator_id = operator.get("_id") or operator.get("id")
-        operator_service = OperatorService(db)
+        operator_service = get_operator_service()
         vehicles = await operator_service.get_operator_vehicles(operator_id)
         return vehicles
     except Exception as e:
@@ -2655,14 +3022,12 @@ async def get_operator_fleet(current_user: dict = Depends(get_current_user)):
 @app.get("/api/operators/dashboard")
 async def get_operator_dashboard(
     days: int = 7,
-    current_user: dict = Depends(get_current_user)
+    operator: Optional[Dict[str, Any]] = Depends(get_current_operator)
 ):
     """Get operator dashboard metrics"""
     try:
         await ensure_db_initialized()
         
-        # Find operator by user email
-        operator = await db.operators.find_one({"email": current_user["email"]})
         if not operator:
             return {
                 "fleet_size": 0,
@@ -2676,19 +3041,18 @@ async def get_operator_dashboard(
             }
         
         operator_id = operator.get("_id") or operator.get("id")
-        operator_service = OperatorService(db)
+        operator_service = get_operator_service()
         dashboard = await operator_service.get_operator_dashboard(operator_id, days)
         return dashboard
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get dashboard: {str(e)}")
 
 @app.get("/api/operators/settings")
-async def get_operator_settings(current_user: dict = Depends(get_current_user)):
+async def get_operator_settings(operator: Optional[Dict[str, Any]] = Depends(get_current_operator)):
     """Get operator settings"""
     try:
         await ensure_db_initialized()
         
-        operator = await db.operators.find_one({"email": current_user["email"]})
         if not operator:
             raise HTTPException(status_code=404, detail="Operator account not found")
         
@@ -2711,21 +3075,20 @@ class UpdateOperatorSettings(BaseModel):
 @app.patch("/api/operators/settings")
 async def update_operator_settings(
     settings_data: UpdateOperatorSettings,
-    current_user: dict = Depends(get_current_user)
+    operator: Optional[Dict[str, Any]] = Depends(get_current_operator)
 ):
     """Update operator settings"""
     try:
         await ensure_db_initialized()
         
-        operator = await db.operators.find_one({"email": current_user["email"]})
         if not operator:
             raise HTTPException(status_code=404, detail="Operator account not found")
         
         operator_id = operator.get("_id") or operator.get("id")
-        operator_service = OperatorService(db)
+        operator_service = get_operator_service()
         
-        # Get current settings
-        current_settings = operator.get("settings", {})
+        # Get current settings (copied, the operator record may be cached)
+        current_settings = dict(operator.get("settings") or {})
         
         # Update settings
         if settings_data.notifications:
@@ -2747,19 +3110,17 @@ async def update_operator_settings(
 @app.post("/api/operators/drivers/generate-links")
 async def generate_driver_links(
     method: str = "magic_link",  # magic_link or qr_code
-    current_user: dict = Depends(get_current_user)
+    operator: Optional[Dict[str, Any]] = Depends(get_current_operator)
 ):
     """Generate magic links or QR codes for drivers"""
     try:
         await ensure_db_initialized()
         
-        # Find operator by user email
-        operator = await db.operators.find_one({"email": current_user["email"]})
         if not operator:
             raise HTTPException(status_code=404, detail="Operator account not found. Please create one first.")
         
         operator_id = operator.get("_id") or operator.get("id")
-        operator_service = OperatorService(db)
+        operator_service = get_operator_service()
         
         # Get all vehicles
         vehicles = await operator_service.get_operator_vehicles(operator_id)
@@ -2799,13 +3160,14 @@ async def generate_driver_links(
 
 # Driver endpoints (no auth required - magic link based)
 @app.get("/api/driver/verify/{token}")
-async def verify_driver_token(token: str):
+async def verify_driver_token(token: str, background_tasks: BackgroundTasks):
     """Verify magic link token and return vehicle info"""
     try:
         await ensure_db_initialized()
         
-        # Find magic link
-        magic_link = await db.magic_links.find_one({"token": token})
+        # Find magic link and vehicle (cached until the link expires)
+        link_service = get_driver_link_service()
+        magic_link, vehicle = await link_service.resolve(token)
         if not magic_link:
             raise HTTPException(status_code=404, detail="Invalid token")
         
@@ -2814,17 +3176,14 @@ async def verify_driver_token(token: str):
         if expires_at and datetime.now(timezone.utc) > expires_at:
             raise HTTPException(status_code=410, detail="Token expired")
         
-        # Get vehicle info
-        vehicle_id = magic_link.get("vehicle_id")
-        vehicle = await db.fleet_vehicles.find_one({"_id": vehicle_id})
         if not vehicle:
             raise HTTPException(status_code=404, detail="Vehicle not found")
         
-        # Increment used count
-        await db.magic_links.update_one(
-            {"token": token},
-            {"$set": {"used_count": magic_link.get("used_count", 0) + 1, "last_used_at": datetime.now(timezone.utc)}}
-        )
+        # Increment used count (written in batches)
+        await link_service.record_use(token)
+        if is_serverless:
+            # No lifespan flush loop, and the instance may be frozen after this request
+            background_tasks.add_task(link_service.flush)
         
         return {
             "vehicle_number": vehicle.get("vehicle_number"),
@@ -2843,117 +3202,131 @@ class DriverReport(BaseModel):
     audio_format: str = "webm"
     language_code: str = "hi-IN"
 
+async def create_driver_case(magic_link: dict, vehicle: dict, transcript: str, transcription: Optional[dict] = None) -> str:
+    """Create the case and timeline event for a driver voice report and notify the operator's webhook"""
+    vehicle_id = magic_link.get("vehicle_id")
+    operator_id = magic_link.get("operator_id")
+    
+    case_data = {
+        "operator_id": operator_id,
+        "operator_email": f"driver-{vehicle_id}@ward.local",  # Placeholder
+        "description": transcript or "Driver reported disruption via voice",
+        "disruption_details": {
+            "disruption_type": "reported",
+            "source": "Driver Voice Report",
+            "identifier": vehicle.get("vehicle_number")
+        },
+        "shipment_identifiers": {
+            "ids": [vehicle.get("vehicle_number")]
+        },
+        "voice_transcript": transcript,
+        "vehicle_id": vehicle_id,
+        "status": "REPORTED",
+        "created_via": "driver_app"
+    }
+    
+    result = await db.cases.insert_one(case_data)
+    case_id = result.inserted_id
+    
+    # Create timeline event
+    await db.timeline_events.insert_one({
+        "case_id": case_id,
+        "actor": vehicle.get("driver_name") or "Driver",
+        "action": "DISRUPTION_REPORTED",
+        "content": transcript,
+        "source_type": "voice",
+        "reliability": "high",
+        "timestamp": datetime.now(timezone.utc),
+        "metadata": {
+            "vehicle_id": vehicle_id,
+            "vehicle_number": vehicle.get("vehicle_number"),
+            "transcription": transcription
+        }
+    })
+    
+    # Trigger webhook if configured
+    try:
+        from webhook_service import WebhookService
+        webhook_service = WebhookService(db)
+        await webhook_service.trigger_webhook(
+            operator_id,
+            "disruption_reported",
+            {
+                "case_id": str(case_id),
+                "vehicle_number": vehicle.get("vehicle_number"),
+                "description": transcript or "Driver reported disruption",
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+        )
+    except Exception as e:
+        print(f"Warning: Webhook trigger failed: {e}")
+    
+    return str(case_id)
+
+async def update_driver_case_transcript(case_id: str, transcript: str, transcription: Optional[dict] = None):
+    """Bring a driver case created from a partial transcript up to date with the full one"""
+    await db.cases.update_one(
+        {"_id": case_id},
+        {"$set": {"description": transcript, "voice_transcript": transcript, "updated_at": datetime.now(timezone.utc)}}
+    )
+    await db.timeline_events.insert_one({
+        "case_id": case_id,
+        "actor": "Ward",
+        "action": "VOICE_TRANSCRIPT_COMPLETED",
+        "content": transcript,
+        "source_type": "voice",
+        "reliability": "high",
+        "timestamp": datetime.now(timezone.utc),
+        "metadata": {"transcription": transcription}
+    })
+
 @app.post("/api/driver/report")
 async def driver_report_disruption(report_data: DriverReport):
     """Driver reports disruption via voice (no auth required - token based)"""
     try:
         await ensure_db_initialized()
         
-        # Verify token
-        magic_link = await db.magic_links.find_one({"token": report_data.token})
+        # Verify token and get vehicle info
+        magic_link, vehicle = await get_driver_link_service().resolve(report_data.token)
         if not magic_link:
             raise HTTPException(status_code=404, detail="Invalid token")
         
-        # Get vehicle info
-        vehicle_id = magic_link.get("vehicle_id")
-        vehicle = await db.fleet_vehicles.find_one({"_id": vehicle_id})
         if not vehicle:
             raise HTTPException(status_code=404, detail="Vehicle not found")
         
-        operator_id = magic_link.get("operator_id")
-        
         # Transcribe voice (if audio provided)
         transcript = ""
+        transcription = None
         if report_data.audio_base64:
             try:
-                import base64
-                import aiofiles
-                import os
-                
                 # Decode base64 audio
                 audio_bytes = base64.b64decode(report_data.audio_base64)
                 
-                # Save temporarily
-                temp_file_path = f"/tmp/driver_voice_{vehicle_id}_{datetime.now(timezone.utc).timestamp()}.{report_data.audio_format}"
-                async with aiofiles.open(temp_file_path, 'wb') as f:
-                    await f.write(audio_bytes)
-                
-                # Transcribe using Sarvam AI
-                result = await sarvam_service.speech_to_text(
-                    temp_file_path,
+                # Normalize and transcribe from memory; long recordings are split and transcribed in parallel
+                result = await sarvam_service.speech_to_text_segmented(
+                    audio_bytes,
+                    audio_format=report_data.audio_format,
                     language_code=report_data.language_code
                 )
                 
-                # Clean up temp file
-                try:
-                    os.remove(temp_file_path)
-                except:
-                    pass
-                
                 if result.get("success"):
                     transcript = result.get("transcript", "")
+                    transcription = {
+                        "segments": result.get("segments"),
+                        "partial": result.get("partial", False),
+                        "duration": result.get("duration"),
+                        "audio": result.get("audio")
+                    }
                 else:
                     transcript = "Voice report (transcription failed)"
             except Exception as e:
                 print(f"Warning: Voice transcription failed: {e}")
                 transcript = "Voice report (transcription failed)"
         
-        # Create case
-        case_data = {
-            "operator_id": operator_id,
-            "operator_email": f"driver-{vehicle_id}@ward.local",  # Placeholder
-            "description": transcript or "Driver reported disruption via voice",
-            "disruption_details": {
-                "disruption_type": "reported",
-                "source": "Driver Voice Report",
-                "identifier": vehicle.get("vehicle_number")
-            },
-            "shipment_identifiers": {
-                "ids": [vehicle.get("vehicle_number")]
-            },
-            "voice_transcript": transcript,
-            "vehicle_id": vehicle_id,
-            "status": "REPORTED",
-            "created_via": "driver_app"
-        }
-        
-        result = await db.cases.insert_one(case_data)
-        case_id = result.inserted_id
-        
-        # Create timeline event
-        await db.timeline_events.insert_one({
-            "case_id": case_id,
-            "actor": vehicle.get("driver_name") or "Driver",
-            "action": "DISRUPTION_REPORTED",
-            "content": transcript,
-            "source_type": "voice",
-            "reliability": "high",
-            "timestamp": datetime.now(timezone.utc),
-            "metadata": {
-                "vehicle_id": vehicle_id,
-                "vehicle_number": vehicle.get("vehicle_number")
-            }
-        })
-        
-        # Trigger webhook if configured
-        try:
-            from webhook_service import WebhookService
-            webhook_service = WebhookService(db)
-            await webhook_service.trigger_webhook(
-                operator_id,
-                "disruption_reported",
-                {
-                    "case_id": str(case_id),
-                    "vehicle_number": vehicle.get("vehicle_number"),
-                    "description": transcript or "Driver reported disruption",
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                }
-            )
-        except Exception as e:
-            print(f"Warning: Webhook trigger failed: {e}")
+        case_id = await create_driver_case(magic_link, vehicle, transcript, transcription)
         
         return {
-            "case_id": str(case_id),
+            "case_id": case_id,
             "status": "created",
             "message": "Disruption reported successfully",
             "vehicle_number": vehicle.get("vehicle_number")
@@ -2963,6 +3336,81 @@ async def driver_report_disruption(report_data: DriverReport):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to report disruption: {str(e)}")
 
+@app.websocket("/api/driver/stream/{token}")
+async def driver_stream_report(websocket: WebSocket, token: str, audio_format: str = "webm", language_code: str = "hi-IN"):
+    """
+    Driver reports disruption by streaming voice (no auth required - token based).
+    Binary frames are self-contained audio clips; the server pushes interim
+    transcripts, creates the case once there is enough context (see
+    driver_stream) and finishes on {"type": "end"} or disconnect.
+    """
+    try:
+        await ensure_db_initialized()
+        magic_link, vehicle = await get_driver_link_service().resolve(token)
+    except Exception as e:
+        print(f"Warning: Driver stream setup failed: {e}")
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        return
+    expires_at = magic_link.get("expires_at") if magic_link else None
+    if not magic_link or not vehicle or (expires_at and datetime.now(timezone.utc) > expires_at):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    
+    async def transcribe(chunk: bytes) -> dict:
+        return await sarvam_service.speech_to_text_segmented(chunk, audio_format=audio_format, language_code=language_code)
+    
+    async def create_case(transcript: str, transcription: Optional[dict]) -> str:
+        return await create_driver_case(magic_link, vehicle, transcript, transcription)
+    
+    session = DriverStreamSession(transcribe, create_case, update_driver_case_transcript, websocket.send_json)
+    await websocket.send_json({"type": "ready", "vehicle_number": vehicle.get("vehicle_number")})
+    
+    connected = True
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                connected = False
+                break
+            if message.get("bytes"):
+                try:
+                    await session.add_chunk(message["bytes"])
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    control = {}
+                if isinstance(control, dict) and control.get("type") == "end":
+                    break
+    except WebSocketDisconnect:
+        connected = False
+    
+    # Finish even if the driver dropped, so the report still lands
+    try:
+        result = await session.finish()
+    except Exception as e:
+        print(f"Warning: Driver stream report failed: {e}")
+        result = None
+    
+    if connected:
+        try:
+            if result is None:
+                await websocket.send_json({"type": "error", "detail": "Failed to report disruption"})
+            else:
+                await websocket.send_json({
+                    "type": "final",
+                    "case_id": result["case_id"],
+                    "transcript": result["transcript"],
+                    "status": "created" if result["case_id"] else "empty",
+                    "vehicle_number": vehicle.get("vehicle_number")
+                })
+            await websocket.close()
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
 @app.get("/api/health")
 async def health():
     """Health check endpoint for monitoring"""
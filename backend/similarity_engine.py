@@ -1,96 +1,154 @@
 """
 Similarity Search Engine
-Uses embedding-based search to find similar historical cases.
+Finds similar historical cases with a local TF-IDF index (see similarity_index).
+
+Each (operator, disruption type) partition is loaded from all resolved cases
+on first use, extended when a case moves to RESOLVED, and caught up with
+cases resolved by other workers every SIMILARITY_INDEX_REFRESH_SECONDS
+(default 60).
 """
 
 import os
-from typing import List, Dict, Any
-from llm_client import LlmChat, UserMessage
-from dotenv import load_dotenv
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from similarity_index import SimilarityIndex
+
+REFRESH_SECONDS = float(os.getenv("SIMILARITY_INDEX_REFRESH_SECONDS", "60"))
+
+# Matches below this cosine score (shared stop words, place names) are dropped
+MIN_SCORE = float(os.getenv("SIMILARITY_MIN_SCORE", "0.1"))
+
+# Case IDs per audit_entries query when computing resolution times
+_AUDIT_BATCH = 1000
 
-load_dotenv()
+# Process-wide index shared by all engines
+similarity_index = SimilarityIndex()
+
+
+def _format_duration(hours: Optional[float]) -> Optional[str]:
+    """e.g. 45m, 20h, 3d 4h"""
+    if hours is None:
+        return None
+    if hours < 1:
+        return f"{max(1, round(hours * 60))}m"
+    if hours < 48:
+        return f"{round(hours)}h"
+    days, rest = divmod(round(hours), 24)
+    return f"{days}d {rest}h" if rest else f"{days}d"
+
+
+def _hours_between(start, end) -> Optional[float]:
+    if not isinstance(start, datetime) or not isinstance(end, datetime):
+        return None
+    if (start.tzinfo is None) != (end.tzinfo is None):
+        start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+    return max(0.0, (end - start).total_seconds() / 3600)
 
-EMERGENT_LLM_KEY = os.getenv("OPENAI_API_KEY") or os.getenv("EMERGENT_LLM_KEY")
 
 class SimilarityEngine:
-    def __init__(self, db):
+    def __init__(self, db, index: Optional[SimilarityIndex] = None):
         self.db = db
-        self.api_key = EMERGENT_LLM_KEY
+        self.index = index if index is not None else similarity_index
 
     async def find_similar_cases(self, current_case: Dict, limit: int = 3) -> List[Dict[str, Any]]:
         """
-        Find historically similar cases using text similarity.
+        Find the operator's resolved cases of the same disruption type with the
+        most similar descriptions, scored by cosine similarity (0-1).
         """
-        # Note: In a production system, we would use vector embeddings (Pinecone/Milvus).
-        # For this PoC environment without vector DBs, we will use a hybrid approach:
-        # 1. Filter by Disruption Type (hard filter)
-        # 2. Use LLM to rank relevance of candidate cases based on description
-        
-        disruption_type = current_case.get("disruption_details", {}).get("disruption_type")
-        if not disruption_type:
-            return []
-            
-        # 1. Fetch candidates (same type, resolved)
-        # Get current case ID - handle both _id and id
+        disruption_type = (current_case.get("disruption_details") or {}).get("disruption_type")
         current_case_id = current_case.get("_id") or current_case.get("id")
-        if not current_case_id:
+        operator_id = current_case.get("operator_id")
+        if not disruption_type or not current_case_id or not operator_id:
             return []
-        
-        # PostgreSQL doesn't support nested field queries like "disruption_details.disruption_type"
-        # We'll fetch all resolved cases and filter in Python
-        cursor = await self.db.cases.find({"status": "RESOLVED"}, sort=[("created_at", -1)], limit=100)
-        all_resolved = await cursor.to_list(length=100)
-        
-        # Filter by disruption type and exclude current case
-        candidates = [
-            c for c in all_resolved 
-            if c.get("disruption_details", {}).get("disruption_type") == disruption_type
-            and (c.get("_id") or c.get("id")) != current_case_id
-        ][:20]  # Limit to 20
-        
-        if not candidates:
-            return []
-            
-        # 2. AI Ranking
-        # Construct a prompt with the current case and candidates
-        candidates_text = ""
-        for i, c in enumerate(candidates):
-            candidates_text += f"CASE_{i}: {c.get('description')} | Resolution: {c.get('rca', {}).get('root_cause', 'Unknown')}\n"
-            
-        chat = LlmChat(
-            api_key=self.api_key,
-            session_id=f"similarity-{current_case_id}",
-            system_message="You are a logistics expert. Rank historical cases by similarity to the current issue."
-        ).with_model("gemini", "gemini-2.5-flash")
-        
-        prompt = f"""Current Issue: {current_case.get('description')}
-        
-        Historical Candidates:
-        {candidates_text}
-        
-        Return the indices (CASE_0, CASE_1...) of the top {limit} most relevant cases.
-        Format: Just the indices separated by commas, e.g., "CASE_2, CASE_0".
-        If none are relevant, return "NONE"."""
-        
-        message = UserMessage(text=prompt)
-        response = await chat.send_message(message)
-        
-        # Parse response
-        response_text = response.strip()
-        if "NONE" in response_text:
-            return []
-            
-        # Extract indices
-        similar_cases = []
-        for i, candidate in enumerate(candidates):
-            if f"CASE_{i}" in response_text:
-                candidate_id = candidate.get("_id") or candidate.get("id")
-                similar_cases.append({
-                    "case_id": str(candidate_id),
-                    "description": candidate.get("description"),
-                    "resolution": candidate.get("rca", {}).get("root_cause"),
-                    "resolution_time": "24h", # Placeholder, calculate real diff if needed
-                    "similarity_score": "High" # Mock score
-                })
-                
-        return similar_cases[:limit]
+
+        await self._sync(operator_id, disruption_type)
+        matches = self.index.query(
+            operator_id,
+            disruption_type,
+            current_case.get("description") or "",
+            k=limit,
+            exclude=str(current_case_id)
+        )
+
+        return [
+            {
+                "case_id": case_id,
+                "description": meta["description"],
+                "resolution": meta["resolution"],
+                "resolution_time": _format_duration(meta["resolution_hours"]),
+                "resolution_hours": meta["resolution_hours"],
+                "similarity_score": round(score, 3)
+            }
+            for case_id, score, meta in matches
+            if score >= MIN_SCORE
+        ]
+
+    async def index_resolved_case(self, case: Dict, resolved_at: datetime):
+        """Add a case that just moved to RESOLVED (if its partition is loaded)"""
+        disruption_type = (case.get("disruption_details") or {}).get("disruption_type")
+        operator_id = case.get("operator_id")
+        if not disruption_type or not operator_id:
+            return
+        if self.index.partition(operator_id, disruption_type) is None:
+            # Not queried yet; the first query loads it from the database
+            return
+        self._add(operator_id, disruption_type, case, resolved_at)
+
+    def _add(self, operator_id, disruption_type: str, case: Dict, resolved_at: Optional[datetime]):
+        case_id = case.get("_id") or case.get("id")
+        self.index.add(
+            operator_id,
+            disruption_type,
+            str(case_id),
+            case.get("description") or "",
+            {
+                "description": case.get("description"),
+                "resolution": (case.get("rca") or {}).get("root_cause"),
+                "resolution_hours": _hours_between(case.get("created_at"), resolved_at or case.get("updated_at"))
+            }
+        )
+
+    async def _sync(self, operator_id, disruption_type: str):
+        """Load the partition, or catch up on cases resolved since the last sync"""
+        partition = self.index.partition(operator_id, disruption_type)
+        if partition is not None and time.monotonic() - partition.refreshed_at < REFRESH_SECONDS:
+            return
+
+        query = {
+            "operator_id": str(operator_id),
+            "status": "RESOLVED",
+            "disruption_details.disruption_type": disruption_type
+        }
+        if partition is not None and partition.synced_at is not None:
+            query["updated_at"] = {"$gte": partition.synced_at}
+        cursor = await self.db.cases.find(query, sort=[("updated_at", 1)], limit=0)
+        cases = await cursor.to_list()
+
+        resolved_times = await self._resolved_times([str(c.get("_id") or c.get("id")) for c in cases])
+        partition = self.index.ensure_partition(operator_id, disruption_type)
+        for case in cases:
+            case_id = str(case.get("_id") or case.get("id"))
+            self._add(operator_id, disruption_type, case, resolved_times.get(case_id))
+            updated_at = case.get("updated_at")
+            if isinstance(updated_at, datetime) and (partition.synced_at is None or updated_at > partition.synced_at):
+                partition.synced_at = updated_at
+        partition.refreshed_at = time.monotonic()
+
+    async def _resolved_times(self, case_ids: List[str]) -> Dict[str, datetime]:
+        """When each case moved to RESOLVED, from its STATE_TRANSITION audit entries"""
+        resolved: Dict[str, datetime] = {}
+        for start in range(0, len(case_ids), _AUDIT_BATCH):
+            cursor = await self.db.audit_entries.find(
+                {"case_id": {"$in": case_ids[start:start + _AUDIT_BATCH]}, "action": "STATE_TRANSITION"},
+                limit=0
+            )
+            for entry in await cursor.to_list():
+                if (entry.get("payload") or {}).get("to_state") != "RESOLVED":
+                    continue
+                timestamp = entry.get("timestamp")
+                previous = resolved.get(entry["case_id"])
+                if isinstance(timestamp, datetime) and (previous is None or timestamp > previous):
+                    resolved[entry["case_id"]] = timestamp
+        return resolved
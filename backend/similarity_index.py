@@ -0,0 +1,134 @@
+"""
+Similarity Index
+In-memory TF-IDF index of resolved case descriptions for SimilarityEngine.
+
+Text is embedded with the hashing trick (word unigrams and bigrams into
+N_FEATURES buckets, sublinear term frequency), so no vocabulary or model has
+to be trained or shipped. Each (operator, disruption type) partition keeps its
+raw term-frequency rows in a NumPy matrix plus document frequencies; IDF is
+applied at query time, so adding a case never re-embeds the others and scores
+are exact cosine similarities over the whole history.
+"""
+
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+N_FEATURES = 2 ** 10
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def embed(text: str, n_features: int = N_FEATURES) -> np.ndarray:
+    """Hashed, sublinear term-frequency vector of a text"""
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vector = np.zeros(n_features, dtype=np.float32)
+    if not terms:
+        return vector
+    buckets = np.fromiter(
+        (zlib.crc32(term.encode("utf-8")) % n_features for term in terms),
+        dtype=np.int64,
+        count=len(terms)
+    )
+    counts = np.bincount(buckets, minlength=n_features).astype(np.float32)
+    nonzero = counts > 0
+    vector[nonzero] = 1.0 + np.log(counts[nonzero])
+    return vector
+
+
+class _Partition:
+    """Term-frequency rows and metadata for one (operator, disruption type)"""
+
+    def __init__(self, n_features: int):
+        self.rows = np.zeros((16, n_features), dtype=np.float32)
+        self.doc_freq = np.zeros(n_features, dtype=np.float32)
+        self.case_ids: List[str] = []
+        self.meta: List[Dict[str, Any]] = []
+        self.positions: Dict[str, int] = {}
+        self.synced_at = None  # Newest updated_at loaded from the database
+        self.refreshed_at = 0.0  # time.monotonic() of the last database sync
+
+    def __len__(self):
+        return len(self.case_ids)
+
+    def add(self, case_id: str, vector: np.ndarray, meta: Dict[str, Any]):
+        position = self.positions.get(case_id)
+        if position is not None:
+            # Re-indexed case: replace its row and document frequencies
+            self.doc_freq -= self.rows[position] > 0
+            self.rows[position] = vector
+            self.meta[position] = meta
+        else:
+            position = len(self.case_ids)
+            if position == self.rows.shape[0]:
+                grown = np.zeros((position * 2, self.rows.shape[1]), dtype=np.float32)
+                grown[:position] = self.rows
+                self.rows = grown
+            self.rows[position] = vector
+            self.case_ids.append(case_id)
+            self.meta.append(meta)
+            self.positions[case_id] = position
+        self.doc_freq += vector > 0
+
+    def top_k(self, vector: np.ndarray, k: int, exclude: Optional[str] = None) -> List[Tuple[str, float, Dict[str, Any]]]:
+        count = len(self.case_ids)
+        if count == 0 or not vector.any():
+            return []
+        rows = self.rows[:count]
+        idf_sq = (np.log((1.0 + count) / (1.0 + self.doc_freq)) + 1.0) ** 2
+        query = vector * idf_sq
+        row_norms = np.sqrt((rows * rows) @ idf_sq)
+        query_norm = np.sqrt(float(vector @ query))
+        scores = (rows @ query) / np.maximum(row_norms * query_norm, 1e-12)
+
+        excluded = self.positions.get(exclude) if exclude else None
+        if excluded is not None:
+            scores[excluded] = -1.0
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.case_ids[i], float(scores[i]), self.meta[i]) for i in top if scores[i] > 0]
+
+
+class SimilarityIndex:
+    """Partitions by (operator_id, disruption_type)"""
+
+    def __init__(self, n_features: int = N_FEATURES):
+        self.n_features = n_features
+        self._partitions: Dict[Tuple[str, str], _Partition] = {}
+
+    def partition(self, operator_id: str, disruption_type: str) -> Optional[_Partition]:
+        return self._partitions.get((str(operator_id), disruption_type))
+
+    def ensure_partition(self, operator_id: str, disruption_type: str) -> _Partition:
+        key = (str(operator_id), disruption_type)
+        partition = self._partitions.get(key)
+        if partition is None:
+            partition = self._partitions[key] = _Partition(self.n_features)
+        return partition
+
+    def add(self, operator_id: str, disruption_type: str, case_id: str, text: str, meta: Dict[str, Any]):
+        """Index (or re-index) one resolved case"""
+        self.ensure_partition(operator_id, disruption_type).add(
+            str(case_id), embed(text, self.n_features), meta
+        )
+
+    def query(
+        self,
+        operator_id: str,
+        disruption_type: str,
+        text: str,
+        k: int = 3,
+        exclude: Optional[str] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Top-k (case_id, cosine score, meta), best first; zero scores are dropped"""
+        partition = self.partition(operator_id, disruption_type)
+        if partition is None:
+            return []
+        return partition.top_k(embed(text, self.n_features), k, exclude=str(exclude) if exclude else None)
+
+    def clear(self):
+        self._partitions.clear()
@@ -0,0 +1,130 @@
+"""
+Server-Sent Events
+Streams LLM output to the browser as it is generated.
+
+Event types:
+  token    {"text": "..."}               each chunk of model output
+  section  {"key": "...", "value": ...}  each top-level field of a JSON answer, once complete
+  result   {...}                         the final (persisted) result
+  error    {"detail": "..."}             the stream failed part way
+"""
+
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one SSE message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class JsonSectionParser:
+    """
+    Incrementally parses a streamed JSON object and returns each top-level
+    member as soon as its value is complete. Text before the opening brace
+    (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start: Optional[int] = None
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Add text; returns the (key, value) pairs completed by it"""
+        self._buffer += text
+        sections: List[Tuple[str, Any]] = []
+        buffer = self._buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1 and char == "{":
+                    self._member_start = i + 1
+            elif char in "}]":
+                if self._depth == 1:
+                    self._emit(buffer[self._member_start:i], sections)
+                    self._member_start = None
+                self._depth = max(0, self._depth - 1)
+            elif char == "," and self._depth == 1:
+                self._emit(buffer[self._member_start:i], sections)
+                self._member_start = i + 1
+
+        self._pos = len(buffer)
+        return sections
+
+    def _emit(self, member: Optional[str], sections: List[Tuple[str, Any]]):
+        if member is None or not member.strip():
+            return
+        try:
+            sections.extend(json.loads("{" + member + "}").items())
+        except ValueError:
+            pass
+
+
+async def sse_llm_response(
+    chunks: AsyncIterator[str],
+    finalize: Callable[[str], Awaitable[Any]],
+    sections: bool = False
+) -> StreamingResponse:
+    """
+    Stream an LLM answer as SSE: token (and optionally section) events, then a
+    result event with finalize(full_text), which typically parses and persists.
+
+    The first chunk is awaited before the response starts, so scheduling
+    errors such as LlmOverloadedError still surface as normal HTTP errors.
+    """
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def all_chunks():
+        if first is not None:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+
+    async def events():
+        parser = JsonSectionParser() if sections else None
+        parts = []
+        try:
+            async for chunk in all_chunks():
+                parts.append(chunk)
+                yield sse_event("token", {"text": chunk})
+                if parser:
+                    for key, value in parser.feed(chunk):
+                        yield sse_event("section", {"key": key, "value": value})
+            yield sse_event("result", await finalize("".join(parts)))
+        except Exception as e:
+            print(f"Warning: Streaming response failed: {e}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def sse_result_response(result: Any) -> StreamingResponse:
+    """SSE response carrying only a result event (e.g. an already generated draft)"""
+    async def events():
+        yield sse_event("result", result)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
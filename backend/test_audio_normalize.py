@@ -0,0 +1,93 @@
+"""
+Test audio normalization before speech-to-text
+Runs without ffmpeg (WAV input) and without calling Sarvam
+"""
+
+import sys
+import os
+import asyncio
+import io
+import wave
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from audio_normalizer import TARGET_RATE, TARGET_RMS, decode, prepare_for_stt, prepare_sync, shutdown_audio_pool
+
+
+def _stereo_wav(rate=44100, lead=2.0, speech=3.0, tail=1.5, amplitude=1500):
+    """Quiet 300 Hz tone between silences, as 16-bit stereo WAV"""
+    t = np.arange(int(speech * rate)) / rate
+    tone = amplitude * np.sin(2 * np.pi * 300 * t)
+    mono = np.concatenate([np.zeros(int(lead * rate)), tone, np.zeros(int(tail * rate))])
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(2)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(np.repeat(mono, 2).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def test_normalize_wav():
+    """Downmixed, resampled, silence trimmed and levelled, with byte savings reported"""
+    audio = _stereo_wav()
+    prepared = prepare_sync(audio, "wav", max_seconds=25, overlap=1.0)
+    stats = prepared.stats
+    assert stats["normalized"] and len(prepared.segments) == 1
+    assert 3.3 <= stats["duration"] <= 3.5
+    assert 3.0 <= stats["trimmed_seconds"] <= 3.3
+    assert stats["output_bytes"] < stats["input_bytes"] / 8
+    assert stats["saved_bytes"] == stats["input_bytes"] - stats["output_bytes"]
+
+    segment = prepared.segments[0]
+    if segment.audio_format == "wav":
+        samples, rate = decode(segment.data, "wav")
+        assert rate == TARGET_RATE
+        voiced = samples[int(0.3 * rate):-int(0.3 * rate)]
+        assert abs(np.sqrt(np.mean(voiced ** 2)) - TARGET_RMS) < 0.01
+    print("✅ WAV normalized to 16 kHz mono with silence trimmed")
+
+
+def test_undecodable_audio_passes_through():
+    """Audio that cannot be decoded is sent unchanged as one segment"""
+    async def run():
+        try:
+            return await prepare_for_stt(b"\x1aE\xdf\xa3not-really-webm", "webm")
+        finally:
+            shutdown_audio_pool()
+
+    prepared = asyncio.run(run())
+    assert not prepared.stats["normalized"]
+    assert len(prepared.segments) == 1 and prepared.segments[0].audio_format == "webm"
+    assert prepared.stats["saved_bytes"] == 0
+    print("✅ Undecodable audio passed through")
+
+
+def test_prepared_in_process_pool():
+    """prepare_for_stt runs the pipeline off the event loop"""
+    async def run():
+        try:
+            return await prepare_for_stt(_stereo_wav(rate=16000), "wav")
+        finally:
+            shutdown_audio_pool()
+
+    prepared = asyncio.run(run())
+    assert prepared.stats["normalized"]
+    assert prepared.stats["input_format"] == "wav"
+    print("✅ Normalization runs in the process pool")
+
+
+def main():
+    """Run all audio normalization tests"""
+    test_normalize_wav()
+    test_undecodable_audio_passes_through()
+    test_prepared_in_process_pool()
+    print("\n✅ All audio normalization tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Test audio segmentation and parallel transcription of long recordings
+Runs without calling Sarvam (uses a fake speech_to_text_bytes)
+"""
+
+import sys
+import os
+import asyncio
+import io
+import wave
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from audio_segmenter import split_audio, split_wav, stitch_transcripts
+from sarvam_service import SarvamService
+
+RATE = 16000
+
+
+def _wav(pattern):
+    """WAV made of (seconds, loud) pieces: a 220 Hz tone when loud, near-silence otherwise"""
+    pieces = []
+    for seconds, loud in pattern:
+        t = np.arange(int(seconds * RATE)) / RATE
+        amplitude = 8000 if loud else 20
+        pieces.append(amplitude * np.sin(2 * np.pi * 220 * t))
+    samples = np.concatenate(pieces).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(RATE)
+        writer.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def test_split_on_silence():
+    """Cuts land in pauses, so segments do not overlap"""
+    audio = _wav([(20, True), (1, False), (18, True), (1, False), (15, True)])
+    segments = split_wav(audio, max_seconds=25, overlap=1.0)
+    assert len(segments) == 3
+    assert 20 <= segments[0].end <= 21 and 39 <= segments[1].end <= 40
+    for previous, following in zip(segments, segments[1:]):
+        assert following.start == previous.end
+    assert all(segment.end - segment.start <= 25 for segment in segments)
+    assert abs(segments[-1].end - 55) < 0.01
+    print("✅ Recordings split on silence")
+
+
+def test_fixed_windows_overlap_without_silence():
+    """Continuous speech is cut at the window edge with overlap"""
+    segments = split_wav(_wav([(60, True)]), max_seconds=25, overlap=1.0)
+    assert len(segments) == 3
+    for previous, following in zip(segments, segments[1:]):
+        assert abs((previous.end - following.start) - 1.0) < 0.05
+    print("✅ Overlapping windows when there is no pause")
+
+
+def test_stitch_drops_repeated_words():
+    """Words repeated in the overlap appear once; timestamps are shifted"""
+    stitched = stitch_transcripts([
+        {"index": 1, "start": 24.0, "end": 40.0, "success": True, "transcript": "at the toll plaza since morning",
+         "timestamps": {"words": ["at", "the", "toll", "plaza", "since", "morning"],
+                        "start_time_seconds": [0.1, 0.3, 0.5, 0.9, 1.2, 1.5],
+                        "end_time_seconds": [0.2, 0.4, 0.8, 1.1, 1.4, 1.9]}},
+        {"index": 0, "start": 0.0, "end": 25.0, "success": True, "transcript": "Truck is stuck at the",
+         "timestamps": {"words": ["Truck", "is", "stuck", "at", "the"],
+                        "start_time_seconds": [0.0, 0.4, 0.6, 24.1, 24.3],
+                        "end_time_seconds": [0.3, 0.5, 0.9, 24.2, 24.4]}},
+    ])
+    assert stitched["transcript"] == "Truck is stuck at the toll plaza since morning"
+    assert stitched["timestamps"]["words"][5] == "toll"
+    assert stitched["timestamps"]["start_time_seconds"][5] == 24.5
+    print("✅ Overlapping transcripts stitched")
+
+
+def test_parallel_transcription_with_partial_failure():
+    """Segments run concurrently under the cap; a failing segment gives a partial result"""
+    service = SarvamService()
+    state = {"active": 0, "peak": 0, "calls": 0}
+
+    async def fake_stt(audio, audio_format="wav", language_code="hi-IN", filename=None):
+        state["calls"] += 1
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        if filename == "segment-1.wav":
+            return {"success": False, "error": "Sarvam API error: 503"}
+        return {"success": True, "transcript": filename.split(".")[0], "language_code": "hi-IN"}
+
+    service.speech_to_text_bytes = fake_stt
+    audio = _wav([(20, True), (1, False)] * 4)
+
+    result = asyncio.run(service.speech_to_text_segmented(audio, "wav", max_seconds=25, concurrency=2))
+    assert result["success"] and result["partial"]
+    assert result["segments"] == 4
+    assert result["transcript"] == "segment-0 segment-2 segment-3"
+    assert [s["index"] for s in result["failed_segments"]] == [1]
+    assert state["peak"] == 2
+    assert state["calls"] == 5  # the failed segment is retried once
+    print("✅ Parallel transcription returns partial results")
+
+
+def test_undecodable_audio_sent_whole():
+    """Without a decoder, non-WAV audio is one segment in its own format"""
+    segments = asyncio.run(split_audio(b"\x1aE\xdf\xa3not-really-webm", "webm"))
+    assert len(segments) == 1 and segments[0].audio_format == "webm"
+    print("✅ Undecodable audio sent as one segment")
+
+
+def main():
+    """Run all audio segmentation tests"""
+    test_split_on_silence()
+    test_fixed_windows_overlap_without_silence()
+    test_stitch_drops_repeated_words()
+    test_parallel_transcription_with_partial_failure()
+    test_undecodable_audio_sent_whole()
+    print("\n✅ All audio segmentation tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Test insert_many batching and per-row error reporting
+Runs without a database connection (uses an in-memory fake connection)
+"""
+
+import sys
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_adapter import SupabaseAdapter
+from db_compat import DBDatabase
+from operator_service import OperatorService
+
+OPERATOR_ID = "0b3c3c8e-8f8a-4a51-9d2c-3f0a1c2b4d5e"
+
+
+class FakeConnection:
+    """Records statements; rejects duplicate vehicle numbers like the unique index would"""
+
+    def __init__(self):
+        self.executemany_calls = 0
+        self.rows = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def executemany(self, sql, args):
+        self.executemany_calls += 1
+        numbers = [row[2] for row in args]
+        if len(set(numbers)) != len(numbers):
+            raise asyncpg.UniqueViolationError("duplicate key value violates unique constraint")
+        self.rows.extend(args)
+
+    async def execute(self, sql, *args):
+        if any(row[2] == args[2] for row in self.rows):
+            raise asyncpg.UniqueViolationError("duplicate key value violates unique constraint")
+        self.rows.append(args)
+        return "INSERT 0 1"
+
+
+def _fake_db():
+    adapter = SupabaseAdapter("")
+    conn = FakeConnection()
+
+    @asynccontextmanager
+    async def acquire():
+        yield conn
+
+    class Pool:
+        def acquire(self):
+            return acquire()
+
+    adapter.pool = Pool()
+    return DBDatabase(adapter), conn
+
+
+def test_bulk_upload_single_batch():
+    """A clean CSV is written with one executemany call"""
+    db, conn = _fake_db()
+    csv_content = "vehicle_number,driver_name\n" + "\n".join(f"MH01-{i},Driver {i}" for i in range(50))
+    results = asyncio.run(OperatorService(db).bulk_upload_fleet(OPERATOR_ID, csv_content))
+    assert results == {"success": 50, "failed": 0, "errors": []}
+    assert conn.executemany_calls == 1 and len(conn.rows) == 50
+    print("✅ Fleet CSV inserted in one batch")
+
+
+def test_bulk_upload_reports_bad_rows():
+    """Missing and duplicate vehicle numbers are reported per CSV row"""
+    db, conn = _fake_db()
+    csv_content = "vehicle_number,driver_name\nMH01-1,A\n,B\nMH01-2,C\nMH01-1,D\n"
+    results = asyncio.run(OperatorService(db).bulk_upload_fleet(OPERATOR_ID, csv_content))
+    assert results["success"] == 2
+    assert results["failed"] == 2
+    assert results["errors"][0] == "Row 3: Missing vehicle_number"
+    assert results["errors"][1].startswith("Row 5: duplicate key")
+    print("✅ Bad rows reported individually")
+
+
+def main():
+    """Run all bulk insert tests"""
+    test_bulk_upload_single_batch()
+    test_bulk_upload_reports_bad_rows()
+    print("\n✅ All bulk insert tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Test driver magic-link caching and batched use counts
+Runs without a database connection
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_compat import DBDatabase
+from driver_link_service import DriverLinkService
+
+VEHICLE_ID = "0b3c3c8e-8f8a-4a51-9d2c-3f0a1c2b4d5e"
+
+
+class FakeAdapter:
+    """Serves one link per token and records usage flushes"""
+
+    def __init__(self, expires_in: timedelta):
+        self.expires_in = expires_in
+        self.lookups = 0
+        self.flushes = []
+
+    async def find_one(self, table, query, sort=None):
+        self.lookups += 1
+        if table == "magic_links":
+            return {
+                "token": query["token"],
+                "vehicle_id": VEHICLE_ID,
+                "expires_at": datetime.now(timezone.utc) + self.expires_in
+            }
+        return {"_id": VEHICLE_ID, "vehicle_number": "MH01-1"}
+
+    async def magic_links_add_usage(self, usage):
+        self.flushes.append(usage)
+        return len(usage)
+
+
+def test_resolved_links_cached():
+    """Retries of a valid token skip both lookups"""
+    adapter = FakeAdapter(timedelta(days=30))
+    service = DriverLinkService(DBDatabase(adapter))
+
+    async def run():
+        for _ in range(3):
+            magic_link, vehicle = await service.resolve("abc")
+            assert vehicle["vehicle_number"] == "MH01-1"
+
+    asyncio.run(run())
+    assert adapter.lookups == 2
+    print("✅ Resolved links cached")
+
+
+def test_cache_ttl_capped_at_expiry():
+    """A link is never served from cache after it expires"""
+    adapter = FakeAdapter(timedelta(seconds=-1))
+    service = DriverLinkService(DBDatabase(adapter))
+
+    async def run():
+        await service.resolve("abc")
+        await service.resolve("abc")
+
+    asyncio.run(run())
+    assert adapter.lookups == 4 and len(service.cache) == 0
+    print("✅ Cache TTL capped at link expiry")
+
+
+def test_use_counts_coalesced():
+    """Uses are summed per token and written in one batch"""
+    adapter = FakeAdapter(timedelta(days=30))
+    service = DriverLinkService(DBDatabase(adapter), flush_interval=3600, flush_threshold=5)
+
+    async def run():
+        for token in ("a", "a", "b", "a"):
+            await service.record_use(token)
+        assert adapter.flushes == []
+        await service.record_use("b")
+
+    asyncio.run(run())
+    assert len(adapter.flushes) == 1
+    usage = adapter.flushes[0]
+    assert usage["a"][0] == 3 and usage["b"][0] == 2
+    print("✅ Use counts coalesced into one batch")
+
+
+def test_flush_loop_writes_idle_counts():
+    """Counts below the threshold are written by the flush loop without another request"""
+    adapter = FakeAdapter(timedelta(days=30))
+    service = DriverLinkService(DBDatabase(adapter), flush_interval=0.02, flush_threshold=100)
+
+    async def run():
+        loop = asyncio.create_task(service.run_flush_loop())
+        await service.record_use("a")
+        await asyncio.sleep(0.05)
+        loop.cancel()
+
+    asyncio.run(run())
+    assert len(adapter.flushes) == 1 and adapter.flushes[0]["a"][0] == 1
+    print("✅ Flush loop writes counts within the flush interval")
+
+
+def main():
+    """Run all driver link tests"""
+    test_resolved_links_cached()
+    test_cache_ttl_capped_at_expiry()
+    test_use_counts_coalesced()
+    test_flush_loop_writes_idle_counts()
+    print("\n✅ All driver link tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
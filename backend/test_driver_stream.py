@@ -0,0 +1,131 @@
+"""
+Test streaming driver voice reports
+Runs without a database or Sarvam (fake transcription and case callbacks)
+"""
+
+import sys
+import os
+import asyncio
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from driver_stream import DriverStreamSession
+
+
+class FakeBackend:
+    """Transcribes b"text" clips to their text and records case writes and pushed messages"""
+
+    def __init__(self, fail_on=None, delays=None):
+        self.fail_on = fail_on
+        self.delays = delays or {}
+        self.created = []
+        self.updated = []
+        self.sent = []
+
+    async def transcribe(self, chunk):
+        text = chunk.decode()
+        await asyncio.sleep(self.delays.get(text, 0))
+        if text == self.fail_on:
+            return {"success": False, "error": "Sarvam API error: 503"}
+        return {"success": True, "transcript": text, "segments": 1, "duration": 5.0}
+
+    async def create_case(self, transcript, transcription):
+        self.created.append((transcript, transcription))
+        return "case-1"
+
+    async def update_case(self, case_id, transcript, transcription):
+        self.updated.append((case_id, transcript, transcription))
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    def session(self, min_words=4):
+        return DriverStreamSession(self.transcribe, self.create_case, self.update_case, self.send, min_words=min_words)
+
+
+def test_case_created_early_and_updated():
+    """The case exists once there is enough context; the final transcript updates it"""
+    backend = FakeBackend()
+
+    async def run():
+        session = backend.session()
+        await session.add_chunk(b"truck stuck at")
+        await asyncio.sleep(0.01)
+        assert session.case_id is None
+        await session.add_chunk(b"JNPT gate since morning")
+        await asyncio.sleep(0.01)
+        assert session.case_id == "case-1"
+        await session.add_chunk(b"customs hold on container")
+        return await session.finish()
+
+    result = asyncio.run(run())
+    transcript = "truck stuck at JNPT gate since morning customs hold on container"
+    assert result == {"case_id": "case-1", "transcript": transcript}
+    assert backend.created[0][0] == "truck stuck at JNPT gate since morning"
+    assert backend.updated[0][:2] == ("case-1", transcript)
+    assert backend.updated[0][2]["chunks"] == 3 and backend.updated[0][2]["duration"] == 15.0
+
+    types = [m["type"] for m in backend.sent]
+    assert types == ["transcript", "transcript", "case_created", "transcript"]
+    assert backend.sent[-1]["transcript"] == transcript
+    print("✅ Case created early and updated with the final transcript")
+
+
+def test_out_of_order_clips_stitched_in_order():
+    """A slow clip does not hold back later ones, and the transcript keeps recording order"""
+    backend = FakeBackend(delays={"one": 0.03})
+
+    async def run():
+        session = backend.session(min_words=10)
+        await session.add_chunk(b"one")
+        await session.add_chunk(b"two")
+        return await session.finish()
+
+    result = asyncio.run(run())
+    assert result["transcript"] == "one two"
+    assert [m.get("text") for m in backend.sent[:2]] == ["two", "one"]
+    assert len(backend.created) == 1 and not backend.updated
+    print("✅ Clips transcribed concurrently and stitched in order")
+
+
+def test_failed_clip_and_dropped_connection():
+    """A failed clip makes the report partial; a closed socket does not stop the report"""
+    backend = FakeBackend(fail_on="static")
+
+    async def broken_send(message):
+        raise RuntimeError("socket closed")
+
+    async def run():
+        session = backend.session()
+        session.send = broken_send
+        await session.add_chunk(b"tyre burst near toll")
+        await session.add_chunk(b"static")
+        return await session.finish()
+
+    result = asyncio.run(run())
+    assert result["case_id"] == "case-1"
+    assert backend.updated[0][2]["partial"] is True
+    print("✅ Partial streams still create the case")
+
+
+def test_no_audio_no_case():
+    """Ending a stream without audio creates nothing"""
+    backend = FakeBackend()
+    result = asyncio.run(backend.session().finish())
+    assert result["case_id"] is None and not backend.created
+    print("✅ Empty streams create no case")
+
+
+def main():
+    """Run all driver stream tests"""
+    test_case_created_early_and_updated()
+    test_out_of_order_clips_stitched_in_order()
+    test_failed_clip_and_dropped_connection()
+    test_no_audio_no_case()
+    print("\n✅ All driver stream tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
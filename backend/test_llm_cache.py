@@ -0,0 +1,120 @@
+"""
+Test the LLM response cache and shared OpenAI clients
+Runs without calling OpenAI (uses a fake completions client)
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_cache import MemoryLlmCache, SqliteLlmCache, cache_key
+import llm_client
+from llm_client import LlmChat, UserMessage, close_llm_clients, get_openai_client
+
+
+class FakeCompletions:
+    """Counts calls and returns a numbered answer"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, model, messages, temperature, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=f"answer {self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _chat(cache):
+    chat = LlmChat(api_key="test", session_id="s", system_message="You are Ward", cache=cache)
+    completions = FakeCompletions()
+    chat.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return chat, completions
+
+
+def test_cache_key():
+    """Keys change with model, temperature and image content only"""
+    messages = [{"role": "user", "content": [
+        {"type": "text", "text": "What is in this image?"},
+        {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}},
+    ]}]
+    other_image = [{"role": "user", "content": [
+        messages[0]["content"][0],
+        {"type": "image_url", "image_url": {"url": "data:image/png;base64,BBBB"}},
+    ]}]
+    key = cache_key("gpt-4o", messages, 0.7)
+    assert key == cache_key("gpt-4o", [dict(m) for m in messages], 0.7)
+    assert key != cache_key("gpt-4o-mini", messages, 0.7)
+    assert key != cache_key("gpt-4o", messages, 0.2)
+    assert key != cache_key("gpt-4o", other_image, 0.7)
+    print("✅ Cache keys cover model, messages, images and temperature")
+
+
+def test_repeat_prompt_served_from_cache():
+    """A fresh chat with the same prompt reuses the answer; use_cache=False calls OpenAI"""
+    cache = MemoryLlmCache()
+
+    async def run():
+        first, completions = _chat(cache)
+        assert await first.send_message(UserMessage(text="Summarize case")) == "answer 1"
+
+        second, second_completions = _chat(cache)
+        assert await second.send_message(UserMessage(text="Summarize case")) == "answer 1"
+        assert second_completions.calls == 0
+        assert second.messages[-1] == {"role": "assistant", "content": "answer 1"}
+
+        third, third_completions = _chat(cache)
+        assert await third.send_message(UserMessage(text="Summarize case"), use_cache=False) == "answer 1"
+        assert third_completions.calls == 1
+
+    asyncio.run(run())
+    print("✅ Repeat prompts served from cache")
+
+
+def test_sqlite_backend():
+    """SQLite backend round-trips values and honours the TTL"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "llm_cache.sqlite3")
+
+        async def run():
+            cache = SqliteLlmCache(path, ttl=60)
+            await cache.set("k", "v")
+            assert await SqliteLlmCache(path).get("k") == "v"
+            expired = SqliteLlmCache(path, ttl=-1)
+            await expired.set("old", "v")
+            assert await expired.get("old") is None
+
+        asyncio.run(run())
+    print("✅ SQLite backend works")
+
+
+def test_openai_client_shared():
+    """Chats in one event loop share a pooled client until shutdown"""
+    async def run():
+        first = LlmChat(api_key="test", session_id="a", system_message="x")
+        second = LlmChat(api_key="test", session_id="b", system_message="y")
+        assert first.client is second.client is get_openai_client("test")
+        assert get_openai_client("other") is not first.client
+        await close_llm_clients()
+        assert not llm_client._clients
+
+    asyncio.run(run())
+    print("✅ OpenAI client shared per process")
+
+
+def main():
+    """Run all LLM cache tests"""
+    test_cache_key()
+    test_repeat_prompt_served_from_cache()
+    test_sqlite_backend()
+    test_openai_client_shared()
+    print("\n✅ All LLM cache tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
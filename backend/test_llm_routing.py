@@ -0,0 +1,148 @@
+"""
+Test task-aware model routing, fallbacks and served-model tracking
+Runs without calling OpenAI (uses a fake completions client)
+"""
+
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_cache import MemoryLlmCache
+from llm_client import LlmChat, LlmOverloadedError, MODEL_TIERS, UserMessage, route_models
+
+
+class FakeCompletions:
+    """Records the model of each call; models in `down` fail with a connection error"""
+
+    def __init__(self, down=()):
+        self.models = []
+        self.down = set(down)
+
+    async def create(self, model, messages, temperature, **kwargs):
+        self.models.append(model)
+        if model in self.down:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+        message = SimpleNamespace(content=f"answer from {model}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def _chat(task, down=()):
+    chat = LlmChat(api_key="test", session_id="s", system_message="You are Ward", cache=None).for_task(task)
+    chat.cache = None
+    completions = FakeCompletions(down)
+    chat.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return chat, completions
+
+
+def test_routes():
+    """Short structured tasks use the fast tier; images always use the vision tier"""
+    assert route_models("clarity_questions")[0] == MODEL_TIERS["fast"]
+    assert route_models("rca")[0] == MODEL_TIERS["reasoning"]
+    assert route_models("unknown_task") == route_models("default")
+    assert route_models("clarity_questions", has_images=True) == [MODEL_TIERS["vision"]]
+
+    os.environ["LLM_ROUTE_RCA"] = "fast, gpt-4.1"
+    try:
+        assert route_models("rca") == [MODEL_TIERS["fast"], "gpt-4.1"]
+    finally:
+        del os.environ["LLM_ROUTE_RCA"]
+    print("✅ Tasks routed by cost tier")
+
+
+def test_served_model_recorded():
+    """Each call records the model that answered it"""
+    async def run():
+        chat, completions = _chat("responsibility")
+        assert await chat.send_message(UserMessage(text="Who is responsible?")) == f"answer from {MODEL_TIERS['fast']}"
+        assert chat.served_model == MODEL_TIERS["fast"]
+
+        await chat.send_message(UserMessage(text="Read this", images=["AAAA"]))
+        assert chat.served_model == completions.models[-1] == MODEL_TIERS["vision"]
+
+    asyncio.run(run())
+    print("✅ Served model recorded per call")
+
+
+def test_fallback_on_error():
+    """When the primary model fails, the next model in the route answers"""
+    async def run():
+        chat, completions = _chat("rca", down=[MODEL_TIERS["reasoning"]])
+        assert await chat.send_message("Analyze") == f"answer from {MODEL_TIERS['fast']}"
+        assert completions.models == [MODEL_TIERS["reasoning"], MODEL_TIERS["fast"]]
+        assert chat.served_model == MODEL_TIERS["fast"]
+
+        chat, _ = _chat("rca", down=list(MODEL_TIERS.values()))
+        try:
+            await chat.send_message("Analyze")
+            raise AssertionError("Should raise when every model fails")
+        except openai.APIConnectionError:
+            pass
+
+    asyncio.run(run())
+    print("✅ Fallback models used on errors")
+
+
+def test_cached_answer_reports_fallback_model():
+    """A cache hit reports the model that produced the cached answer, not the first in the route"""
+    async def run():
+        cache = MemoryLlmCache()
+        chat, _ = _chat("rca", down=[MODEL_TIERS["reasoning"]])
+        chat.cache = cache
+        await chat.send_message("Analyze")
+        assert chat.served_model == MODEL_TIERS["fast"]
+
+        again, completions = _chat("rca")
+        again.cache = cache
+        assert await again.send_message("Analyze") == f"answer from {MODEL_TIERS['fast']}"
+        assert completions.models == []
+        assert again.served_model == MODEL_TIERS["fast"]
+
+    asyncio.run(run())
+    print("✅ Cached answers keep their served model")
+
+
+def test_overload_not_retried_on_next_model():
+    """A queue timeout surfaces as LlmOverloadedError without trying the fallback model"""
+    class FullScheduler:
+        def __init__(self):
+            self.models = []
+
+        def slot(self, model, **kwargs):
+            self.models.append(model)
+            raise LlmOverloadedError("LLM queue full", retry_after=2.0)
+
+    async def run():
+        chat, completions = _chat("clarity_questions")
+        chat.scheduler = FullScheduler()
+        try:
+            await chat.send_message("Ask")
+            raise AssertionError("Should raise LlmOverloadedError")
+        except LlmOverloadedError:
+            pass
+        assert chat.scheduler.models == [MODEL_TIERS["fast"]]
+        assert completions.models == []
+
+    asyncio.run(run())
+    print("✅ Overload errors are not retried on another model")
+
+
+def main():
+    """Run all LLM routing tests"""
+    test_routes()
+    test_served_model_recorded()
+    test_fallback_on_error()
+    test_cached_answer_reports_fallback_model()
+    test_overload_not_retried_on_next_model()
+    print("\n✅ All LLM routing tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Test keyset cursor tokens and the TTL cache used for cached totals
+Runs without a database connection
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime, timezone
+from uuid import UUID
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pagination import encode_cursor, decode_cursor, split_page
+from cache import TTLCache
+
+ROW_ID = "7d9f1e2a-3b4c-4d5e-8f60-718293a4b5c6"
+
+
+def test_cursor_round_trip():
+    """A cursor decodes back to the (sort_value, id) it was built from"""
+    updated_at = datetime(2025, 3, 1, 12, 30, tzinfo=timezone.utc)
+    token = encode_cursor(updated_at, ROW_ID)
+    assert "=" not in token
+    assert decode_cursor(token) == (updated_at, UUID(ROW_ID))
+    print("✅ Cursor round trip")
+
+
+def test_cursor_typed_by_sort_column():
+    """Cursors over non-timestamp sort columns decode to the column's type"""
+    token = encode_cursor("Nhava Sheva CFS", ROW_ID)
+    assert decode_cursor(token, "text") == ("Nhava Sheva CFS", UUID(ROW_ID))
+    assert decode_cursor(encode_cursor(42, ROW_ID), "integer") == (42, UUID(ROW_ID))
+    for column_type in ("timestamptz", "integer"):
+        try:
+            decode_cursor(token, column_type)
+        except ValueError:
+            continue
+        raise AssertionError(f"Expected ValueError for a text cursor on a {column_type} column")
+    print("✅ Cursors decoded by sort column type")
+
+
+def test_invalid_cursor_rejected():
+    """Tampered cursors raise ValueError"""
+    for token in ("not-a-cursor", encode_cursor("yesterday", ROW_ID)):
+        try:
+            decode_cursor(token)
+        except ValueError:
+            continue
+        raise AssertionError(f"Expected ValueError for {token}")
+    print("✅ Invalid cursors rejected")
+
+
+def test_split_page():
+    """The extra row fetched by the adapter produces a next cursor"""
+    rows = [
+        {"id": f"00000000-0000-0000-0000-00000000000{i}", "timestamp": datetime(2025, 1, 10 - i, tzinfo=timezone.utc)}
+        for i in range(3)
+    ]
+    items, next_cursor = split_page(rows, 2, "timestamp")
+    assert items == rows[:2]
+    assert decode_cursor(next_cursor) == (rows[1]["timestamp"], UUID(rows[1]["id"]))
+
+    items, next_cursor = split_page(rows, 3, "timestamp")
+    assert items == rows and next_cursor is None
+    print("✅ Pages split correctly")
+
+
+def test_ttl_cache_expiry_and_lru():
+    """Entries expire and the least recently used entry is evicted"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "b" not in cache and cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.set("short", 1, ttl=0)
+    assert "short" not in cache
+
+    assert cache.discard_where(lambda key: key in ("a", "c")) == 2
+    assert len(cache) == 0
+    print("✅ TTL cache expiry and eviction")
+
+
+def test_get_or_set_coalesces_loads():
+    """Concurrent misses for one key trigger a single load"""
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_set("total", load) for _ in range(5)))
+
+    assert asyncio.run(run()) == [42] * 5
+    assert len(calls) == 1
+    print("✅ Concurrent loads coalesced")
+
+
+class _Events:
+    """Fake collection of n rows that records the page size asked for"""
+
+    def __init__(self, n):
+        self.rows = [{"id": f"00000000-0000-0000-0000-{i:012d}"} for i in range(n)]
+        self.limits = []
+
+    async def find_one(self, query, sort=None):
+        return {"_id": query["_id"]}
+
+    async def find(self, query, sort=None, limit=None):
+        rows = self.rows[:limit] if limit else self.rows
+
+        class Cursor:
+            async def to_list(self, length=None):
+                return rows
+        return Cursor()
+
+    async def find_page(self, query, limit, cursor=None, ascending=False):
+        self.limits.append(limit)
+        return self.rows[:limit], None
+
+
+def test_unpaged_requests_keep_previous_defaults():
+    """Clients that never send a cursor still get the full timeline page and audit trail"""
+    import server
+    from fastapi import Response
+
+    db = type("FakeDB", (), {})()
+    db.cases = _Events(0)
+    db.timeline_events = _Events(1200)
+    db.audit_entries = _Events(1500)
+    current_user = {"user_id": "u1", "email": "ops@example.com"}
+
+    original_db = server.db
+    server.db = db
+    try:
+        async def run():
+            timeline = await server.get_timeline("c1", Response(), current_user=current_user)
+            await server.get_timeline("c1", Response(), cursor="next", current_user=current_user)
+            audit = await server.get_case_audit("c1", Response(), current_user=current_user)
+            paged = await server.get_case_audit("c1", Response(), limit=100, current_user=current_user)
+            return timeline, audit, paged
+
+        timeline, audit, paged = asyncio.run(run())
+    finally:
+        server.db = original_db
+    assert len(timeline) == 1000 and db.timeline_events.limits == [1000, 200]
+    assert len(audit) == 1500 and len(paged) == 100
+    print("✅ Unpaged timeline and audit requests keep their previous sizes")
+
+
+def main():
+    """Run all pagination tests"""
+    test_cursor_round_trip()
+    test_cursor_typed_by_sort_column()
+    test_invalid_cursor_rejected()
+    test_split_page()
+    test_ttl_cache_expiry_and_lru()
+    test_get_or_set_coalesces_loads()
+    test_unpaged_requests_keep_previous_defaults()
+    print("\n✅ All pagination tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
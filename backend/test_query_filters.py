@@ -0,0 +1,164 @@
+"""
+Test MongoDB-style query compilation for the Supabase adapter
+Runs without a database connection
+"""
+
+import sys
+import os
+from datetime import datetime, timezone
+from uuid import UUID
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_adapter import SupabaseAdapter
+from db_compat import DBCollection
+from db_tables import TABLES
+from query_compiler import build_conditions, compile_insert, compile_select, compile_update_one, normalize_sort, query_shape
+
+CASE_ID = "0b3c3c8e-8f8a-4a51-9d2c-3f0a1c2b4d5e"
+
+
+def _compile(query):
+    return build_conditions(TABLES["cases"], query)
+
+
+def test_plain_equality():
+    """Plain columns compile to parameterized equality"""
+    conditions, params, next_idx = _compile({"status": "RESOLVED", "_id": CASE_ID})
+    assert conditions == ["status = $1", "id = $2"]
+    assert params == ["RESOLVED", UUID(CASE_ID)]
+    assert next_idx == 3
+    print("✅ Plain equality compiles")
+
+
+def test_dotted_jsonb_equality_uses_containment():
+    """Dotted JSONB equality compiles to @> so the GIN index applies"""
+    conditions, params, _ = _compile({"disruption_details.disruption_type": "customs_hold"})
+    assert conditions == ["disruption_details @> $1::jsonb"]
+    assert params[0] == {"disruption_type": "customs_hold"}
+    print("✅ JSONB equality uses containment")
+
+
+def test_operators():
+    """$in, $ne and range operators compile to SQL"""
+    since = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    conditions, params, _ = _compile({
+        "created_at": {"$gte": since, "$lt": "2025-02-01T00:00:00Z"},
+        "disruption_details.disruption_type": {"$in": ["port_congestion", "customs_hold"]},
+        "_id": {"$ne": CASE_ID},
+    })
+    assert conditions == [
+        "created_at >= $1",
+        "created_at < $2",
+        "(disruption_details->>'disruption_type') = ANY($3::text[])",
+        "id IS DISTINCT FROM $4",
+    ]
+    assert params[0] == since
+    assert params[1] == datetime(2025, 2, 1, tzinfo=timezone.utc)
+    assert params[2] == ["port_congestion", "customs_hold"]
+    assert params[3] == UUID(CASE_ID)
+    print("✅ Operators compile")
+
+
+def test_rejects_unknown_fields():
+    """Unknown fields and operators fail loudly instead of being ignored"""
+    for query in ({"not_a_column": 1}, {"status": {"$regex": "RES"}}, {"disruption_details.bad-key": 1}):
+        try:
+            _compile(query)
+        except ValueError:
+            continue
+        raise AssertionError(f"Expected ValueError for {query}")
+    print("✅ Unknown fields rejected")
+
+
+def test_convert_query_flattens_nested_documents():
+    """Nested sub-documents become dotted paths"""
+    collection = DBCollection(SupabaseAdapter(""), "cases")
+    converted = collection._convert_query({
+        "disruption_details": {"disruption_type": "customs_hold"},
+        "_id": {"$in": [UUID(CASE_ID)]},
+    })
+    assert converted == {
+        "disruption_details.disruption_type": "customs_hold",
+        "_id": {"$in": [CASE_ID]},
+    }
+    print("✅ Nested queries flattened")
+
+
+def test_sql_cached_per_query_shape():
+    """Queries that differ only in values share one compiled SQL string"""
+    cases = TABLES["cases"]
+    sort = normalize_sort([("updated_at", -1)])
+    first = compile_select(cases, query_shape({"status": "REPORTED", "_id": {"$in": [CASE_ID]}}), sort, True)
+    second = compile_select(cases, query_shape({"status": "RESOLVED", "_id": {"$in": [CASE_ID, CASE_ID]}}), sort, True)
+    assert first is second
+    assert first[0] == "SELECT * FROM cases WHERE status = $1 AND id = ANY($2::uuid[]) ORDER BY updated_at DESC LIMIT $3"
+
+    null_shape = compile_select(cases, query_shape({"status": None}), (), False)
+    assert null_shape[0] == "SELECT * FROM cases WHERE status IS NULL"
+    print("✅ SQL cached per query shape")
+
+
+def test_update_with_inc():
+    """$inc adds to the column (NULL counts as 0) after the $set assignments"""
+    sql, _ = compile_update_one(TABLES["magic_links"], ("last_used_at",), query_shape({"token": "abc"}), ("used_count",))
+    assert sql == (
+        "UPDATE magic_links SET last_used_at = $1, used_count = COALESCE(used_count, 0) + $2 "
+        "WHERE id = (SELECT id FROM magic_links WHERE token = $3 LIMIT 1)"
+    )
+    print("✅ $inc compiled into the UPDATE")
+
+
+def test_case_detail_json_restores_types():
+    """Rows aggregated with json_agg come back with datetimes, like a plain find"""
+    adapter = SupabaseAdapter("")
+    event = adapter._json_doc(
+        '{"id": "e1", "timestamp": "2025-01-02T03:04:05.123456+00:00", "metadata": {"at": "2025-01-02"}}',
+        "timeline_events"
+    )
+    assert event["timestamp"] == datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc)
+    assert event["metadata"] == {"at": "2025-01-02"} and event["_id"] == "e1"
+    case = adapter._json_doc({"id": CASE_ID, "evidence_score": 80, "created_at": None}, "cases")
+    assert case["evidence_score"] == 80 and case["created_at"] is None
+    print("✅ Case detail timestamps decoded to datetimes")
+
+
+def test_registry_specs():
+    """Every spec has a typed primary key and its defaults/sorts name real columns"""
+    for spec in TABLES.values():
+        assert spec.columns[spec.primary_key] == "uuid"
+        assert all(col in spec.columns for col in spec.defaults)
+        assert all(col in spec.columns for col in spec.required)
+        assert all(col in spec.columns for col, _ in spec.default_sort)
+    assert "api_keys" in TABLES and "webhooks" in TABLES
+    assert compile_insert(TABLES["api_keys"], ("id", "user_id", "key_hash")) == (
+        "INSERT INTO api_keys (id, user_id, key_hash) VALUES ($1, $2, $3)"
+    )
+
+    try:
+        build_conditions(TABLES["users"], {"password_hash": "x"})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("users should only be filterable by id and email")
+    print("✅ Table registry consistent")
+
+
+def main():
+    """Run all query compilation tests"""
+    test_plain_equality()
+    test_dotted_jsonb_equality_uses_containment()
+    test_operators()
+    test_rejects_unknown_fields()
+    test_convert_query_flattens_nested_documents()
+    test_sql_cached_per_query_shape()
+    test_update_with_inc()
+    test_case_detail_json_restores_types()
+    test_registry_specs()
+    print("\n✅ All query filter tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
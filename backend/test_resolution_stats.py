@@ -0,0 +1,191 @@
+"""
+Test resolution stats lookups and incremental refresh
+Runs without a database connection
+"""
+
+import sys
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_compat import DBDatabase
+from rca_engine import RCAEngine
+from resolution_stats_service import REFRESH_OVERLAP, ResolutionStatsService
+
+OPERATOR = "6f1d7c52-5b1e-4a8e-9d0c-1e2f3a4b5c6d"
+REFRESHED_AT = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def _row(lane, case_count, p50):
+    return {
+        "operator_id": OPERATOR,
+        "disruption_type": "customs_hold",
+        "lane": lane,
+        "case_count": case_count,
+        "p50_hours": Decimal(str(p50)),
+        "p75_hours": Decimal(str(p50 * 2)),
+        "p90_hours": Decimal(str(p50 * 3)),
+        "top_root_causes": [{"root_cause": "Invoice mismatch", "count": case_count}],
+        "sample_case_ids": ["c1"],
+        "updated_at": REFRESHED_AT,
+    }
+
+
+class FakeAdapter:
+    """Serves resolution_stats rows matching $in filters and records refreshes"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+        self.refreshed_since = []
+
+    async def find(self, table, query, sort=None, limit=None):
+        self.queries += 1
+        return [
+            row for row in self.rows
+            if row["operator_id"] == query["operator_id"]
+            and row["disruption_type"] == query["disruption_type"]
+            and row["lane"] in query["lane"]["$in"]
+        ]
+
+    async def find_one(self, table, query, sort=None):
+        return max(self.rows, key=lambda row: row["updated_at"]) if self.rows else None
+
+    async def resolution_stats_refresh(self, since=None):
+        self.refreshed_since.append(since)
+        return 4
+
+
+def test_most_specific_scope_with_enough_cases():
+    """The lane row wins when it has enough cases, else the whole-type row"""
+    adapter = FakeAdapter([
+        _row("jnpt-delhi", 5, 6),
+        _row("mundra-jaipur", 1, 50),
+        _row("*", 40, 20),
+    ])
+    service = ResolutionStatsService(DBDatabase(adapter))
+
+    async def run():
+        exact = await service.get_stats(OPERATOR, "customs_hold", " JNPT-Delhi ")
+        assert exact["lane"] == "jnpt-delhi"
+        assert exact["resolution_hours"] == {"p50": 6.0, "p75": 12.0, "p90": 18.0}
+
+        sparse = await service.get_stats(OPERATOR, "customs_hold", "Mundra-Jaipur")
+        assert (sparse["lane"], sparse["case_count"]) == ("*", 40)
+
+        no_lane = await service.get_stats(OPERATOR, "customs_hold", None)
+        assert no_lane["lane"] == "*"
+
+        assert await service.get_stats(OPERATOR, "port_congestion", "jnpt-delhi") is None
+
+    asyncio.run(run())
+    assert adapter.queries == 4
+    print("✅ Stats read from the most specific scope in one query")
+
+
+def test_incremental_refresh():
+    """Refresh starts just before the last refresh unless full=True"""
+    adapter = FakeAdapter([_row("*", 40, 20)])
+    service = ResolutionStatsService(DBDatabase(adapter))
+
+    async def run():
+        result = await service.refresh()
+        assert result["rows"] == 4
+        await service.refresh(full=True)
+
+    asyncio.run(run())
+    assert adapter.refreshed_since == [REFRESHED_AT - REFRESH_OVERLAP, None]
+    print("✅ Incremental refresh from the last watermark")
+
+
+def test_similar_resolutions_from_stats():
+    """Suggestions are the top root causes with their share and resolution times"""
+    stats = ResolutionStatsService._serialize(_row("*", 10, 6))
+    stats["top_root_causes"] = [
+        {"root_cause": "Invoice mismatch", "count": 7},
+        {"root_cause": "Missing COO", "count": 3},
+    ]
+    similar = RCAEngine().suggest_similar_resolutions(stats)
+    assert [s["root_cause"] for s in similar] == ["Invoice mismatch", "Missing COO"]
+    assert similar[0]["share"] == 0.7
+    assert similar[0]["typical_resolution_time"] == "6h median, 18h p90"
+    assert RCAEngine().suggest_similar_resolutions(None) == []
+    print("✅ Similar resolutions built from real stats")
+
+
+class FakeCaseCollection:
+    """Serves one case and accepts every write"""
+
+    def __init__(self, doc=None):
+        self.doc = doc
+
+    async def find_one(self, query, *args, **kwargs):
+        return self.doc
+
+    async def update_one(self, query, update, *args, **kwargs):
+        if self.doc is not None:
+            self.doc.update(update.get("$set", {}))
+
+    async def insert_one(self, doc):
+        return None
+
+
+class FakeCaseDB:
+    def __init__(self, case):
+        self.cases = FakeCaseCollection(case)
+        self.audit_entries = FakeCaseCollection()
+        self.timeline_events = FakeCaseCollection()
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+def test_resolve_schedules_incremental_refresh():
+    """Resolving a case schedules an incremental stats refresh after the response"""
+    import server
+    from fastapi import BackgroundTasks
+
+    case = {"_id": "c1", "operator_id": OPERATOR, "decision_owner_email": "ops@example.com", "status": "IN_PROGRESS"}
+    calls = []
+
+    async def refresh(self, full=False):
+        calls.append(full)
+        return {"rows": 0}
+
+    original_db, original_refresh = server.db, ResolutionStatsService.refresh
+    server.db = FakeCaseDB(case)
+    ResolutionStatsService.refresh = refresh
+    try:
+        async def run():
+            tasks = BackgroundTasks()
+            transition = server.TransitionState(next_state="RESOLVED")
+            current_user = {"user_id": OPERATOR, "email": "ops@example.com"}
+            await server.transition_state("c1", transition, tasks, current_user)
+            assert calls == []
+            await tasks()
+
+        asyncio.run(run())
+    finally:
+        server.db, ResolutionStatsService.refresh = original_db, original_refresh
+    assert calls == [False]
+    print("✅ Resolving a case schedules an incremental refresh")
+
+
+def main():
+    """Run all resolution stats tests"""
+    test_most_specific_scope_with_enough_cases()
+    test_incremental_refresh()
+    test_similar_resolutions_from_stats()
+    test_resolve_schedules_incremental_refresh()
+    print("\n✅ All resolution stats tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Test the pooled Sarvam client and in-memory uploads
+Runs without calling Sarvam (uses an httpx mock transport)
+"""
+
+import sys
+import os
+import asyncio
+
+import httpx
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sarvam_service import SARVAM_BASE_URL, SarvamService, audio_mime_type
+
+
+def _service(requests):
+    """Service whose shared client records requests instead of sending them"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"transcript": "truck stuck at toll", "language_code": "hi-IN"})
+
+    service = SarvamService()
+    service.stt_headers = {"api-subscription-key": "test"}
+    service._client = httpx.AsyncClient(base_url=SARVAM_BASE_URL, transport=httpx.MockTransport(handler))
+    service._client_loop = asyncio.get_running_loop()
+    return service
+
+
+def test_mime_types():
+    """Uploads are labelled with their real format"""
+    assert audio_mime_type("webm") == "audio/webm"
+    assert audio_mime_type(".MP3") == "audio/mpeg"
+    assert audio_mime_type(None) == audio_mime_type("unknown") == "audio/wav"
+    print("✅ Audio MIME types")
+
+
+def test_bytes_upload_reuses_client():
+    """Transcription uploads from memory over one shared client"""
+    requests = []
+
+    async def run():
+        service = _service(requests)
+        client = service.client()
+        for _ in range(2):
+            result = await service.speech_to_text_bytes(b"\x1aE\xdf\xa3webm", audio_format="webm")
+            assert result["success"] and result["transcript"] == "truck stuck at toll"
+        assert service.client() is client
+        await service.close()
+        assert client.is_closed
+
+    asyncio.run(run())
+    assert len(requests) == 2
+    body = requests[0].content
+    assert b'filename="audio.webm"' in body and b"Content-Type: audio/webm" in body
+    assert b"saarika:v1" in body
+    print("✅ In-memory uploads over a shared client")
+
+
+def test_new_client_per_event_loop():
+    """A client opened in a finished loop is replaced, not reused"""
+    service = SarvamService()
+
+    async def get_client():
+        return service.client()
+
+    first = asyncio.run(get_client())
+    second = asyncio.run(get_client())
+    assert first is not second
+    print("✅ Client rebound to the running event loop")
+
+
+def main():
+    """Run all Sarvam client tests"""
+    test_mime_types()
+    test_bytes_upload_reuses_client()
+    test_new_client_per_event_loop()
+    print("\n✅ All Sarvam client tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
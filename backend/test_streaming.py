@@ -0,0 +1,118 @@
+"""
+Test streaming LLM responses and server-sent events
+Runs without calling OpenAI (uses a fake streaming client)
+"""
+
+import sys
+import os
+import asyncio
+import json
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_cache import MemoryLlmCache
+from llm_client import LlmChat, UserMessage
+from sse import JsonSectionParser, sse_llm_response
+
+ANSWER = '```json\n{"root_cause": "Invoice, BL {mismatch}", "contributing_factors": ["a", "b"], "confidence": "high"}\n```'
+
+
+class FakeStreamingCompletions:
+    """Streams ANSWER in small chunks"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, model, messages, temperature, stream=False, **kwargs):
+        self.calls += 1
+        assert stream
+
+        async def chunks():
+            for i in range(0, len(ANSWER), 7):
+                delta = SimpleNamespace(content=ANSWER[i:i + 7])
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+            yield SimpleNamespace(choices=[], usage=SimpleNamespace(total_tokens=42))
+
+        return chunks()
+
+
+def _chat(cache):
+    chat = LlmChat(api_key="test", session_id="s", system_message="RCA", cache=cache)
+    completions = FakeStreamingCompletions()
+    chat.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return chat, completions
+
+
+def test_section_parser():
+    """Top-level fields are emitted once complete, even when split across chunks"""
+    parser = JsonSectionParser()
+    sections = []
+    for i in range(0, len(ANSWER), 3):
+        sections.extend(parser.feed(ANSWER[i:i + 3]))
+    assert sections == [
+        ("root_cause", "Invoice, BL {mismatch}"),
+        ("contributing_factors", ["a", "b"]),
+        ("confidence", "high"),
+    ]
+    print("✅ JSON sections parsed incrementally")
+
+
+def test_stream_then_cache():
+    """Streamed chunks join to the full answer, which is kept in history and cache"""
+    cache = MemoryLlmCache()
+
+    async def run():
+        chat, completions = _chat(cache)
+        chunks = await chat.send_message(UserMessage(text="Analyze"), stream=True)
+        parts = [chunk async for chunk in chunks]
+        assert len(parts) > 1 and "".join(parts) == ANSWER
+        assert chat.messages[-1] == {"role": "assistant", "content": ANSWER}
+
+        again, again_completions = _chat(cache)
+        chunks = await again.send_message(UserMessage(text="Analyze"), stream=True)
+        assert [chunk async for chunk in chunks] == [ANSWER]
+        assert again_completions.calls == 0
+
+    asyncio.run(run())
+    print("✅ Streamed answers cached and added to history")
+
+
+def test_sse_events():
+    """Token and section events stream first, then the finalized result"""
+    finalized = []
+
+    async def run():
+        chat, _ = _chat(None)
+        chat.cache = None
+        chunks = await chat.send_message(UserMessage(text="Analyze"), stream=True)
+
+        async def finalize(response):
+            finalized.append(response)
+            return {"stored": True}
+
+        response = await sse_llm_response(chunks, finalize, sections=True)
+        return [event async for event in response.body_iterator]
+
+    events = asyncio.run(run())
+    names = [event.split("\n", 1)[0] for event in events]
+    assert names[0] == "event: token"
+    assert names.count("event: section") == 3
+    assert names[-1] == "event: result"
+    assert json.loads(events[-1].split("data: ", 1)[1]) == {"stored": True}
+    assert finalized == [ANSWER]
+    print("✅ SSE events streamed and result persisted")
+
+
+def main():
+    """Run all streaming tests"""
+    test_section_parser()
+    test_stream_then_cache()
+    test_sse_events()
+    print("\n✅ All streaming tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
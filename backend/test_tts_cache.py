@@ -0,0 +1,134 @@
+"""
+Test the TTS phrase cache and prompt warm-up
+Runs without calling Sarvam (uses an httpx mock transport)
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+
+import httpx
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tts_cache
+from sarvam_service import SARVAM_BASE_URL, SarvamService
+from tts_cache import DiskTtsCache, tts_cache_key
+from voice_prompts import FIXED_PROMPTS, TTS_LANGUAGES, warmup_phrases
+
+
+def _service(requests):
+    """Service whose shared client answers every TTS request with fake audio"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, content=b"RIFF" + bytes(4000), headers={"content-type": "audio/wav"})
+
+    service = SarvamService()
+    service.api_key = "test"
+    service.tts_headers = {"api-subscription-key": "test"}
+    service._client = httpx.AsyncClient(base_url=SARVAM_BASE_URL, transport=httpx.MockTransport(handler))
+    service._client_loop = asyncio.get_running_loop()
+    return service
+
+
+def _use_cache(cache):
+    tts_cache._default_cache = cache
+    tts_cache._default_cache_loaded = cache is not None
+
+
+def test_cache_key():
+    """Keys change with every voice setting"""
+    key = tts_cache_key("Namaste", "hi-IN", "anushka", "bulbul:v2")
+    assert key == tts_cache_key(" Namaste ", "hi-IN", "anushka", "bulbul:v2", 0, 1, 1)
+    assert key != tts_cache_key("Namaste", "mr-IN", "anushka", "bulbul:v2")
+    assert key != tts_cache_key("Namaste", "hi-IN", "vidya", "bulbul:v2")
+    assert key != tts_cache_key("Namaste", "hi-IN", "anushka", "bulbul:v3")
+    assert key != tts_cache_key("Namaste", "hi-IN", "anushka", "bulbul:v2", pace=1.2)
+    print("✅ Cache keys cover text, language, speaker, model and voice settings")
+
+
+def test_lru_size_limit():
+    """Least recently used entries are evicted once the directory is over its limit"""
+    with tempfile.TemporaryDirectory() as directory:
+        audio = os.urandom(3000)  # incompressible, so each entry is ~3 KB
+        cache = DiskTtsCache(directory, max_bytes=7000)
+
+        async def run():
+            await cache.set("a", audio)
+            await cache.set("b", audio)
+            assert await cache.get("a") == audio  # "b" is now least recently used
+            await cache.set("c", audio)
+            assert await cache.get("b") is None
+            assert await cache.get("a") == audio and await cache.get("c") == audio
+
+        asyncio.run(run())
+        assert sorted(os.listdir(directory)) == ["a.wav.gz", "c.wav.gz"]
+        assert DiskTtsCache(directory).stats()["entries"] == 2
+    print("✅ LRU eviction keeps the cache under its size limit")
+
+
+def test_repeated_prompt_served_from_cache():
+    """The second request for a phrase does not reach Sarvam"""
+    requests = []
+    with tempfile.TemporaryDirectory() as directory:
+        _use_cache(DiskTtsCache(directory))
+
+        async def run():
+            service = _service(requests)
+            first = await service.text_to_speech("Aap kahan hain?", "hi-IN")
+            second = await service.text_to_speech("Aap kahan hain?", "hi-IN")
+            assert first == second and first.startswith(b"RIFF")
+            await service.text_to_speech("Aap kahan hain?", "hi-IN", use_cache=False)
+            await service.close()
+
+        try:
+            asyncio.run(run())
+        finally:
+            _use_cache(None)
+    assert len(requests) == 2
+    print("✅ Repeated prompts served from the cache")
+
+
+def test_warm_up_serves_client_prompts():
+    """Fixed client prompts are synthesized once per language and then hit by the endpoint's call"""
+    assert len(TTS_LANGUAGES) == 11
+    requests = []
+    with tempfile.TemporaryDirectory() as directory:
+        _use_cache(DiskTtsCache(directory))
+
+        async def run():
+            service = _service(requests)
+            first = await service.warm_tts_cache()
+            second = await service.warm_tts_cache()
+            # Same arguments /api/voice/text-to-speech uses
+            audio = await service.text_to_speech(text=FIXED_PROMPTS[0], language_code="ta-IN", speaker="anushka")
+            await service.close()
+            return first, second, audio
+
+        try:
+            first, second, audio = asyncio.run(run())
+        finally:
+            _use_cache(None)
+    total = len(warmup_phrases())
+    assert total == 11 * len(FIXED_PROMPTS)
+    assert first == {"cached": 0, "synthesized": total, "failed": 0}
+    assert second == {"cached": total, "synthesized": 0, "failed": 0}
+    assert audio.startswith(b"RIFF")
+    assert len(requests) == total
+    print("✅ Client prompts pre-synthesized for all languages")
+
+
+def main():
+    """Run all TTS cache tests"""
+    test_cache_key()
+    test_lru_size_limit()
+    test_repeated_prompt_served_from_cache()
+    test_warm_up_serves_client_prompts()
+    print("\n✅ All TTS cache tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
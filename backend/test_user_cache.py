@@ -0,0 +1,148 @@
+"""
+Test the shared identity caches (users, operators) and write-hook invalidation
+Runs without a database connection or Redis
+"""
+
+import sys
+import os
+import asyncio
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cache import SharedCache
+from db_compat import DBDatabase
+
+USER_ID = "0b3c3c8e-8f8a-4a51-9d2c-3f0a1c2b4d5e"
+
+
+class FakeAdapter:
+    """Counts lookups and accepts every write"""
+
+    def __init__(self):
+        self.lookups = 0
+
+    async def find_one(self, table, query, sort=None):
+        self.lookups += 1
+        return {"_id": USER_ID, "id": USER_ID, "email": "ops@example.com", "settings": {}}
+
+    async def update_one(self, table, query, update):
+        return True
+
+    async def insert_one(self, table, doc):
+        return USER_ID
+
+
+def test_shared_cache_local_only():
+    """Without REDIS_URL entries live in-process for the full TTL and are bounded"""
+    cache = SharedCache("test", maxsize=2, ttl=60, redis_url="")
+    assert not cache.shared and cache.local.ttl == 60
+
+    async def run():
+        await cache.set("a", {"user_id": "a"})
+        await cache.set("b", {"user_id": "b"})
+        await cache.set("c", {"user_id": "c"})
+        assert await cache.get("a") is None
+        assert (await cache.get("c"))["user_id"] == "c"
+        await cache.delete("c")
+        assert await cache.get("c") is None
+        await cache.set("d", {"user_id": "d"}, ttl=0)
+        assert await cache.get("d") is None
+
+    asyncio.run(run())
+    print("✅ Shared cache works in-process without Redis")
+
+
+def test_user_write_invalidates_cache():
+    """An update to users drops the cached identity so the next request reloads it"""
+    adapter = FakeAdapter()
+    db = DBDatabase(adapter)
+    cache = SharedCache("users", ttl=60, redis_url="")
+
+    async def invalidate(query):
+        await cache.delete(str(query.get("_id")))
+
+    db.on_write("users", invalidate)
+
+    async def identity():
+        cached = await cache.get(USER_ID)
+        if cached is None:
+            user = await db.users.find_one({"_id": USER_ID})
+            cached = {"user_id": str(user["_id"]), "email": user["email"]}
+            await cache.set(USER_ID, cached)
+        return cached
+
+    async def run():
+        await identity()
+        await identity()
+        assert adapter.lookups == 1
+        await db.users.update_one({"_id": USER_ID}, {"$set": {"email": "new@example.com"}})
+        await identity()
+        assert adapter.lookups == 2
+        # Hooks are per collection
+        await db.cases.update_one({"_id": USER_ID}, {"$set": {"status": "RESOLVED"}})
+        await identity()
+        assert adapter.lookups == 2
+
+    asyncio.run(run())
+    print("✅ User writes invalidate cached identities")
+
+
+def test_operator_cached_until_settings_update():
+    """get_current_operator hits the DB once per user until the operator is updated"""
+    import server
+
+    adapter = FakeAdapter()
+    original_db = server.db
+    server.db = DBDatabase(adapter)
+    server.register_cache_hooks(server.db)
+    current_user = {"user_id": USER_ID, "email": "ops@example.com"}
+
+    async def run():
+        await server.operator_cache.clear()
+        operator = await server.get_current_operator(current_user)
+        await server.get_current_operator(current_user)
+        assert adapter.lookups == 1 and operator["email"] == "ops@example.com"
+        assert server.get_operator_service() is server.get_operator_service()
+
+        settings = server.UpdateOperatorSettings(webhook_url="https://example.com/hook")
+        await server.update_operator_settings(settings, operator)
+        await server.get_current_operator(current_user)
+        assert adapter.lookups == 2
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.db = original_db
+    print("✅ Operator cached per user and invalidated by settings updates")
+
+
+def test_case_write_invalidates_movement_counts():
+    """Any write to cases drops cached movement totals, not just movement creation"""
+    import server
+
+    adapter = FakeAdapter()
+    db = DBDatabase(adapter)
+    server.register_cache_hooks(db)
+    server.movement_count_cache.set((USER_ID, None, None, None, "REPORTED"), 7)
+
+    async def run():
+        await db.cases.update_one({"_id": "case-1"}, {"$set": {"status": "RESOLVED"}})
+
+    asyncio.run(run())
+    assert len(server.movement_count_cache) == 0
+    print("✅ Case writes invalidate cached movement totals")
+
+
+def main():
+    """Run all user cache tests"""
+    test_shared_cache_local_only()
+    test_user_write_invalidates_cache()
+    test_operator_cached_until_settings_update()
+    test_case_write_invalidates_movement_counts()
+    print("\n✅ All user cache tests passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
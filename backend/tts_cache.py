@@ -0,0 +1,145 @@
+"""
+TTS Phrase Cache
+Synthesized speech keyed by everything that determines the audio (text,
+language, speaker, model, pitch, pace, loudness), so repeated prompts skip
+Sarvam and its quota.
+
+Entries are gzip-compressed files in TTS_CACHE_DIR (default
+/tmp/ward_tts_cache; "off" disables the cache), shared by workers on one
+host. The directory is kept under TTS_CACHE_MAX_MB (default 256) by evicting
+the least recently used files; a hit refreshes the file's mtime.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Optional
+
+SUFFIX = ".wav.gz"
+
+
+def tts_cache_key(
+    text: str,
+    language_code: str,
+    speaker: str,
+    model: str,
+    pitch: float = 0.0,
+    pace: float = 1.0,
+    loudness: float = 1.0
+) -> str:
+    """Hash of everything that determines the synthesized audio"""
+    payload = json.dumps(
+        [text.strip(), language_code, speaker, model, float(pitch), float(pace), float(loudness)],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskTtsCache:
+    """Compressed audio files with an LRU size limit"""
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # key -> compressed size, least recently used first (by mtime on startup)
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-len(SUFFIX)], stat.st_size))
+        self._sizes: "OrderedDict[str, int]" = OrderedDict(
+            (key, size) for _, key, size in sorted(entries)
+        )
+        self._total = sum(self._sizes.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                compressed = f.read()
+            os.utime(path)
+        except OSError:
+            # Evicted by another worker (or never written)
+            with self._lock:
+                self._total -= self._sizes.pop(key, 0)
+            return None
+        with self._lock:
+            if key not in self._sizes:
+                self._total += len(compressed)
+            self._sizes[key] = len(compressed)
+            self._sizes.move_to_end(key)
+        try:
+            return gzip.decompress(compressed)
+        except (OSError, EOFError, zlib.error) as e:
+            print(f"Warning: Corrupt TTS cache entry {key}: {e}")
+            return None
+
+    def _set(self, key: str, audio: bytes) -> None:
+        compressed = gzip.compress(audio, compresslevel=6)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._total += len(compressed) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(compressed)
+            while self._total > self.max_bytes and len(self._sizes) > 1:
+                oldest, size = self._sizes.popitem(last=False)
+                self._total -= size
+                try:
+                    os.remove(self._path(oldest))
+                except OSError:
+                    pass
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, audio: bytes) -> None:
+        try:
+            await asyncio.to_thread(self._set, key, audio)
+        except OSError as e:
+            print(f"Warning: Could not write TTS cache entry: {e}")
+
+    def stats(self) -> dict:
+        return {"entries": len(self._sizes), "bytes": self._total, "max_bytes": self.max_bytes}
+
+
+_default_cache: Any = None
+_default_cache_loaded = False
+
+
+def get_tts_cache():
+    """Cache configured by TTS_CACHE_DIR / TTS_CACHE_MAX_MB, or None when disabled"""
+    global _default_cache, _default_cache_loaded
+    if _default_cache_loaded:
+        return _default_cache
+
+    directory = os.getenv("TTS_CACHE_DIR", "/tmp/ward_tts_cache").strip()
+    max_bytes = int(float(os.getenv("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024)
+    if directory.lower() in ("off", "none", "") or max_bytes <= 0:
+        _default_cache = None
+    else:
+        try:
+            _default_cache = DiskTtsCache(directory, max_bytes)
+        except OSError as e:
+            print(f"Warning: TTS cache at {directory} unavailable: {e}")
+            _default_cache = None
+    _default_cache_loaded = True
+    return _default_cache
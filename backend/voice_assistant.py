@@ -10,8 +10,8 @@ Voice is for capture + guidance, NOT command.
 """
 
 import json
-from typing import Dict, Any, List, Optional, Literal
-from llm_client import LlmChat, UserMessage
+from typing import AsyncIterator, Dict, Any, List, Optional, Literal
+from llm_client import LlmChat, UserMessage, PRIORITY_INTERACTIVE, LlmOverloadedError
 import os
 from dotenv import load_dotenv
 
@@ -77,7 +77,7 @@ Generate 2-3 clarity questions max. Be direct and operational."""
                 api_key=self.api_key,
                 session_id=f"clarity-{id(initial_transcript)}",
                 system_message=self.get_clarity_questions_prompt()
-            ).with_model("gemini", "gemini-2.5-flash")
+            ).for_task("clarity_questions").with_priority(PRIORITY_INTERACTIVE)
             
             prompt = f"""The operator said:
 
@@ -108,6 +108,8 @@ Return ONLY the questions, one per line, numbered. Use the EXACT same language a
             
             return questions[:3]  # Max 3 questions
         
+        except LlmOverloadedError:
+            raise
         except Exception as e:
             print(f"Error generating clarity questions: {e}")
             # Fallback to generic questions (English)
@@ -161,7 +163,7 @@ Example:
                 api_key=self.api_key,
                 session_id=f"extract-{id(conversation_transcript)}",
                 system_message=self.get_disruption_extraction_prompt()
-            ).with_model("gemini", "gemini-2.5-flash")
+            ).for_task("extract_disruption").with_priority(PRIORITY_INTERACTIVE)
             
             prompt = f"""Conversation transcript:
 
@@ -182,6 +184,8 @@ Extract structured disruption details as JSON."""
             disruption = json.loads(cleaned.strip())
             return disruption
         
+        except LlmOverloadedError:
+            raise
         except Exception as e:
             print(f"Error extracting disruption: {e}")
             return {
@@ -230,34 +234,45 @@ Generate ONLY safe responses."""
         Only acknowledgment, clarification, or safe coordination
         """
         try:
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"driver-{id(driver_input)}",
-                system_message=self.get_driver_response_prompt()
-            ).with_model("gemini", "gemini-2.5-flash")
-            
-            # Build context
-            history_text = "\n".join([
-                f"{msg['speaker']}: {msg['text']}" 
-                for msg in conversation_history[-3:]  # Last 3 messages
-            ])
-            
-            prompt = f"""Previous conversation:
-{history_text}
-
-Driver just said: "{driver_input}"
-
-Generate a SHORT, SAFE response (under 25 words). No decisions. No predictions."""
-            
-            message = UserMessage(text=prompt)
+            chat, message = self._driver_response_request(driver_input, conversation_history)
             response = await chat.send_message(message)
             
             return response.strip()
         
+        except LlmOverloadedError:
+            raise
         except Exception as e:
             print(f"Error generating driver response: {e}")
             return "Message received. Ops team reviewing. Please stay safe."
     
+    async def stream_driver_response(self, driver_input: str, conversation_history: List[Dict]) -> AsyncIterator[str]:
+        """Stream the driver response as it is generated"""
+        chat, message = self._driver_response_request(driver_input, conversation_history)
+        return await chat.send_message(message, stream=True)
+    
+    def _driver_response_request(self, driver_input: str, conversation_history: List[Dict]):
+        """Chat and prompt for a driver response"""
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=f"driver-{id(driver_input)}",
+            system_message=self.get_driver_response_prompt()
+        ).for_task("driver_response").with_priority(PRIORITY_INTERACTIVE)
+        
+        # Build context
+        history_text = "\n".join([
+            f"{msg['speaker']}: {msg['text']}" 
+            for msg in conversation_history[-3:]  # Last 3 messages
+        ])
+        
+        prompt = f"""Previous conversation:
+{history_text}
+
+Driver just said: "{driver_input}"
+
+Generate a SHORT, SAFE response (under 25 words). No decisions. No predictions."""
+        
+        return chat, UserMessage(text=prompt)
+    
     def get_helper_question_prompt(self) -> str:
         """System prompt for context-harvesting questions for helpers"""
         return """You are Ward v0 speaking to a HELPER (CHA, supervisor, senior ops).
@@ -301,7 +316,7 @@ Generate context-harvesting questions, NOT advice requests."""
                 api_key=self.api_key,
                 session_id=f"helper-{id(context)}",
                 system_message=self.get_helper_question_prompt()
-            ).with_model("gemini", "gemini-2.5-flash")
+            ).for_task("helper_questions").with_priority(PRIORITY_INTERACTIVE)
             
             prompt = f"""Context: {context}
 
@@ -323,6 +338,8 @@ Do NOT ask what they think we should do."""
             
             return questions[:3]
         
+        except LlmOverloadedError:
+            raise
         except Exception as e:
             print(f"Error generating helper questions: {e}")
             return [
@@ -342,45 +359,65 @@ Do NOT ask what they think we should do."""
             Dictionary with guidance for each decision step
         """
         try:
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"guidance-{id(disruption_summary)}",
-                system_message="""You are Ward v0's decision guidance assistant.
+            chat, message = self._decision_guidance_request(disruption_summary)
+            response = await chat.send_message(message)
+            
+            return self.parse_decision_guidance(response)
+        
+        except LlmOverloadedError:
+            raise
+        except Exception as e:
+            print(f"Error generating guidance: {e}")
+            return self._fallback_guidance()
+    
+    async def stream_decision_guidance(self, disruption_summary: str) -> AsyncIterator[str]:
+        """Stream the raw guidance JSON; parse the joined text with parse_decision_guidance()"""
+        chat, message = self._decision_guidance_request(disruption_summary)
+        return await chat.send_message(message, stream=True)
+    
+    def _decision_guidance_request(self, disruption_summary: str):
+        """Chat and prompt for decision guidance"""
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=f"guidance-{id(disruption_summary)}",
+            system_message="""You are Ward v0's decision guidance assistant.
 
 Generate brief voice prompts to guide the operator through each step of the decision protocol.
 
 Be concise, operational, and calm. Use Indian logistics context.
 
 Return JSON with keys: decision_framing, known_inputs, assumptions, alternatives, risks, recommendation"""
-            ).with_model("gemini", "gemini-2.5-flash")
-            
-            prompt = f"""Disruption: {disruption_summary}
+        ).for_task("decision_guidance").with_priority(PRIORITY_INTERACTIVE)
+        
+        prompt = f"""Disruption: {disruption_summary}
 
 Generate brief voice guidance for each decision step. Keep each prompt under 30 words."""
-            
-            message = UserMessage(text=prompt)
-            response = await chat.send_message(message)
-            
-            # Parse JSON
+        
+        return chat, UserMessage(text=prompt)
+    
+    def parse_decision_guidance(self, response: str) -> Dict[str, str]:
+        """Parse guidance JSON, falling back to generic prompts"""
+        try:
             cleaned = response.strip()
             if cleaned.startswith("```json"):
                 cleaned = cleaned.split("```json")[1].split("```")[0]
             elif cleaned.startswith("```"):
                 cleaned = cleaned.split("```", 1)[1].split("```")[0]
             
-            guidance = json.loads(cleaned.strip())
-            return guidance
-        
-        except Exception as e:
+            return json.loads(cleaned.strip())
+        except ValueError as e:
             print(f"Error generating guidance: {e}")
-            return {
-                "decision_framing": "What exact decision needs to be made right now?",
-                "known_inputs": "What facts do you know for certain?",
-                "assumptions": "What are you assuming, and what breaks if you're wrong?",
-                "alternatives": "What are your options, including doing nothing?",
-                "risks": "What's the worst that could happen with each option?",
-                "recommendation": "Which option minimizes regret under uncertainty?"
-            }
+            return self._fallback_guidance()
+    
+    def _fallback_guidance(self) -> Dict[str, str]:
+        return {
+            "decision_framing": "What exact decision needs to be made right now?",
+            "known_inputs": "What facts do you know for certain?",
+            "assumptions": "What are you assuming, and what breaks if you're wrong?",
+            "alternatives": "What are your options, including doing nothing?",
+            "risks": "What's the worst that could happen with each option?",
+            "recommendation": "Which option minimizes regret under uncertainty?"
+        }
 
 # Singleton instance
 voice_assistant = VoiceDecisionAssistant()
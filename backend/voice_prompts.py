@@ -0,0 +1,24 @@
+"""
+Voice Prompts
+Fixed phrases the clients send to /api/voice/text-to-speech, used to warm the
+TTS cache (SarvamService.warm_tts_cache). Keep this list in step with the
+frontend: a phrase that no client sends only spends Sarvam quota.
+"""
+
+from typing import List, Optional, Tuple
+
+# Languages Sarvam STT can detect; clients speak back in the detected language
+TTS_LANGUAGES = [
+    "hi-IN", "en-IN", "ta-IN", "te-IN", "kn-IN", "ml-IN",
+    "mr-IN", "gu-IN", "pa-IN", "bn-IN", "od-IN",
+]
+
+FIXED_PROMPTS = [
+    # frontend/src/pages/VoiceCase.js, after the disruption is extracted
+    "I've structured your disruption. Please review and approve the details.",
+]
+
+
+def warmup_phrases(languages: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+    """(text, language_code) for every fixed prompt in the given languages"""
+    return [(text, language) for text in FIXED_PROMPTS for language in languages or TTS_LANGUAGES]
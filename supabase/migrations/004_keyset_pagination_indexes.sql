@@ -0,0 +1,11 @@
+-- Ward v0 Keyset Pagination Indexes
+-- Supports cursor pagination over (updated_at, id) and (timestamp, id)
+
+-- Movements/cases: GET /api/v0/movements pages by operator, newest first
+CREATE INDEX IF NOT EXISTS idx_cases_operator_updated_id ON cases(operator_id, updated_at DESC, id DESC);
+
+-- Timeline: GET /api/cases/{id}/timeline pages by case, newest first
+CREATE INDEX IF NOT EXISTS idx_timeline_events_case_timestamp_id ON timeline_events(case_id, timestamp DESC, id DESC);
+
+-- Audit: per-case and per-operator audit trails page by timestamp
+CREATE INDEX IF NOT EXISTS idx_audit_entries_case_timestamp_id ON audit_entries(case_id, timestamp, id);
@@ -0,0 +1,28 @@
+-- Ward Resolution Stats Rollup
+-- Backs ResolutionStatsService and /api/cases/{id}/similar-resolutions
+
+-- Resolved-case statistics per operator and (disruption_type, lane).
+-- lane is '*' on rollup rows covering every lane, and '' when the cases did
+-- not record one. Cases have no location field (disruption_details.identifier
+-- is a shipment/container/vehicle number), so there is no location scope.
+CREATE TABLE IF NOT EXISTS resolution_stats (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    operator_id UUID NOT NULL,
+    disruption_type TEXT NOT NULL,
+    lane TEXT NOT NULL DEFAULT '*',
+    case_count INTEGER NOT NULL DEFAULT 0,
+    p50_hours NUMERIC,
+    p75_hours NUMERIC,
+    p90_hours NUMERIC,
+    top_root_causes JSONB DEFAULT '[]', -- [{"root_cause": "...", "count": n}], most common first
+    sample_case_ids TEXT[] DEFAULT '{}', -- most recently resolved first
+    last_resolved_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE(operator_id, disruption_type, lane)
+);
+CREATE INDEX IF NOT EXISTS idx_resolution_stats_updated_at ON resolution_stats(updated_at);
+
+-- Resolution times come from the STATE_TRANSITION audit entry into RESOLVED
+CREATE INDEX IF NOT EXISTS idx_audit_entries_resolved
+    ON audit_entries(case_id, timestamp)
+    WHERE action = 'STATE_TRANSITION' AND payload->>'to_state' = 'RESOLVED';